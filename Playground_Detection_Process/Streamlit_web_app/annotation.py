@@ -0,0 +1,116 @@
+# Import libraries
+import numpy as np
+import cv2
+
+import os
+
+from projection import to_int_point
+
+TACTICAL_MAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "img", "tactical_map.jpg")
+
+def load_tactical_map():
+    """Read the tactical map image (BGR)"""
+    return cv2.imread(TACTICAL_MAP_PATH)
+
+def output_size(cap, tac_map):
+    """Size (width, height) of the video written from rendered frames, as detect() always wrote it"""
+    width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) + tac_map.shape[0]
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) + tac_map.shape[1]
+    return width, height
+
+def render_frame(frame, result, tac_map, colors_dic, labels_dic, plot_hyperparams, fps=None):
+    """
+    Draw a DetectionEngine frame result on the frame and the tactical map
+
+    Args:
+        frame: Video frame (BGR), annotated in place
+        result: Frame result dict from DetectionEngine
+        tac_map: Tactical map image (BGR), left untouched
+        colors_dic: Team name to [players color, goalkeeper color] (RGB)
+        labels_dic: Players model label index to name
+        plot_hyperparams: {0: show keypoints, 1: show color palettes, 2: show ball track, 3: show players}
+        fps: Optional processing speed to print on the image
+
+    Returns:
+        Annotated frame and tactical map side by side (BGR)
+    """
+    show_k = plot_hyperparams[0]
+    show_pal = plot_hyperparams[1]
+    show_b = plot_hyperparams[2]
+    show_p = plot_hyperparams[3]
+
+    ball_color_bgr = (0,0,255)                                                                          # Color (GBR) for ball annotation on tactical map
+    palette_box_size = 10                                                                               # Set color box size in pixels (for display)
+    annotated_frame = frame                                                                             # Create annotated frame
+    tac_map_copy = tac_map.copy()                                                                       # Reset tactical map image for each new frame
+
+    ## Players
+    players = result['players']
+    for bbox, conf, team_name, palette, pos in zip(players['bboxes'], players['confs'], players['team_names'],
+                                                   players['palettes'], players['pitch_pos']):
+        # Display extracted color palette for each detected player
+        if show_pal:
+            for k, c in enumerate(palette):
+                c_bgr = c[::-1]                                                                         # Convert color to BGR
+                annotated_frame = cv2.rectangle(annotated_frame, (int(bbox[2])+3, int(bbox[1])+k*palette_box_size),
+                                                (int(bbox[2])+palette_box_size, int(bbox[1])+(palette_box_size)*(k+1)),
+                                                c_bgr, -1)
+
+        color_bgr = colors_dic[team_name][0][::-1]                                                      # Detected player team color (BGR)
+        if show_p:
+            annotated_frame = cv2.rectangle(annotated_frame, (int(bbox[0]), int(bbox[1])),              # Add bbox annotations with team colors
+                                            (int(bbox[2]), int(bbox[3])), color_bgr, 1)
+            annotated_frame = cv2.putText(annotated_frame, team_name + f" {conf:.2f}",                  # Add team name annotations
+                                          (int(bbox[0]), int(bbox[1])-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                                          color_bgr, 2)
+
+        # Add tactical map player postion color coded annotation when the player could be projected
+        player_map_pos = to_int_point(pos)
+        if player_map_pos is not None:
+            tac_map_copy = cv2.circle(tac_map_copy, player_map_pos, radius=5, color=color_bgr, thickness=-1)
+            tac_map_copy = cv2.circle(tac_map_copy, player_map_pos, radius=5, color=(0,0,0), thickness=1)
+
+    ## Referees and ball (white annotations)
+    others = [(bbox, conf, 1) for bbox, conf in zip(result['referees']['bboxes'], result['referees']['confs'])]
+    if result['ball'] is not None:
+        others.append((result['ball']['bbox'], result['ball']['conf'], 2))
+    for bbox, conf, label in others:
+        annotated_frame = cv2.rectangle(annotated_frame, (int(bbox[0]), int(bbox[1])),                  # Add white colored bbox annotations
+                                        (int(bbox[2]), int(bbox[3])), (255,255,255), 1)
+        annotated_frame = cv2.putText(annotated_frame, labels_dic[label] + f" {conf:.2f}",              # Add white colored label text annotations
+                                      (int(bbox[0]), int(bbox[1])-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                                      (255,255,255), 2)
+
+    # Add tactical map referees postion annotation
+    for pos in result['referees']['pitch_pos']:
+        referee_map_pos = to_int_point(pos)
+        if referee_map_pos is not None:
+            tac_map_copy = cv2.circle(tac_map_copy, referee_map_pos, radius=4, color=(255,255,255), thickness=-1)
+            tac_map_copy = cv2.circle(tac_map_copy, referee_map_pos, radius=4, color=(0,0,0), thickness=1)
+
+    # Add tactical map ball postion annotation if detected
+    if result['ball'] is not None and result['ball']['pitch_pos'] is not None:
+        tac_map_copy = cv2.circle(tac_map_copy, result['ball']['pitch_pos'], radius=5, color=ball_color_bgr, thickness=3)
+
+    if show_k:
+        for bbox in result['keypoints']['bboxes']:
+            annotated_frame = cv2.rectangle(annotated_frame, (int(bbox[0]), int(bbox[1])),              # Add field keypoints bbox annotations
+                                            (int(bbox[2]), int(bbox[3])), (0,0,0), 1)
+    # Plot the ball track
+    if show_b and len(result['ball_track'])>0:
+        points = np.array(result['ball_track'], dtype=np.int32).reshape((-1, 1, 2))
+        tac_map_copy = cv2.polylines(tac_map_copy, [points], isClosed=False, color=(0, 0, 100), thickness=2)
+
+    # Combine annotated frame and tactical map in one image with colored border separation
+    border_color = [255,255,255]                                                                        # Set border color (BGR)
+    annotated_frame=cv2.copyMakeBorder(annotated_frame, 40, 10, 10, 10,                                 # Add borders to annotated frame
+                                        cv2.BORDER_CONSTANT, value=border_color)
+    tac_map_copy = cv2.copyMakeBorder(tac_map_copy, 70, 50, 10, 10, cv2.BORDER_CONSTANT,                # Add borders to tactical map
+                                      value=border_color)
+    tac_map_copy = cv2.resize(tac_map_copy, (tac_map_copy.shape[1], annotated_frame.shape[0]))          # Resize tactical map
+    final_img = cv2.hconcat((annotated_frame, tac_map_copy))                                            # Concatenate both images
+    ## Add info annotation
+    cv2.putText(final_img, "Tactical Map", (1370,60), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,0,0), 2)
+    if fps is not None:
+        cv2.putText(final_img, "FPS: " + str(int(fps)), (20,30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0,0,0), 2)
+    return final_img
@@ -0,0 +1,80 @@
+import argparse
+import time
+
+import cv2
+from ultralytics import YOLO
+
+from inference import FramePrefetcher, BatchedInference, adaptive_batch_size
+
+PLAYERS_WEIGHTS = "../models/Yolo8L Players/weights/best.pt"
+KEYPOINTS_WEIGHTS = "../models/Yolo8M Field Keypoints/weights/best.pt"
+
+def display_header():
+    """Display a header for the benchmark script"""
+    print("\n" + "="*80)
+    print("              PLAYERS + KEYPOINTS INFERENCE THROUGHPUT BENCHMARK              ")
+    print("="*80 + "\n")
+
+def open_video(path, nbr_frames):
+    cap = cv2.VideoCapture(path)
+    tot_nbr_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    return cap, min(nbr_frames, tot_nbr_frames) if tot_nbr_frames > 0 else nbr_frames
+
+def run_per_frame(args, model_players, model_keypoints):
+    """Baseline: decode and run both models one frame at a time, as detect() used to"""
+    cap, nbr_frames = open_video(args.video, args.frames)
+    start_time = time.perf_counter()
+    for _ in range(nbr_frames):
+        success, frame = cap.read()
+        if success:
+            model_players(frame, conf=args.p_conf, verbose=False)
+            model_keypoints(frame, conf=args.k_conf, verbose=False)
+    elapsed = time.perf_counter() - start_time
+    cap.release()
+    return nbr_frames, elapsed
+
+def run_batched(args, model_players, model_keypoints, batch_size):
+    """Prefetching decode thread feeding batched inference"""
+    cap, nbr_frames = open_video(args.video, args.frames)
+    inference = BatchedInference(model_players, model_keypoints, args.p_conf, args.k_conf, batch_size)
+    start_time = time.perf_counter()
+    for _ in inference.run(FramePrefetcher(cap, nbr_frames)):
+        pass
+    elapsed = time.perf_counter() - start_time
+    cap.release()
+    return nbr_frames, elapsed
+
+def run_benchmark(args):
+    display_header()
+
+    model_players = YOLO(PLAYERS_WEIGHTS)
+    model_keypoints = YOLO(KEYPOINTS_WEIGHTS)
+
+    # Warm up both models so the first timed run does not pay for initialization
+    cap, _ = open_video(args.video, 1)
+    success, frame = cap.read()
+    cap.release()
+    if not success:
+        print(f"Could not read {args.video}")
+        return
+    model_players(frame, conf=args.p_conf, verbose=False)
+    model_keypoints(frame, conf=args.k_conf, verbose=False)
+
+    nbr_frames, elapsed = run_per_frame(args, model_players, model_keypoints)
+    baseline_fps = nbr_frames / elapsed
+    print(f"Per-frame inference:        {baseline_fps:6.2f} frames/s ({nbr_frames} frames in {elapsed:.1f}s)")
+
+    batch_sizes = args.batch_sizes or [adaptive_batch_size(getattr(model_players, 'device', None))]
+    for batch_size in batch_sizes:
+        nbr_frames, elapsed = run_batched(args, model_players, model_keypoints, batch_size)
+        fps = nbr_frames / elapsed
+        print(f"Batched inference (N={batch_size:>2}):   {fps:6.2f} frames/s ({fps / baseline_fps:.2f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-frame versus batched YOLOv8 inference on a video")
+    parser.add_argument("--video", type=str, default="./vid/demo_vid_1.mp4", help="Video to run the models on")
+    parser.add_argument("--frames", type=int, default=120, help="Number of frames to process per run")
+    parser.add_argument("--batch-sizes", type=int, nargs="*", default=[1, 4, 8], help="Batch sizes to compare (none for the adaptive size)")
+    parser.add_argument("--p-conf", type=float, default=0.6, help="Players detection confidence threshold")
+    parser.add_argument("--k-conf", type=float, default=0.7, help="Field keypoints detection confidence threshold")
+    run_benchmark(parser.parse_args())
@@ -0,0 +1,95 @@
+import argparse
+import json
+import sys
+import time
+
+import cv2
+from ultralytics import YOLO
+
+from engine import DetectionEngine, create_colors_info, get_labels_dics, result_to_json
+from annotation import load_tactical_map, output_size, render_frame
+from tracking_export import TrackingWriter, tracking_metadata
+
+PLAYERS_WEIGHTS = "../models/Yolo8L Players/weights/best.pt"
+KEYPOINTS_WEIGHTS = "../models/Yolo8M Field Keypoints/weights/best.pt"
+
+def print_progress(frame_nbr, tot_nbr_frames, start_time):
+    """Print a single progress line, refreshed every 25 frames"""
+    if frame_nbr % 25 != 0 and frame_nbr != tot_nbr_frames:
+        return
+    elapsed = time.perf_counter() - start_time
+    fps = frame_nbr / elapsed if elapsed else 0
+    sys.stdout.write(f"\rFrame {frame_nbr}/{tot_nbr_frames} ({frame_nbr/max(tot_nbr_frames, 1)*100:5.1f}%) - {fps:6.2f} frames/s")
+    sys.stdout.flush()
+
+def run_detection(args):
+    colors_dic, color_list_lab = create_colors_info(args.team1, args.team1_color, args.team1_gk_color,
+                                                    args.team2, args.team2_color, args.team2_gk_color)
+    hyper_params = {0: args.p_conf, 1: args.k_conf, 2: args.k_d_tol}
+    ball_track_hyperparams = {0: args.ball_reset_frames, 1: args.ball_max_dist, 2: args.ball_track_length}
+    plot_hyperparams = {0: False, 1: False, 2: True, 3: True}
+
+    engine = DetectionEngine(YOLO(args.players_weights), YOLO(args.keypoints_weights), colors_dic, color_list_lab,
+                             hyper_params, ball_track_hyperparams, args.num_pal_colors, args.batch_size, args.keypoints_interval)
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        print(f"Could not open {args.video}")
+        return 1
+
+    tac_map = load_tactical_map()
+    tracking_writer = TrackingWriter(args.export, tracking_metadata(colors_dic, tac_map)) if args.export else None
+
+    # Annotated video output is optional, rendering is skipped entirely without it
+    output = None
+    if args.output_video:
+        _, _, labels_dic = get_labels_dics()
+        width, height = output_size(cap, tac_map)
+        output = cv2.VideoWriter(args.output_video, cv2.VideoWriter_fourcc(*'mp4v'), 30.0, (width, height))
+
+    start_time = time.perf_counter()
+    with open(args.output, 'w') as f:
+        for frame, result in engine.run(cap, lambda frame_nbr, tot: print_progress(frame_nbr, tot, start_time)):
+            f.write(json.dumps(result_to_json(result)) + "\n")
+            if tracking_writer is not None:
+                tracking_writer.write(result)
+            if output is not None:
+                final_img = render_frame(frame, result, tac_map, colors_dic, labels_dic, plot_hyperparams)
+                output.write(cv2.resize(final_img, (width, height)))
+    cap.release()
+    if output is not None:
+        output.release()
+
+    stats = engine.stats()
+    if tracking_writer is not None:
+        tracking_writer.close({'video_fps': engine.video_fps, 'stats': stats})
+    print(f"\nProcessed {stats['frames']} frames in {stats['elapsed_s']}s ({stats['fps']} frames/s)")
+    if stats['keypoints']:
+        print(f"Keypoints model ran on {stats['keypoints']['keypoints_frames']} frames ({stats['keypoints']['keypoints_ratio']:.0%})")
+    print(f"Results saved to {args.output}" + (f" and {args.export}" if args.export else ""))
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run players, ball and tactical map detection on a video file, without the web app")
+    parser.add_argument("video", type=str, help="Input video")
+    parser.add_argument("--output", type=str, default="detections.jsonl", help="JSON lines file with one detection result per frame")
+    parser.add_argument("--export", type=str, default=None, help="Columnar tracking data output, .parquet (needs pyarrow) or .bin (NumPy memmap)")
+    parser.add_argument("--output-video", type=str, default=None, help="Optional annotated video (.mp4), slower")
+    parser.add_argument("--team1", type=str, default="Team 1", help="First team name")
+    parser.add_argument("--team1-color", type=str, default="#FFFFFF", help="First team players jersey color (hex)")
+    parser.add_argument("--team1-gk-color", type=str, default="#000000", help="First team goalkeeper jersey color (hex)")
+    parser.add_argument("--team2", type=str, default="Team 2", help="Second team name")
+    parser.add_argument("--team2-color", type=str, default="#FF0000", help="Second team players jersey color (hex)")
+    parser.add_argument("--team2-gk-color", type=str, default="#00FF00", help="Second team goalkeeper jersey color (hex)")
+    parser.add_argument("--p-conf", type=float, default=0.6, help="Players detection confidence threshold")
+    parser.add_argument("--k-conf", type=float, default=0.7, help="Field keypoints detection confidence threshold")
+    parser.add_argument("--k-d-tol", type=float, default=7, help="Keypoints displacement tolerance (pixels) before the homography is recomputed")
+    parser.add_argument("--num-pal-colors", type=int, default=3, help="Number of colors extracted from players bounding boxes for team prediction")
+    parser.add_argument("--ball-reset-frames", type=int, default=30, help="Frames without ball detection before the ball track is reset")
+    parser.add_argument("--ball-max-dist", type=int, default=100, help="Maximum distance between two consecutive ball detections to keep the track")
+    parser.add_argument("--ball-track-length", type=int, default=35, help="Maximum number of ball detections kept in the track")
+    parser.add_argument("--batch-size", type=int, default=None, help="Inference batch size (default: sized from the free memory)")
+    parser.add_argument("--keypoints-interval", type=int, default=5, help="Run the keypoints model at least every N frames (1 for every frame)")
+    parser.add_argument("--players-weights", type=str, default=PLAYERS_WEIGHTS, help="Players detection model weights")
+    parser.add_argument("--keypoints-weights", type=str, default=KEYPOINTS_WEIGHTS, help="Field keypoints detection model weights")
+    sys.exit(run_detection(parser.parse_args()))
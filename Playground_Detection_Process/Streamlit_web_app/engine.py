@@ -0,0 +1,346 @@
+# Import libraries
+import numpy as np
+import cv2
+import skimage
+from PIL import ImageColor
+
+import os
+import json
+import yaml
+import time
+
+from team_classification import TeamClassifier
+from tracking import PlayerTracker, TrackTeamCache
+from inference import FramePrefetcher, BatchedInference
+from keypoints_scheduler import KeypointScheduler
+from projection import project_points, to_int_point
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))            # Playground_Detection_Process directory
+
+def get_labels_dics():
+    # Get tactical map keypoints positions dictionary
+    json_path = os.path.join(BASE_DIR, "pitch map labels position.json")
+    with open(json_path, 'r') as f:
+        keypoints_map_pos = json.load(f)
+
+    # Get football field keypoints numerical to alphabetical mapping
+    yaml_path = os.path.join(BASE_DIR, "config pitch dataset.yaml")
+    with open(yaml_path, 'r') as file:
+        classes_names_dic = yaml.safe_load(file)
+    classes_names_dic = classes_names_dic['names']
+
+    # Get football field keypoints numerical to alphabetical mapping
+    yaml_path = os.path.join(BASE_DIR, "config players dataset.yaml")
+    with open(yaml_path, 'r') as file:
+        labels_dic = yaml.safe_load(file)
+    labels_dic = labels_dic['names']
+    return keypoints_map_pos, classes_names_dic, labels_dic
+
+def create_colors_info(team1_name, team1_p_color, team1_gk_color, team2_name, team2_p_color, team2_gk_color):
+    team1_p_color_rgb = ImageColor.getcolor(team1_p_color, "RGB")
+    team1_gk_color_rgb = ImageColor.getcolor(team1_gk_color, "RGB")
+    team2_p_color_rgb = ImageColor.getcolor(team2_p_color, "RGB")
+    team2_gk_color_rgb = ImageColor.getcolor(team2_gk_color, "RGB")
+
+    colors_dic = {
+        team1_name:[team1_p_color_rgb, team1_gk_color_rgb],
+        team2_name:[team2_p_color_rgb, team2_gk_color_rgb]
+    }
+    colors_list = colors_dic[team1_name]+colors_dic[team2_name] # Define color list to be used for detected player team prediction
+    color_list_lab = [skimage.color.rgb2lab([i/255 for i in c]) for c in colors_list] # Converting color_list to L*a*b* space
+    return colors_dic, color_list_lab
+
+class DetectionEngine:
+    """
+    Headless players, ball and tactical map detection over a video.
+
+    Runs the same pipeline as the Streamlit app (batched YOLOv8 inference,
+    field keypoints homography with camera motion propagation, player
+    tracking and team assignment, ball tracking) without any UI, and yields
+    a structured result per frame. Rendering and display are left to the
+    caller, so a consumer that only needs the data never pays for them.
+
+    Per-frame results are dicts:
+        frame_nbr: Frame number (1-based)
+        players: dict of arrays: bboxes (n,4 x,y,x,y), confs, track_ids, teams (team index),
+                 team_names, palettes and pitch_pos (n,2 tactical map coordinates, NaN if unknown)
+        referees: dict with bboxes, confs and pitch_pos
+        ball: None, or dict with bbox, conf, frame_pos and pitch_pos (None if not projectable)
+        keypoints: dict with bboxes, classes (label index), labels and pitch_pos (known tactical map position)
+                   of the detected field keypoints (empty on frames where the keypoints model was skipped)
+        homography: 3x3 frame to tactical map homography, or None before the first one
+        ball_track: List of recent ball positions on the tactical map
+    """
+    def __init__(self, model_players, model_keypoints, colors_dic, color_list_lab, hyper_params, ball_track_hyperparams,
+                 num_pal_colors, batch_size=None, keypoints_interval=5):
+        """
+        Args:
+            model_players: YOLO players, referees and ball detection model
+            model_keypoints: YOLO field keypoints detection model
+            colors_dic: Team name to [players color, goalkeeper color] (RGB), from create_colors_info()
+            color_list_lab: Team colors in L*a*b* space, from create_colors_info()
+            hyper_params: {0: players confidence, 1: keypoints confidence, 2: keypoints displacement tolerance}
+            ball_track_hyperparams: {0: frames without ball before reset, 1: max ball jump (pixels), 2: max track length}
+            num_pal_colors: Number of dominant colors used for team prediction
+            batch_size: Inference batch size, None to size it from the free memory
+            keypoints_interval: Run the keypoints model at least every this many frames (1 for every frame)
+        """
+        self.model_players = model_players
+        self.model_keypoints = model_keypoints
+        self.colors_dic = colors_dic
+        self.team_names = list(colors_dic.keys())
+
+        self.p_conf = hyper_params[0]
+        self.k_conf = hyper_params[1]
+        self.k_d_tol = hyper_params[2]
+
+        self.nbr_frames_no_ball_thresh = ball_track_hyperparams[0]
+        self.ball_track_dist_thresh = ball_track_hyperparams[1]
+        self.max_track_length = ball_track_hyperparams[2]
+
+        self.batch_size = batch_size
+        self.keypoints_interval = keypoints_interval
+
+        nbr_team_colors = len(list(colors_dic.values())[0])
+        self.team_classifier = TeamClassifier(color_list_lab, nbr_team_colors, num_pal_colors)
+        self.keypoints_map_pos, self.classes_names_dic, self.labels_dic = get_labels_dics()
+
+    def run(self, source, on_progress=None):
+        """
+        Run detection over a video
+
+        Args:
+            source: Video file path or cv2.VideoCapture
+            on_progress: Optional callback(frame_nbr, tot_nbr_frames) called after every frame
+
+        Returns:
+            Generator of (frame, result) for every frame that could be read, in order
+        """
+        cap = cv2.VideoCapture(source) if isinstance(source, str) else source
+        tot_nbr_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self._reset()
+        self.video_fps = cap.get(cv2.CAP_PROP_FPS) or None
+
+        # Decode frames on a background thread and run both models on batches of frames;
+        # the keypoints model only runs every keypoints_interval frames or when the camera moved
+        prefetcher = FramePrefetcher(cap, tot_nbr_frames)
+        keypoints_scheduler = KeypointScheduler(self.keypoints_interval) if self.keypoints_interval > 1 else None
+        inference = BatchedInference(self.model_players, self.model_keypoints, self.p_conf, self.k_conf, self.batch_size,
+                                     keypoints_scheduler=keypoints_scheduler)
+
+        start_time = time.perf_counter()
+        try:
+            for frame_nbr, success, frame, results_players, results_keypoints, frame_motion in inference.run(prefetcher):
+                if success:
+                    yield frame, self.process_frame(frame_nbr, frame, results_players, results_keypoints, frame_motion)
+                self.frames_processed = frame_nbr
+                self.elapsed = time.perf_counter() - start_time
+                if on_progress:
+                    on_progress(frame_nbr, tot_nbr_frames)
+        finally:
+            self.keypoints_stats = keypoints_scheduler.stats() if keypoints_scheduler else None
+            if isinstance(source, str):
+                cap.release()
+
+    def _reset(self):
+        """Clear the state carried from frame to frame"""
+        self.homog = None
+        self.detected_labels_prev = None
+        self.detected_labels_src_pts_prev = None
+        self.ball_track_history = {'src':[], 'dst':[]}
+        self.nbr_frames_no_ball = 0
+        self.player_tracker = PlayerTracker()                                       # Stable player IDs across frames
+        self.team_cache = TrackTeamCache(self.team_classifier)                      # Team predictions cached per track and voted over time
+        self.frames_processed = 0
+        self.elapsed = 0.0
+        self.keypoints_stats = None
+        self.video_fps = None
+
+    def process_frame(self, frame_nbr, frame, results_players, results_keypoints, frame_motion=None):
+        """
+        Process the detections of one frame
+
+        Args:
+            frame_nbr: Frame number
+            frame: Video frame (BGR)
+            results_players: Players model results for the frame (one-element list)
+            results_keypoints: Keypoints model results (one-element list), None if the model was skipped
+            frame_motion: Camera motion from the previous frame (3x3), None if unknown
+
+        Returns:
+            Frame result dict (see the class docstring)
+        """
+        if self.nbr_frames_no_ball > self.nbr_frames_no_ball_thresh:
+            self.ball_track_history = {'src':[], 'dst':[]}
+
+        ## Extract detections information
+        boxes_p = results_players[0].boxes
+        bboxes_p = boxes_p.xyxy.cpu().numpy()                                       # Detected players, referees and ball (x,y,x,y) bounding boxes
+        bboxes_p_c = boxes_p.xywh.cpu().numpy()                                     # Detected players, referees and ball (x,y,w,h) bounding boxes
+        labels_p = boxes_p.cls.cpu().numpy().astype(int)                            # Detected players, referees and ball labels
+        confs_p = boxes_p.conf.cpu().numpy()                                        # Detected players, referees and ball confidence level
+
+        if results_keypoints is not None:
+            bboxes_k = results_keypoints[0].boxes.xyxy.cpu().numpy()                # Detected field keypoints (x,y,x,y) bounding boxes
+            bboxes_k_c = results_keypoints[0].boxes.xywh.cpu().numpy()              # Detected field keypoints (x,y,w,h) bounding boxes
+            labels_k = list(results_keypoints[0].boxes.cls.cpu().numpy())           # Detected field keypoints labels list
+        else:                                                                       # Keypoints model skipped on this frame
+            bboxes_k, bboxes_k_c, labels_k = np.zeros((0,4)), np.zeros((0,4)), []
+
+        detected_labels = [self.classes_names_dic[i] for i in labels_k]             # Alphabetical keypoint labels
+        detected_labels_src_pts = np.round(bboxes_k_c[:,:2]).astype(int)            # Keypoints coordinates on the frame
+        detected_labels_dst_pts = np.array([self.keypoints_map_pos[i] for i in detected_labels])   # Keypoints coordinates on the tactical map
+
+        self._update_homography(detected_labels, detected_labels_src_pts, detected_labels_dst_pts, results_keypoints is not None, frame_motion)
+
+        players = labels_p == 0
+        referees = labels_p == 1
+        balls = labels_p == 2
+
+        # Foot positions of players and referees on the frame (x_center, y_center+h/2), center of the first detected ball
+        players_src_pts = bboxes_p_c[players,:2] + np.stack([np.zeros(players.sum()), bboxes_p_c[players,3]/2], axis=1)
+        referees_src_pts = bboxes_p_c[referees,:2] + np.stack([np.zeros(referees.sum()), bboxes_p_c[referees,3]/2], axis=1)
+        ball_idx = np.flatnonzero(balls)
+        ball_src_pos = bboxes_p_c[ball_idx[0],:2] if len(ball_idx) else None
+
+        ## Transform positions from frame plane to tactical map plane
+        if self.homog is not None:
+            players_dst_pts = project_points(self.homog, players_src_pts)
+            referees_dst_pts = project_points(self.homog, referees_src_pts)
+            self.nbr_frames_no_ball = 0 if ball_src_pos is not None else self.nbr_frames_no_ball + 1
+        else:
+            players_dst_pts = np.full((players.sum(), 2), np.nan)
+            referees_dst_pts = np.full((referees.sum(), 2), np.nan)
+
+        ball = None
+        if ball_src_pos is not None:
+            ball_dst_pos = to_int_point(project_points(self.homog, ball_src_pos)[0]) if self.homog is not None else None
+            ball = {'bbox': bboxes_p[ball_idx[0]], 'conf': float(confs_p[ball_idx[0]]),
+                    'frame_pos': ball_src_pos, 'pitch_pos': ball_dst_pos}
+            if ball_dst_pos is not None:
+                self._track_ball(ball_src_pos, ball_dst_pos)
+
+        ## Track players and predict their teams from their dominant jersey colors
+        bboxes_players = bboxes_p[players]
+        confs_players = confs_p[players]
+        track_ids = self.player_tracker.update(bboxes_players, confs_players)
+        teams, palettes = self.team_cache.predict(frame, bboxes_players, track_ids, frame_nbr, self.player_tracker.active_ids())
+
+        return {
+            'frame_nbr': frame_nbr,
+            'players': {
+                'bboxes': bboxes_players,
+                'confs': confs_players,
+                'track_ids': track_ids,
+                'teams': teams,
+                'team_names': [self.team_names[team] for team in teams],
+                'palettes': palettes,
+                'pitch_pos': players_dst_pts
+            },
+            'referees': {
+                'bboxes': bboxes_p[referees],
+                'confs': confs_p[referees],
+                'pitch_pos': referees_dst_pts
+            },
+            'ball': ball,
+            'keypoints': {
+                'bboxes': bboxes_k,
+                'classes': np.asarray(labels_k, dtype=int),
+                'labels': detected_labels,
+                'pitch_pos': detected_labels_dst_pts.reshape(-1, 2)
+            },
+            'homography': self.homog,
+            'ball_track': list(self.ball_track_history['dst'])
+        }
+
+    def _update_homography(self, detected_labels, detected_labels_src_pts, detected_labels_dst_pts, keypoints_ran, frame_motion):
+        """Recompute the homography from the keypoints when they moved, or follow the camera motion"""
+        ## Calculate Homography transformation matrix when more than 4 keypoints are detected
+        update_homography = False
+        if len(detected_labels) > 3:
+            # Always calculate homography matrix on the first frame with enough keypoints
+            if self.detected_labels_prev is not None:
+                # Determine common detected field keypoints between previous and current frames
+                common_labels = set(self.detected_labels_prev) & set(detected_labels)
+                # When at least 4 common keypoints are detected, determine if they are displaced on average beyond a certain tolerance level
+                if len(common_labels) > 3:
+                    common_label_idx_prev = [self.detected_labels_prev.index(i) for i in common_labels]
+                    common_label_idx_curr = [detected_labels.index(i) for i in common_labels]
+                    coor_common_label_prev = self.detected_labels_src_pts_prev[common_label_idx_prev]
+                    coor_common_label_curr = detected_labels_src_pts[common_label_idx_curr]
+                    coor_error = np.mean((coor_common_label_prev - coor_common_label_curr)**2)   # Mean squared error between previous and current common keypoints
+                    update_homography = coor_error > self.k_d_tol
+                else:
+                    update_homography = True
+            else:
+                update_homography = True
+
+            if update_homography:
+                self.homog, _ = cv2.findHomography(detected_labels_src_pts, detected_labels_dst_pts)
+
+        if self.homog is not None and not update_homography and frame_motion is not None:
+            # Follow the camera motion since the previous frame: frame points move by frame_motion, so the
+            # frame to tactical map transform becomes homog * frame_motion^-1
+            self.homog = self.homog @ np.linalg.inv(frame_motion)
+            if not keypoints_ran and self.detected_labels_src_pts_prev is not None and len(self.detected_labels_src_pts_prev) > 0:
+                self.detected_labels_src_pts_prev = project_points(frame_motion, self.detected_labels_src_pts_prev)
+
+        if self.homog is not None and keypoints_ran:
+            self.detected_labels_prev = list(detected_labels)                       # Save current detected keypoint labels for next frame
+            self.detected_labels_src_pts_prev = detected_labels_src_pts.copy()      # Save current detected keypoint coordinates for next frame
+
+    def _track_ball(self, ball_src_pos, ball_dst_pos):
+        """Extend the ball track, or restart it when the ball jumped too far"""
+        src = (int(ball_src_pos[0]), int(ball_src_pos[1]))
+        history = self.ball_track_history
+        if len(history['src']) > 0 and np.linalg.norm(ball_src_pos - history['src'][-1]) >= self.ball_track_dist_thresh:
+            history['src'], history['dst'] = [], []
+        history['src'].append(src)
+        history['dst'].append(ball_dst_pos)
+        if len(history['src']) > self.max_track_length:
+            history['src'].pop(0)
+            history['dst'].pop(0)
+
+    def stats(self):
+        """Return throughput and component statistics of the last run"""
+        return {
+            'frames': self.frames_processed,
+            'elapsed_s': round(self.elapsed, 2),
+            'fps': round(self.frames_processed / self.elapsed, 2) if self.elapsed else None,
+            'keypoints': self.keypoints_stats,
+            'team_cache': self.team_cache.stats() if hasattr(self, 'team_cache') else None
+        }
+
+def result_to_json(result):
+    """
+    Convert a frame result to JSON-serializable values
+
+    Args:
+        result: Frame result dict from DetectionEngine
+
+    Returns:
+        Dict of lists, numbers and None (NaN positions become None)
+    """
+    def points(arr):
+        return [None if not np.all(np.isfinite(p)) else [round(float(p[0]), 2), round(float(p[1]), 2)] for p in arr]
+
+    players, referees, ball = result['players'], result['referees'], result['ball']
+    return {
+        'frame_nbr': result['frame_nbr'],
+        'players': [
+            {'track_id': track_id, 'team': team_name, 'bbox': [round(float(v), 1) for v in bbox],
+             'conf': round(float(conf), 3), 'pitch_pos': pos}
+            for track_id, team_name, bbox, conf, pos in zip(players['track_ids'], players['team_names'], players['bboxes'],
+                                                            players['confs'], points(players['pitch_pos']))
+        ],
+        'referees': [
+            {'bbox': [round(float(v), 1) for v in bbox], 'conf': round(float(conf), 3), 'pitch_pos': pos}
+            for bbox, conf, pos in zip(referees['bboxes'], referees['confs'], points(referees['pitch_pos']))
+        ],
+        'ball': None if ball is None else {
+            'bbox': [round(float(v), 1) for v in ball['bbox']], 'conf': round(ball['conf'], 3),
+            'frame_pos': [round(float(v), 1) for v in ball['frame_pos']],
+            'pitch_pos': list(ball['pitch_pos']) if ball['pitch_pos'] is not None else None
+        },
+        'homography': None if result['homography'] is None else np.round(result['homography'], 8).tolist()
+    }
@@ -0,0 +1,197 @@
+# Import libraries
+import os
+import queue
+import threading
+
+# Rough peak memory of one 640x640 frame going through both YOLOv8 models (L players + M keypoints) on CPU,
+# activations included. Used to size batches; lower it if your models run at a smaller image size.
+BYTES_PER_FRAME = 350 * 1024**2
+MEMORY_FRACTION = 0.5                                                               # Share of the free memory a batch may use
+MAX_BATCH_SIZE = 16
+
+def available_memory(device=None):
+    """
+    Free memory on the inference device in bytes
+
+    Args:
+        device: Torch device the models run on ('cuda:0', 'cpu', ...), None for CPU
+
+    Returns:
+        Free memory in bytes, or None if it cannot be determined
+    """
+    if device is not None and str(device).startswith('cuda'):
+        try:
+            import torch
+            free, _ = torch.cuda.mem_get_info(device)
+            return free
+        except Exception:
+            return None
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def adaptive_batch_size(device=None, max_batch_size=MAX_BATCH_SIZE, bytes_per_frame=BYTES_PER_FRAME):
+    """
+    Largest batch that fits in the free memory of the inference device
+
+    Args:
+        device: Torch device the models run on, None for CPU
+        max_batch_size: Upper bound on the batch size
+        bytes_per_frame: Estimated peak memory per frame
+
+    Returns:
+        Batch size between 1 and max_batch_size
+    """
+    free = available_memory(device)
+    if free is None:
+        return min(4, max_batch_size)
+    return max(1, min(max_batch_size, int(free * MEMORY_FRACTION // bytes_per_frame)))
+
+class FramePrefetcher:
+    """
+    Decodes video frames on a background thread, ahead of inference.
+
+    cv2 releases the GIL while decoding, so reading the next frames overlaps
+    with model inference on the main thread. At most `queue_size` decoded
+    frames are held in memory.
+    """
+    def __init__(self, cap, tot_nbr_frames, queue_size=32):
+        """
+        Args:
+            cap: cv2.VideoCapture to read from
+            tot_nbr_frames: Number of frames to read
+            queue_size: Maximum number of decoded frames waiting for inference
+        """
+        self.cap = cap
+        self.tot_nbr_frames = tot_nbr_frames
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+
+    def __iter__(self):
+        """Yield (frame_nbr, success, frame) for every frame, in order"""
+        self.thread.start()
+        try:
+            while True:
+                item = self.frames.get()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop decoding, e.g. when the consumer exits early"""
+        self.stopped.set()
+        while self.thread.is_alive():
+            try:
+                self.frames.get_nowait()                                            # Unblock a reader waiting on a full queue
+            except queue.Empty:
+                self.thread.join(timeout=0.05)
+
+    def _read(self):
+        for frame_nbr in range(1, self.tot_nbr_frames+1):
+            if self.stopped.is_set():
+                break
+            success, frame = self.cap.read()
+            self.frames.put((frame_nbr, success, frame))
+        self.frames.put(None)
+
+class BatchedInference:
+    """
+    Runs the players and keypoints models on batches of frames.
+
+    Frames from a FramePrefetcher are gathered into batches, each model is
+    called once per batch, and the results are handed back frame by frame in
+    the original order, wrapped in one-element lists like a per-frame model
+    call returns. The batch size defaults to what fits in the free memory of
+    the device and is halved if a batch runs out of memory.
+
+    With a KeypointScheduler, the keypoints model only runs on the frames the
+    scheduler picks; the other frames get no keypoints results but the camera
+    motion from the previous frame, to propagate the homography.
+    """
+    def __init__(self, model_players, model_keypoints, p_conf, k_conf, batch_size=None, max_batch_size=MAX_BATCH_SIZE,
+                 keypoints_scheduler=None):
+        """
+        Args:
+            model_players: YOLO players, referees and ball detection model
+            model_keypoints: YOLO field keypoints detection model
+            p_conf: Players model confidence threshold
+            k_conf: Keypoints model confidence threshold
+            batch_size: Fixed batch size, or None to size it from the free memory
+            max_batch_size: Upper bound on the adaptive batch size
+            keypoints_scheduler: Optional KeypointScheduler to skip the keypoints model on some frames
+        """
+        self.model_players = model_players
+        self.model_keypoints = model_keypoints
+        self.p_conf = p_conf
+        self.k_conf = k_conf
+        if batch_size is None:
+            batch_size = adaptive_batch_size(getattr(model_players, 'device', None), max_batch_size)
+        self.batch_size = batch_size
+        self.keypoints_scheduler = keypoints_scheduler
+
+    def run(self, frames):
+        """
+        Run inference on a stream of frames
+
+        Args:
+            frames: Iterable of (frame_nbr, success, frame), e.g. a FramePrefetcher
+
+        Returns:
+            Generator of (frame_nbr, success, frame, results_players, results_keypoints, frame_motion),
+            with None results for frames that could not be read, None keypoints results for frames
+            the scheduler skipped, and the camera motion from the previous frame (3x3) or None
+        """
+        batch = []
+        for item in frames:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                yield from self._process(batch)
+                batch = []
+        if batch:
+            yield from self._process(batch)
+
+    def _process(self, batch):
+        images = [frame for _, success, frame in batch if success]
+
+        # Frames are planned in order, the scheduler estimates the camera motion between consecutive frames
+        plans = [self.keypoints_scheduler.plan(image) for image in images] if self.keypoints_scheduler else [(True, None)] * len(images)
+        keypoints_idx = [k for k, (run_keypoints, _) in enumerate(plans) if run_keypoints]
+
+        results_players = self._predict(self.model_players, images, self.p_conf) if images else []
+        results_keypoints = [None] * len(images)
+        if keypoints_idx:
+            for k, result in zip(keypoints_idx, self._predict(self.model_keypoints, [images[k] for k in keypoints_idx], self.k_conf)):
+                results_keypoints[k] = [result]
+
+        ## Scatter the batch results back to their frames
+        k = 0
+        for frame_nbr, success, frame in batch:
+            if success:
+                yield frame_nbr, success, frame, [results_players[k]], results_keypoints[k], plans[k][1]
+                k += 1
+            else:
+                yield frame_nbr, success, frame, None, None, None
+
+    def _predict(self, model, images, conf):
+        try:
+            return model(images, conf=conf, verbose=False)
+        except (MemoryError, RuntimeError) as e:
+            if len(images) == 1 or (isinstance(e, RuntimeError) and 'out of memory' not in str(e)):
+                raise
+            # Out of memory: halve the batch size for the rest of the video and redo this batch in smaller chunks
+            batch_size = max(1, len(images) // 2)
+            self.batch_size = min(self.batch_size, batch_size)
+            print(f"Inference ran out of memory, reducing batch size to {self.batch_size}")
+            results = []
+            for start in range(0, len(images), batch_size):
+                results.extend(self._predict(model, images[start:start+batch_size], conf))
+            return results
@@ -0,0 +1,129 @@
+# Import libraries
+import numpy as np
+import cv2
+
+def estimate_frame_motion(prev_gray, gray, scale=1.0, max_features=200, line_mask=None):
+    """
+    Estimate the camera motion between two consecutive frames
+
+    Corners are tracked from the previous to the current frame with sparse
+    (Lucas-Kanade) optical flow, preferably on the pitch lines, and a
+    homography is fitted with RANSAC so moving players are rejected as
+    outliers.
+
+    Args:
+        prev_gray: Previous frame, grayscale (possibly downscaled)
+        gray: Current frame, grayscale, same size as prev_gray
+        scale: Downscale factor of the grayscale frames relative to the original frames
+        max_features: Maximum number of corners to track
+        line_mask: Optional uint8 mask of the previous frame where corners are searched first
+
+    Returns:
+        Tuple of (3x3 matrix mapping previous to current original frame
+        coordinates, median displacement in original pixels), or (None, None)
+        if the motion could not be estimated
+    """
+    pts = None
+    if line_mask is not None:
+        pts = cv2.goodFeaturesToTrack(prev_gray, max_features, 0.01, 7, mask=line_mask)
+    if pts is None or len(pts) < 20:
+        pts = cv2.goodFeaturesToTrack(prev_gray, max_features, 0.01, 7)             # Not enough line corners (e.g. close-up), use the whole frame
+    if pts is None or len(pts) < 8:
+        return None, None
+
+    next_pts, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, pts, None, winSize=(21, 21), maxLevel=3)
+    good = status.ravel() == 1
+    if good.sum() < 8:
+        return None, None
+    src, dst = pts[good].reshape(-1, 2), next_pts[good].reshape(-1, 2)
+
+    motion, inliers = cv2.findHomography(src, dst, cv2.RANSAC, 1.0)
+    if motion is None or inliers.sum() < 8:
+        return None, None
+
+    # Express the motion in original frame coordinates: M = D^-1 * M_small * D with D = diag(scale, scale, 1)
+    d = np.diag([scale, scale, 1.0])
+    motion = np.linalg.inv(d) @ motion @ d
+    inliers = inliers.ravel() == 1
+    displacement = float(np.median(np.linalg.norm(dst[inliers] - src[inliers], axis=1))) / scale
+    return motion, displacement
+
+class KeypointScheduler:
+    """
+    Decides on which frames the field keypoints model has to run.
+
+    The keypoints model runs every `interval` frames, or as soon as the
+    camera has moved more than `motion_thresh` pixels since it last ran, or
+    when the camera motion cannot be estimated (cut, fast pan, occlusion).
+    On the other frames, the caller propagates the homography with the
+    frame-to-frame motion returned by plan(). A static camera therefore
+    needs the keypoints model on one frame out of `interval` only.
+    """
+    def __init__(self, interval=5, motion_thresh=15.0, work_width=480, max_features=200):
+        """
+        Args:
+            interval: Maximum number of frames between two keypoints model runs
+            motion_thresh: Accumulated camera motion (pixels) that triggers a keypoints model run
+            work_width: Width frames are downscaled to for motion estimation
+            max_features: Maximum number of corners tracked between frames
+        """
+        self.interval = interval
+        self.motion_thresh = motion_thresh
+        self.work_width = work_width
+        self.max_features = max_features
+
+        self.prev_gray = None
+        self.prev_mask = None
+        self.frames_since_keypoints = 0
+        self.motion_since_keypoints = 0.0
+
+        self.frames = 0
+        self.keypoints_frames = 0
+
+    def plan(self, frame):
+        """
+        Plan the next frame, in frame order
+
+        Args:
+            frame: Video frame (BGR)
+
+        Returns:
+            Tuple of (whether to run the keypoints model, 3x3 camera motion
+            from the previous frame or None if unknown)
+        """
+        scale = min(1.0, self.work_width / frame.shape[1])
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        motion, displacement = None, None
+        if self.prev_gray is not None and self.prev_gray.shape == gray.shape:
+            motion, displacement = estimate_frame_motion(self.prev_gray, gray, scale, self.max_features, self.prev_mask)
+        self.prev_gray = gray
+        self.prev_mask = _pitch_lines_mask(small)
+
+        run_keypoints = (motion is None
+                         or self.frames_since_keypoints + 1 >= self.interval
+                         or self.motion_since_keypoints + displacement > self.motion_thresh)
+        if run_keypoints:
+            self.frames_since_keypoints = 0
+            self.motion_since_keypoints = 0.0
+            self.keypoints_frames += 1
+        else:
+            self.frames_since_keypoints += 1
+            self.motion_since_keypoints += displacement
+        self.frames += 1
+        return run_keypoints, motion
+
+    def stats(self):
+        """Return how often the keypoints model ran"""
+        return {
+            'frames': self.frames,
+            'keypoints_frames': self.keypoints_frames,
+            'keypoints_ratio': round(self.keypoints_frames / self.frames, 3) if self.frames else None
+        }
+
+def _pitch_lines_mask(frame):
+    """Mask of bright, unsaturated pixels (pitch lines), slightly dilated"""
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    mask = cv2.inRange(hsv, (0, 0, 170), (180, 60, 255))
+    return cv2.dilate(mask, np.ones((5, 5), np.uint8))
@@ -195,6 +195,8 @@ def main():
                 output_file_name = st.text_input(label='File Name (Optional)', placeholder='Enter output video file name.')
             else:
                 output_file_name = None
+            export_tracking = st.checkbox(label='Export tracking data', value=False,
+                                          help="Save players, referees, ball and keypoints positions (frame and tactical map), teams and track IDs of every frame to a Parquet file in ./outputs/")
         st.markdown("---")
 
         
@@ -248,7 +250,7 @@ def main():
         st.toast(f'Detection Started!')
         status = detect(cap, stframe, output_file_name, save_output, model_players, model_keypoints,
                          detection_hyper_params, ball_track_hyperparams, plot_hyperparams,
-                           num_pal_colors, colors_dic, color_list_lab)
+                           num_pal_colors, colors_dic, color_list_lab, export_tracking=export_tracking)
     else:
         try:
             # Release the video capture object and close the display window
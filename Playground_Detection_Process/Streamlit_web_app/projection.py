@@ -0,0 +1,73 @@
+# Import libraries
+import numpy as np
+
+# Homogeneous coordinates with |w| below this are treated as points at infinity (e.g. above the horizon)
+W_EPS = 1e-9
+# Number of points projected per chunk by project_frames(), bounds the temporary memory
+CHUNK_SIZE = 1_000_000
+
+def project_points(homog, points):
+    """
+    Project frame points with a homography, e.g. onto the tactical map
+
+    Args:
+        homog: 3x3 homography matrix
+        points: Points (x, y), array-like of shape (N, 2) or a single point of shape (2,)
+
+    Returns:
+        Projected points as a float array of shape (N, 2). Points whose
+        homogeneous w is (close to) zero or not finite are NaN instead of
+        raising or producing inf.
+    """
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    homog = np.asarray(homog, dtype=np.float64)
+    dst = pts @ homog[:, :2].T + homog[:, 2]                                         # (x, y, 1) @ H^T for all points at once
+    return _dehomogenize(dst)
+
+def project_frames(homogs, frame_idx, points, chunk_size=CHUNK_SIZE):
+    """
+    Project points from many frames, each frame with its own homography
+
+    Meant for whole-match position data (millions of rows): the per-point
+    homographies are gathered and applied chunk by chunk with one einsum.
+
+    Args:
+        homogs: Homographies of shape (F, 3, 3), NaN for frames without one
+        frame_idx: Index into homogs of each point, shape (N,)
+        points: Points (x, y), shape (N, 2)
+        chunk_size: Number of points projected at once
+
+    Returns:
+        Projected points of shape (N, 2), NaN where the homography is missing or degenerate
+    """
+    homogs = np.asarray(homogs, dtype=np.float64).reshape(-1, 3, 3)
+    frame_idx = np.asarray(frame_idx)
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    out = np.empty_like(pts)
+    for start in range(0, len(pts), chunk_size):
+        end = start + chunk_size
+        h = homogs[frame_idx[start:end]]
+        dst = np.einsum('nij,nj->ni', h[:, :, :2], pts[start:end]) + h[:, :, 2]
+        out[start:end] = _dehomogenize(dst)
+    return out
+
+def to_int_point(point):
+    """
+    Pixel coordinates of a projected point for drawing
+
+    Args:
+        point: Projected point (x, y)
+
+    Returns:
+        Tuple of ints, or None if the point is NaN
+    """
+    if not np.all(np.isfinite(point)):
+        return None
+    return int(point[0]), int(point[1])
+
+def _dehomogenize(dst):
+    w = dst[:, 2]
+    valid = np.isfinite(w) & (np.abs(w) > W_EPS)
+    out = np.full((len(dst), 2), np.nan)
+    out[valid] = dst[valid, :2] / w[valid, np.newaxis]
+    return out
@@ -0,0 +1,100 @@
+# Import libraries
+import numpy as np
+import skimage
+
+# Quantized color grid: 6 levels per channel (0, 51, ..., 255), i.e. the 216 colors of the web palette
+GRID_LEVELS = 6
+GRID_STEP = 255 // (GRID_LEVELS - 1)
+NBR_GRID_COLORS = GRID_LEVELS ** 3
+
+GRID_LUT = np.rint(np.arange(256) / GRID_STEP).astype(np.int32)                    # Maps a channel value (0-255) to its grid level
+GRID_RGB = np.stack(np.meshgrid(np.arange(GRID_LEVELS), np.arange(GRID_LEVELS),    # RGB color of every grid cell, cell index = r*36 + g*6 + b
+                                np.arange(GRID_LEVELS), indexing='ij'), axis=-1).reshape(-1, 3) * GRID_STEP
+GRID_LAB = skimage.color.rgb2lab(GRID_RGB[np.newaxis] / 255)[0]                    # L*a*b* values of the grid colors, converted once in one call
+
+def center_filter_box(bbox):
+    """
+    Jersey area of a player bounding box, as used for the color palette
+
+    Args:
+        bbox: Player bounding box (x1, y1, x2, y2)
+
+    Returns:
+        Tuple of (y1, y2, x1, x2) in frame coordinates
+    """
+    x1, y1, x2, y2 = int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3])
+    obj_img_w, obj_img_h = x2 - x1, y2 - y1
+    center_filter_x1 = max((obj_img_w//2)-(obj_img_w//5), 1)
+    center_filter_x2 = (obj_img_w//2)+(obj_img_w//5)
+    center_filter_y1 = max((obj_img_h//3)-(obj_img_h//5), 1)
+    center_filter_y2 = (obj_img_h//3)+(obj_img_h//5)
+    return (y1 + center_filter_y1, y1 + center_filter_y2,
+            x1 + center_filter_x1, x1 + center_filter_x2)
+
+class TeamClassifier:
+    """
+    Predicts the team of every detected player of a frame in one batch.
+
+    Each player's jersey area is quantized on the 216-color web palette grid
+    and the colors are counted with a single histogram over all players. The
+    `num_pal_colors` most frequent colors of each player vote for the team
+    whose color is closest in L*a*b* space. Since the grid is fixed, the
+    grid colors are converted to L*a*b* and matched to the team colors once,
+    when the classifier is created, so a frame only needs a lookup.
+    """
+    def __init__(self, color_list_lab, nbr_team_colors, num_pal_colors):
+        """
+        Args:
+            color_list_lab: Team colors in L*a*b* space, nbr_team_colors consecutive colors per team
+            nbr_team_colors: Number of colors per team (players, goalkeeper)
+            num_pal_colors: Number of dominant colors of each player used for the vote
+        """
+        self.nbr_team_colors = nbr_team_colors
+        self.num_pal_colors = num_pal_colors
+        self.nbr_teams = len(color_list_lab) // nbr_team_colors
+
+        # Euclidean distance in Lab space (CIE76) between every grid color and every team color
+        distances = np.linalg.norm(GRID_LAB[:, np.newaxis, :] - np.asarray(color_list_lab)[np.newaxis, :, :], axis=-1)
+        self.grid_team = distances.argmin(axis=1) // nbr_team_colors                # Team index voted for by each grid color
+
+    def predict(self, frame, bboxes, bgr=True):
+        """
+        Predict the team of each player
+
+        Args:
+            frame: Video frame (BGR by default)
+            bboxes: Player bounding boxes (x, y, x, y), array of shape (n, 4)
+            bgr: Whether the frame is BGR (True) or RGB (False)
+
+        Returns:
+            Tuple of (team index per player as a list, color palette per player
+            as a list of [r, g, b] colors from most to least frequent)
+        """
+        nbr_players = len(bboxes)
+        if nbr_players == 0:
+            return [], []
+
+        r_channel, b_channel = (2, 0) if bgr else (0, 2)
+        crops = []
+        for bbox in bboxes:
+            y1, y2, x1, x2 = center_filter_box(bbox)
+            crops.append(frame[max(y1, 0):max(y2, 0), max(x1, 0):max(x2, 0)].reshape(-1, 3))        # Jersey pixels of the player
+        owners = np.repeat(np.arange(nbr_players) * NBR_GRID_COLORS, [len(crop) for crop in crops])  # Offset so all players share one histogram
+        levels = GRID_LUT[np.concatenate(crops)]                                                      # Grid levels of all jersey pixels
+        cells = levels[:, r_channel] * GRID_LEVELS**2 + levels[:, 1] * GRID_LEVELS + levels[:, b_channel] + owners
+        counts = np.bincount(cells, minlength=nbr_players * NBR_GRID_COLORS).reshape(nbr_players, NBR_GRID_COLORS)
+
+        # Dominant colors of every player, most frequent first; colors absent from the crop do not vote
+        top = np.argsort(-counts, axis=1, kind='stable')[:, :self.num_pal_colors]
+        present = np.take_along_axis(counts, top, axis=1) > 0
+        votes = self.grid_team[top]                                                                  # Team voted for by each dominant color
+
+        # Majority vote; ties go to the team of the most frequent color, as in list.count voting
+        team_ids = np.arange(self.nbr_teams)
+        is_vote = (votes[:, :, np.newaxis] == team_ids) & present[:, :, np.newaxis]
+        nbr_votes = is_vote.sum(axis=1)
+        first_vote = np.where(is_vote.any(axis=1), is_vote.argmax(axis=1), self.num_pal_colors)
+        players_teams = (nbr_votes * (self.num_pal_colors + 1) - first_vote).argmax(axis=1)
+
+        palettes = [GRID_RGB[top[i][present[i]]].tolist() for i in range(nbr_players)]
+        return players_teams.tolist(), palettes
@@ -0,0 +1,259 @@
+# Import libraries
+import numpy as np
+from collections import Counter, deque
+from scipy.optimize import linear_sum_assignment
+
+def iou_matrix(bboxes_a, bboxes_b):
+    """
+    Intersection over union of every pair of boxes
+
+    Args:
+        bboxes_a: Boxes (x, y, x, y), array of shape (n, 4)
+        bboxes_b: Boxes (x, y, x, y), array of shape (m, 4)
+
+    Returns:
+        IoU matrix of shape (n, m)
+    """
+    a = np.asarray(bboxes_a, dtype=float).reshape(-1, 4)[:, np.newaxis, :]
+    b = np.asarray(bboxes_b, dtype=float).reshape(-1, 4)[np.newaxis, :, :]
+    inter_w = np.maximum(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0)
+    inter_h = np.maximum(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+class PlayerTracker:
+    """
+    ByteTrack-style multi-object tracker assigning stable IDs to player boxes.
+
+    Every frame, the track boxes are predicted with constant velocity Kalman
+    filters and matched to the detections by IoU in two rounds: first the
+    confident detections, then the remaining tracks against the
+    low-confidence ones, which keeps players tracked through partial
+    occlusions. Unmatched confident detections start new tracks, and tracks
+    not seen for `max_age` frames are dropped.
+
+    The filter state of a track is (cx, cy, w, h, vx, vy, vw, vh) and all
+    tracks are predicted and updated together as stacked arrays. Noise
+    scales with the box height, so near and far players are tracked with the
+    same relative uncertainty.
+    """
+    F = np.eye(8) + np.eye(8, k=4)                                                  # Transition: position += velocity
+    POS_STD = 1 / 20                                                                # Position noise relative to box height
+    VEL_STD = 1 / 160                                                               # Velocity noise relative to box height
+
+    def __init__(self, high_conf=0.5, match_iou=0.3, low_match_iou=0.5, max_age=30):
+        """
+        Args:
+            high_conf: Detections at or above this confidence are matched first and can start tracks
+            match_iou: Minimum IoU for a match with a confident detection
+            low_match_iou: Minimum IoU for a match with a low-confidence detection
+            max_age: Number of frames a track is kept without a match
+        """
+        self.high_conf = high_conf
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.max_age = max_age
+
+        self.ids = np.zeros(0, dtype=int)                                           # Track IDs
+        self.means = np.zeros((0, 8))                                               # Kalman state means
+        self.covs = np.zeros((0, 8, 8))                                             # Kalman state covariances
+        self.last_seen = np.zeros(0, dtype=int)                                     # Frame number of the last match
+        self.next_id = 1
+        self.frame_nbr = 0
+
+    def update(self, bboxes, confs):
+        """
+        Match the detections of a new frame to the tracks
+
+        Args:
+            bboxes: Player bounding boxes (x, y, x, y), array of shape (n, 4)
+            confs: Detection confidences, length n
+
+        Returns:
+            List of track IDs aligned with bboxes, -1 for detections without a track
+        """
+        self.frame_nbr += 1
+        bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        confs = np.asarray(confs, dtype=float)
+        track_ids = np.full(len(bboxes), -1)
+
+        self._predict()
+        track_bboxes = _cxcywh_to_xyxy(self.means[:, :4])
+
+        high = np.flatnonzero(confs >= self.high_conf)
+        low = np.flatnonzero(confs < self.high_conf)
+
+        # First round: all tracks against the confident detections
+        matched_tracks, matched_dets = self._match(np.arange(len(self.ids)), high, track_bboxes, bboxes, self.match_iou)
+        # Second round: remaining tracks against the low-confidence detections
+        unmatched_tracks = np.setdiff1d(np.arange(len(self.ids)), matched_tracks)
+        low_tracks, low_dets = self._match(unmatched_tracks, low, track_bboxes, bboxes, self.low_match_iou)
+        matched_tracks = np.concatenate([matched_tracks, low_tracks])
+        matched_dets = np.concatenate([matched_dets, low_dets])
+
+        if len(matched_tracks):
+            self._correct(matched_tracks, bboxes[matched_dets])
+            self.last_seen[matched_tracks] = self.frame_nbr
+            track_ids[matched_dets] = self.ids[matched_tracks]
+
+        # Unmatched confident detections start new tracks
+        new = high[track_ids[high] == -1]
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+            self._add(new_ids, bboxes[new])
+            track_ids[new] = new_ids
+
+        keep = self.frame_nbr - self.last_seen <= self.max_age
+        self.ids, self.means, self.covs, self.last_seen = self.ids[keep], self.means[keep], self.covs[keep], self.last_seen[keep]
+        return track_ids.tolist()
+
+    def active_ids(self):
+        """IDs of the tracks currently kept"""
+        return set(self.ids.tolist())
+
+    def _noise(self, std):
+        """Diagonal covariances from per-track standard deviations of shape (n, k)"""
+        noise = np.zeros((len(std), std.shape[1], std.shape[1]))
+        idx = np.arange(std.shape[1])
+        noise[:, idx, idx] = std**2
+        return noise
+
+    def _add(self, new_ids, bboxes):
+        measurements = _xyxy_to_cxcywh(bboxes)
+        h = measurements[:, 3:4]
+        means = np.hstack([measurements, np.zeros_like(measurements)])
+        std = np.hstack([np.repeat(2*self.POS_STD*h, 4, axis=1), np.repeat(10*self.VEL_STD*h, 4, axis=1)])
+        self.ids = np.concatenate([self.ids, new_ids])
+        self.means = np.vstack([self.means, means])
+        self.covs = np.concatenate([self.covs, self._noise(std)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(len(new_ids), self.frame_nbr)])
+
+    def _predict(self):
+        if not len(self.ids):
+            return
+        h = self.means[:, 3:4]
+        std = np.hstack([np.repeat(self.POS_STD*h, 4, axis=1), np.repeat(self.VEL_STD*h, 4, axis=1)])
+        self.means = self.means @ self.F.T
+        self.covs = self.F @ self.covs @ self.F.T + self._noise(std)
+
+    def _correct(self, tracks, bboxes):
+        """Kalman update of the given tracks with their matched boxes"""
+        means, covs = self.means[tracks], self.covs[tracks]
+        r = self._noise(np.repeat(self.POS_STD*means[:, 3:4], 4, axis=1))
+        s = covs[:, :4, :4] + r                                                     # Innovation covariance (H selects the first 4 state values)
+        gain = covs[:, :, :4] @ np.linalg.inv(s)
+        innovation = _xyxy_to_cxcywh(bboxes) - means[:, :4]
+        self.means[tracks] = means + (gain @ innovation[:, :, np.newaxis])[:, :, 0]
+        self.covs[tracks] = covs - gain @ covs[:, :4, :]
+
+    def _match(self, track_idx, det_idx, track_bboxes, bboxes, min_iou):
+        """Assign detections to tracks by maximum IoU; returns matched track and detection indexes"""
+        if len(track_idx) == 0 or len(det_idx) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        iou = iou_matrix(track_bboxes[track_idx], bboxes[det_idx])
+        rows, cols = linear_sum_assignment(-iou)
+        ok = iou[rows, cols] >= min_iou
+        return track_idx[rows[ok]], det_idx[cols[ok]]
+
+class TrackTeamCache:
+    """
+    Per-track team assignment decided by majority vote over time.
+
+    A track is classified when it appears, then only every
+    `reclassify_interval` frames, or on every frame while its vote is not
+    yet settled (vote share below `min_share` or fewer than `min_votes`
+    votes). Detections without a track are classified on every frame. All
+    classifications of a frame go to the team classifier in one batch.
+    """
+    def __init__(self, classifier, reclassify_interval=15, min_votes=3, min_share=0.75, history=15):
+        """
+        Args:
+            classifier: TeamClassifier used for the frame-level predictions
+            reclassify_interval: Frames between two classifications of a settled track
+            min_votes: Number of votes before a track's team can be settled
+            min_share: Share of votes the majority team needs to be settled
+            history: Number of most recent votes kept per track
+        """
+        self.classifier = classifier
+        self.reclassify_interval = reclassify_interval
+        self.min_votes = min_votes
+        self.min_share = min_share
+        self.history = history
+        self.tracks = {}
+        self.classified = 0
+        self.cached = 0
+
+    def predict(self, frame, bboxes, track_ids, frame_nbr, active_ids=None):
+        """
+        Team of each player, from the cache where possible
+
+        Args:
+            frame: Video frame (BGR)
+            bboxes: Player bounding boxes (x, y, x, y), array of shape (n, 4)
+            track_ids: Track ID of each box, -1 for untracked boxes
+            frame_nbr: Current frame number
+            active_ids: IDs of the tracks still kept by the tracker, to drop the others
+
+        Returns:
+            Tuple of (team index per player, color palette per player)
+        """
+        if active_ids is not None:
+            for track_id in list(self.tracks):
+                if track_id not in active_ids:
+                    del self.tracks[track_id]
+
+        to_classify = [i for i, track_id in enumerate(track_ids) if self._needs_classification(track_id, frame_nbr)]
+        teams, palettes = [None] * len(track_ids), [None] * len(track_ids)
+
+        if to_classify:
+            new_teams, new_palettes = self.classifier.predict(frame, np.asarray(bboxes)[to_classify])
+            for i, team, palette in zip(to_classify, new_teams, new_palettes):
+                teams[i], palettes[i] = team, palette
+                track_id = track_ids[i]
+                if track_id != -1:
+                    self._vote(track_id, team, palette, frame_nbr)
+        self.classified += len(to_classify)
+        self.cached += len(track_ids) - len(to_classify)
+
+        for i, track_id in enumerate(track_ids):
+            if track_id != -1:
+                state = self.tracks[track_id]
+                teams[i], palettes[i] = state['team'], state['palette']
+        return teams, palettes
+
+    def _vote(self, track_id, team, palette, frame_nbr):
+        """Add a classification to a track and update its majority team"""
+        state = self.tracks.setdefault(track_id, {'votes': deque(maxlen=self.history)})
+        state['votes'].append(team)
+        team, count = Counter(state['votes']).most_common(1)[0]                    # Majority vote over the track history
+        state['team'] = team
+        state['settled'] = len(state['votes']) >= self.min_votes and count / len(state['votes']) >= self.min_share
+        state['palette'] = palette
+        state['last_classified'] = frame_nbr
+
+    def _needs_classification(self, track_id, frame_nbr):
+        state = self.tracks.get(track_id)
+        if state is None or not state['settled']:
+            return True
+        return frame_nbr - state['last_classified'] >= self.reclassify_interval
+
+    def stats(self):
+        """Return how many team predictions were computed and served from the cache"""
+        total = self.classified + self.cached
+        return {
+            'classified': self.classified,
+            'cached': self.cached,
+            'cache_hit_rate': round(self.cached / total, 3) if total else None
+        }
+
+def _xyxy_to_cxcywh(bboxes):
+    x1, y1, x2, y2 = bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3]
+    return np.stack([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], axis=1)
+
+def _cxcywh_to_xyxy(boxes):
+    cx, cy, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    return np.stack([cx - w/2, cy - h/2, cx + w/2, cy + h/2], axis=1)
@@ -0,0 +1,218 @@
+# Import libraries
+import numpy as np
+
+import os
+import json
+
+# Object types stored in the `object` column (0-2 follow the players model labels)
+PLAYER, REFEREE, BALL, KEYPOINT = 0, 1, 2, 3
+
+# One row per detected object and frame. image_x/image_y is the point projected on the tactical map
+# (players and referees feet, ball and keypoints centers), pitch_x/pitch_y its tactical map position (NaN if unknown)
+TRACKING_DTYPE = np.dtype([
+    ('frame', np.int32),
+    ('object', np.int8),
+    ('track_id', np.int32),                                                         # Player track ID, -1 for other objects
+    ('team', np.int8),                                                              # Player team index, -1 for other objects
+    ('label', np.int16),                                                            # Keypoint class, -1 for other objects
+    ('conf', np.float32),
+    ('x1', np.float32), ('y1', np.float32), ('x2', np.float32), ('y2', np.float32),
+    ('image_x', np.float32), ('image_y', np.float32),
+    ('pitch_x', np.float32), ('pitch_y', np.float32)
+])
+CHUNK_FRAMES = 250                                                                  # Frames buffered in memory before a chunk is written
+
+def result_to_rows(result):
+    """
+    Flatten a DetectionEngine frame result into tracking rows
+
+    Args:
+        result: Frame result dict from DetectionEngine
+
+    Returns:
+        Structured array of TRACKING_DTYPE, one row per player, referee, ball and field keypoint
+    """
+    players, referees, ball, keypoints = result['players'], result['referees'], result['ball'], result['keypoints']
+    n_p, n_r, n_b, n_k = len(players['bboxes']), len(referees['bboxes']), int(ball is not None), len(keypoints['bboxes'])
+    rows = np.zeros(n_p + n_r + n_b + n_k, dtype=TRACKING_DTYPE)
+    rows['frame'] = result['frame_nbr']
+    rows['track_id'] = -1
+    rows['team'] = -1
+    rows['label'] = -1
+    rows['pitch_x'] = np.nan
+    rows['pitch_y'] = np.nan
+
+    bboxes = [np.asarray(players['bboxes']).reshape(-1, 4), np.asarray(referees['bboxes']).reshape(-1, 4),
+              np.asarray(ball['bbox']).reshape(-1, 4) if ball is not None else np.zeros((0, 4)),
+              np.asarray(keypoints['bboxes']).reshape(-1, 4)]
+    bboxes = np.concatenate(bboxes)
+    rows['x1'], rows['y1'], rows['x2'], rows['y2'] = bboxes.T
+    # Players and referees stand on the bottom middle of their box, the ball and keypoints are at the center
+    rows['image_x'] = (bboxes[:, 0] + bboxes[:, 2]) / 2
+    rows['image_y'] = np.where(np.arange(len(rows)) < n_p + n_r, bboxes[:, 3], (bboxes[:, 1] + bboxes[:, 3]) / 2)
+
+    p = slice(0, n_p)
+    rows['object'][p] = PLAYER
+    rows['track_id'][p] = players['track_ids']
+    rows['team'][p] = players['teams']
+    rows['conf'][p] = players['confs']
+    rows['pitch_x'][p], rows['pitch_y'][p] = np.asarray(players['pitch_pos']).reshape(-1, 2).T
+
+    r = slice(n_p, n_p + n_r)
+    rows['object'][r] = REFEREE
+    rows['conf'][r] = referees['confs']
+    rows['pitch_x'][r], rows['pitch_y'][r] = np.asarray(referees['pitch_pos']).reshape(-1, 2).T
+
+    if ball is not None:
+        b = n_p + n_r
+        rows['object'][b] = BALL
+        rows['conf'][b] = ball['conf']
+        rows['image_x'][b], rows['image_y'][b] = ball['frame_pos']
+        if ball['pitch_pos'] is not None:
+            rows['pitch_x'][b], rows['pitch_y'][b] = ball['pitch_pos']
+
+    k = slice(n_p + n_r + n_b, len(rows))
+    rows['object'][k] = KEYPOINT
+    rows['label'][k] = keypoints['classes']
+    rows['conf'][k] = 1.0
+    rows['pitch_x'][k], rows['pitch_y'][k] = np.asarray(keypoints['pitch_pos']).reshape(-1, 2).T
+    return rows
+
+class TrackingWriter:
+    """
+    Streams per-frame tracking data to a columnar file while detection runs.
+
+    Rows are buffered for `chunk_frames` frames and written as one chunk:
+    a Parquet row group (`.parquet`, needs pyarrow) or raw TRACKING_DTYPE
+    records appended to a binary file (any other extension, e.g. `.bin`)
+    that load_tracking() memory-maps. Metadata (team names, video fps, ...)
+    is stored in the Parquet schema, or in a `.json` file next to the
+    binary file. Memory use does not grow with the length of the video.
+    """
+    def __init__(self, path, metadata=None, chunk_frames=CHUNK_FRAMES):
+        """
+        Args:
+            path: Output file, .parquet or .bin
+            metadata: Optional JSON-serializable dict saved with the data
+            chunk_frames: Number of frames per written chunk
+        """
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.chunk_frames = chunk_frames
+        self.format = 'parquet' if path.endswith('.parquet') else 'memmap'
+        self.buffer = []
+        self.buffered_frames = 0
+        self.nbr_rows = 0
+        self.closed = False
+
+        if self.format == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Writing Parquet files requires pyarrow (pip install pyarrow), or use a .bin output")
+            self.pa = pa
+            schema = pa.schema([(name, pa.from_numpy_dtype(TRACKING_DTYPE[name])) for name in TRACKING_DTYPE.names])
+            self.writer = pq.ParquetWriter(path, schema, compression='zstd')
+        else:
+            self.file = open(path, 'wb')
+
+    def write(self, result):
+        """
+        Add a frame result
+
+        Args:
+            result: Frame result dict from DetectionEngine
+        """
+        self.buffer.append(result_to_rows(result))
+        self.buffered_frames += 1
+        if self.buffered_frames >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered frames as one chunk"""
+        if not self.buffer:
+            return
+        rows = np.concatenate(self.buffer)
+        self.buffer = []
+        self.buffered_frames = 0
+        if len(rows) == 0:
+            return
+        if self.format == 'parquet':
+            table = self.pa.Table.from_arrays([self.pa.array(rows[name]) for name in TRACKING_DTYPE.names], names=list(TRACKING_DTYPE.names))
+            self.writer.write_table(table)
+        else:
+            self.file.write(rows.tobytes())
+        self.nbr_rows += len(rows)
+
+    def close(self, metadata=None):
+        """
+        Flush the remaining frames and finalize the file
+
+        Args:
+            metadata: Optional metadata added to the one given at creation, e.g. run statistics
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.flush()
+        self.metadata.update(metadata or {})
+        self.metadata['nbr_rows'] = self.nbr_rows
+        if self.format == 'parquet':
+            self.writer.add_key_value_metadata({'tracking': json.dumps(self.metadata)})
+            self.writer.close()
+        else:
+            self.file.close()
+            with open(_metadata_path(self.path), 'w') as f:
+                json.dump(dict(self.metadata, dtype=TRACKING_DTYPE.descr), f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def tracking_metadata(colors_dic, tac_map):
+    """
+    Metadata stored with the tracking data
+
+    Args:
+        colors_dic: Team name to [players color, goalkeeper color] (RGB)
+        tac_map: Tactical map image the pitch coordinates refer to
+
+    Returns:
+        JSON-serializable dict
+    """
+    return {
+        'teams': list(colors_dic.keys()),
+        'team_colors': [list(colors[0]) for colors in colors_dic.values()],
+        'objects': {PLAYER: 'player', REFEREE: 'referee', BALL: 'ball', KEYPOINT: 'keypoint'},
+        'pitch_map_size': [tac_map.shape[1], tac_map.shape[0]]                     # Width, height of the tactical map in pixels
+    }
+
+def load_tracking(path):
+    """
+    Load tracking data written by TrackingWriter
+
+    Args:
+        path: .parquet or .bin tracking file
+
+    Returns:
+        Tuple of (dict of column name to numpy array, metadata dict). Columns
+        of a .bin file are memory-mapped, nothing is read until used.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        raw = (pq.read_metadata(path).metadata or {}).get(b'tracking')          # Written in the file footer on close
+        metadata = json.loads(raw) if raw else {}
+        return {name: table.column(name).to_numpy() for name in table.column_names}, metadata
+
+    with open(_metadata_path(path), 'r') as f:
+        metadata = json.load(f)
+    nbr_rows = os.path.getsize(path) // TRACKING_DTYPE.itemsize
+    rows = np.memmap(path, dtype=TRACKING_DTYPE, mode='r', shape=(nbr_rows,)) if nbr_rows else np.zeros(0, dtype=TRACKING_DTYPE)
+    return {name: rows[name] for name in TRACKING_DTYPE.names}, metadata
+
+def _metadata_path(path):
+    return os.path.splitext(path)[0] + '.json'
@@ -0,0 +1,164 @@
+import os
+import argparse
+import json
+import time
+from unittest import mock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Mock upstreams need keys to be "configured" so the real request path is taken
+os.environ.setdefault("OPENAI_API_KEY", "mock-openai-key")
+os.environ.setdefault("ELEVENLABS_API_KEY", "mock-elevenlabs-key")
+
+from web_app import app
+from http_client.client import get_client
+
+SAMPLE_EVENT = "Salah receives the ball on the right wing, cuts inside and curls a shot into the top corner for Liverpool!"
+
+def display_header():
+    """Display a header for the benchmark script"""
+    print("\n" + "="*80)
+    print("                 WEB APP LATENCY BENCHMARK (MOCK UPSTREAMS)                 ")
+    print("="*80 + "\n")
+
+class MockUpstreamAdapter(HTTPAdapter):
+    """Transport adapter answering OpenAI and ElevenLabs calls locally after a fixed latency"""
+    def __init__(self, llm_latency, tts_latency):
+        super().__init__()
+        self.llm_latency = llm_latency
+        self.tts_latency = tts_latency
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+
+        if "openai.com" in request.url:
+            payload = json.loads(request.body or b"{}")
+            if payload.get("stream"):
+                # Streamed completions: time to first token is the bulk of the latency
+                time.sleep(self.llm_latency * 0.3)
+                lines = [f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n"
+                         for token in ["What a strike! ", "Salah bends it ", "into the top corner!"]]
+                lines.append("data: [DONE]\n\n")
+                response._content = "".join(lines).encode("utf-8")
+                response._content_consumed = True
+                response.headers["Content-Type"] = "text/event-stream"
+            else:
+                time.sleep(self.llm_latency)
+                body = {"choices": [{"message": {"content": "What a strike! Salah bends it into the top corner!"}}]}
+                response._content = json.dumps(body).encode("utf-8")
+                response.headers["Content-Type"] = "application/json"
+        else:
+            time.sleep(self.tts_latency)
+            response._content = b"\xff\xfb\x90\x00" * 1024
+            response.headers["Content-Type"] = "audio/mpeg"
+        return response
+
+def run_sequential(client, event, client_rtt):
+    """Three round trips, as the original web client does"""
+    start = time.perf_counter()
+
+    time.sleep(client_rtt)
+    commentary = client.post('/generate_commentary', json={'event': event}).get_json()['commentary']
+    text_ready = time.perf_counter() - start
+
+    time.sleep(client_rtt)
+    audio_id = client.post('/generate_audio', json={'commentary': commentary, 'event': event}).get_json()['audio_id']
+
+    time.sleep(client_rtt)
+    client.get(f'/audio/{audio_id}').close()
+    audio_ready = time.perf_counter() - start
+
+    return text_ready, audio_ready
+
+def run_commentate(client, event, client_rtt):
+    """Single streamed request to /commentate"""
+    start = time.perf_counter()
+    text_ready = audio_ready = None
+
+    time.sleep(client_rtt)
+    response = client.post('/commentate', json={'event': event}, buffered=False)
+    for chunk in response.response:
+        chunk = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        if text_ready is None and ('event: token' in chunk or 'event: commentary' in chunk):
+            text_ready = time.perf_counter() - start
+        if audio_ready is None and 'event: audio_chunk' in chunk:
+            # The first sentence's audio arrives inline, no extra request needed
+            audio_ready = time.perf_counter() - start
+    response.close()
+
+    return text_ready, audio_ready
+
+def run_batch_comparison(client, events, client_rtt):
+    """Compare one request per event with a single /generate_commentary_batch request"""
+    start = time.perf_counter()
+    for event in events:
+        time.sleep(client_rtt)
+        client.post('/generate_commentary', json={'event': event['description'] + ' (sequential)'})
+    sequential_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    time.sleep(client_rtt)
+    batch_events = [{**event, 'description': event['description'] + ' (batch)'} for event in events]
+    response = client.post('/generate_commentary_batch', json={'events': batch_events}, buffered=False)
+    latencies = []
+    for line in response.response:
+        result = json.loads(line)
+        if 'latency_ms' in result:
+            latencies.append(result['latency_ms'])
+    response.close()
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{len(events)} events, one request each: {sequential_ms:8.1f} ms")
+    print(f"{len(events)} events, batch endpoint:   {batch_ms:8.1f} ms "
+          f"(per-item latency mean {sum(latencies)/len(latencies):.1f} ms, max {max(latencies):.1f} ms)")
+
+def summarize(name, samples):
+    """Print mean time-to-text and time-to-audio for a set of runs"""
+    text_ms = sum(s[0] for s in samples) / len(samples) * 1000
+    audio_ms = sum(s[1] for s in samples) / len(samples) * 1000
+    print(f"{name:<28} time-to-text: {text_ms:8.1f} ms   time-to-audio: {audio_ms:8.1f} ms")
+
+def run_benchmark(args):
+    """Run the benchmark with the given arguments"""
+    display_header()
+    print(f"Mock LLM latency: {args.llm_latency*1000:.0f} ms, mock TTS latency: {args.tts_latency*1000:.0f} ms, "
+          f"client round trip: {args.client_rtt*1000:.0f} ms, runs: {args.runs}\n")
+
+    adapter = MockUpstreamAdapter(args.llm_latency, args.tts_latency)
+    client = app.test_client()
+
+    with mock.patch.object(HTTPAdapter, 'send', adapter.send):
+        # Vary the event per run so the commentary cache does not hide upstream latency
+        sequential = [run_sequential(client, f"{args.event} (sequential run {i})", args.client_rtt) for i in range(args.runs)]
+        combined = [run_commentate(client, f"{args.event} (commentate run {i})", args.client_rtt) for i in range(args.runs)]
+
+        summarize("3 round trips", sequential)
+        summarize("/commentate (SSE)", combined)
+
+        upstream = get_client().stats()['endpoints']
+        print("\nUpstream latency (p50 / p95 ms):")
+        for endpoint, histogram in sorted(upstream.items()):
+            print(f"  {endpoint:<24} {histogram['p50_ms']} / {histogram['p95_ms']} over {histogram['count']} calls")
+
+        if args.events_file:
+            with open(args.events_file, 'r') as f:
+                events = json.load(f)
+            print()
+            run_batch_comparison(client, events, args.client_rtt)
+    print("\nDone!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end commentary latency against mock upstreams")
+    parser.add_argument("--event", type=str, default=SAMPLE_EVENT, help="Event description to commentate")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per flow")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Mock OpenAI latency in seconds")
+    parser.add_argument("--tts-latency", type=float, default=0.6, help="Mock ElevenLabs latency in seconds")
+    parser.add_argument("--events-file", type=str, default="football_events.json", help="Events for the batch comparison (empty to skip)")
+    parser.add_argument("--client-rtt", type=float, default=0.15, help="Simulated browser round-trip time in seconds")
+
+    args = parser.parse_args()
+    run_benchmark(args)
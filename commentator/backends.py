@@ -0,0 +1,367 @@
+import os
+import re
+import random
+import threading
+from http_client.client import get_client, get_async_client
+from .streaming import OPENAI_CHAT_URL, stream_chat_completion, stream_text
+
+class CommentaryBackendError(Exception):
+    """Raised when a commentary backend fails to generate a line"""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class CommentaryThrottledError(CommentaryBackendError):
+    """Raised when the upstream model is rate limiting requests"""
+
+class OpenAIBackend:
+    """Commentary from the OpenAI chat completions API"""
+    name = "openai"
+    is_remote = True
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+        # Token usage reported by the API, including prompt tokens served from the provider cache
+        self.lock = threading.Lock()
+        self.usage = {'requests': 0, 'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0}
+
+    def generate(self, event_description, sport="general", entities=None, payload=None):
+        """
+        Generate a commentary line
+
+        Args:
+            event_description: Description of the event
+            sport: Detected sport type
+            entities: Dict with 'players' and 'teams' lists (unused, the prompt carries them)
+            payload: Chat completion payload built by the commentator
+
+        Returns:
+            Commentary text
+        """
+        if payload is None:
+            raise CommentaryBackendError("OpenAI backend needs a chat completion payload")
+
+        response = get_client().post(OPENAI_CHAT_URL, endpoint="openai.chat", headers=self._headers(), json=payload)
+        return self._parse_response(response)
+
+    async def generate_async(self, event_description, sport="general", entities=None, payload=None):
+        """
+        Generate a commentary line without blocking the event loop
+
+        Args:
+            Same as generate()
+
+        Returns:
+            Commentary text
+        """
+        if payload is None:
+            raise CommentaryBackendError("OpenAI backend needs a chat completion payload")
+
+        response = await get_async_client().post(OPENAI_CHAT_URL, endpoint="openai.chat", headers=self._headers(), json=payload)
+        return self._parse_response(response)
+
+    def _headers(self):
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+
+    def _parse_response(self, response):
+        """Extract the commentary from a chat completion response"""
+        if response.status_code == 200:
+            result = response.json()
+            self._record_usage(result.get("usage"))
+            return result["choices"][0]["message"]["content"].strip()
+        if response.status_code == 429:
+            raise CommentaryThrottledError(f"OpenAI rate limit: {response.text}", response.status_code)
+        raise CommentaryBackendError(f"Error calling OpenAI API: {response.status_code} {response.text}", response.status_code)
+
+    def _record_usage(self, usage):
+        """Add the token usage of one response to the totals"""
+        if not usage:
+            return
+        with self.lock:
+            self.usage['requests'] += 1
+            self.usage['prompt_tokens'] += usage.get("prompt_tokens", 0)
+            self.usage['completion_tokens'] += usage.get("completion_tokens", 0)
+            details = usage.get("prompt_tokens_details") or {}
+            self.usage['cached_prompt_tokens'] += details.get("cached_tokens", 0)
+
+    def stream(self, event_description, sport="general", entities=None, payload=None):
+        """
+        Generate a commentary line, streaming text deltas as they arrive
+
+        Args:
+            Same as generate()
+
+        Returns:
+            Generator of text deltas
+        """
+        if payload is None:
+            raise CommentaryBackendError("OpenAI backend needs a chat completion payload")
+        return stream_chat_completion(self.api_key, payload)
+
+# Terminology per sport, matching the sport-specific instructions given to the model
+SPORT_TERMS = {
+    'basketball': ["Swish", "From downtown", "From beyond the arc", "Nothing but net"],
+    'soccer': ["Beautiful strike", "Clinical finish", "Top corner", "What a hit"],
+    'tennis': ["Ace", "Down the line", "Backhand winner", "What a rally"],
+    'athletics': ["Surging ahead", "Powering down the track", "Look at that speed", "What a finish"],
+    'american_football': ["Touchdown pass", "In the end zone", "Quarterback sneak", "What a play"],
+    'gymnastics': ["Perfect landing", "High difficulty", "Flawless execution", "What artistry"],
+    'general': ["What a moment", "Incredible", "Sensational", "Unbelievable"]
+}
+ARABIC_TERMS = ["هدف رائع", "تسديدة صاروخية", "يا له من هدف", "لمسة سحرية"]
+
+# Event kinds, checked in order; descriptions are usually English even for Arabic commentary
+EVENT_KIND_PATTERNS = [
+    ('goal', r"\b(scores?|scored|scoring|nets|back of the net|into the net|into the (top|bottom|far|near) corner|"
+             r"slots|fires home|head(s|ed)? in|touchdown|dunks?|slam dunk|buzzer.beater|ace|wins the race)\b"
+             r"|\bgoal\b(?![\s-]*(keeper|kick|bound|line))|هدف|يسجل|سجل"),
+    ('save', r"\b(saves?|saved|goalkeeper|keeper|blocks?|blocked|parr(y|ies|ied)|denied|intercepts?)\b|يتصدى|تصدي|الحارس"),
+    ('shot', r"\b(shot|shoots?|strike|volley|header|curls?|curled|attempt|three-point|jump shot|serve|smash)\b|يسدد|تسديدة|رأسية"),
+    ('foul', r"\b(foul|fouled|yellow|red card|card|penalty|offside|challenge|sent off)\b|خطأ|بطاقة|ركلة جزاء|تسلل"),
+    ('build_up', r"\b(pass|passes|cross|through ball|assist|dribbles?|dribbling|runs?|counter|break|sprints?)\b|تمريرة|يمرر|عرضية|يراوغ")
+]
+EVENT_KIND_REGEXES = [(kind, re.compile(pattern, re.IGNORECASE)) for kind, pattern in EVENT_KIND_PATTERNS]
+
+def detect_event_kind(event_description):
+    """
+    Detect the kind of event from its description
+
+    Args:
+        event_description: Description of the event
+
+    Returns:
+        One of 'goal', 'save', 'shot', 'foul', 'build_up' or 'general'
+    """
+    for kind, pattern in EVENT_KIND_REGEXES:
+        if pattern.search(event_description):
+            return kind
+    return 'general'
+
+ENGLISH_TEMPLATES = {
+    'openers': ["Oh my word!", "Here we go!", "Look at this!", "Unbelievable!", "Wow!", ""],
+    'goal': [
+        "{who} gets it done{team_part}!",
+        "{who} delivers when it matters!",
+        "{who} makes no mistake there!",
+        "that's the moment, and {who} celebrates!",
+        "{who} does it with real authority{team_part}!"
+    ],
+    'goal_soccer': [
+        "{who} finds the back of the net{team_part}!",
+        "{who} scores{team_part}, and the crowd erupts!",
+        "{who} makes no mistake there!",
+        "that's in, and {who} wheels away in celebration!",
+        "{who} puts it away with real authority{team_part}!"
+    ],
+    'save': [
+        "{who} is denied by a superb stop!",
+        "what a reaction to keep that out!",
+        "{who} thought that was in, but it's kept out!",
+        "brilliant defending, {who} can't believe it!"
+    ],
+    'shot': [
+        "{who} lets fly{team_part}!",
+        "{who} goes for it!",
+        "{who} pulls the trigger!",
+        "so close from {who}!"
+    ],
+    'foul': [
+        "the referee has seen enough there!",
+        "{who} is in trouble with the referee!",
+        "that's a cynical challenge{team_part}!",
+        "the whistle goes, and {who} can't believe it!"
+    ],
+    'build_up': [
+        "{who} drives forward{team_part}!",
+        "lovely movement from {who}!",
+        "{who} picks out a teammate with a clever ball!",
+        "{who} is building something here{team_part}!"
+    ],
+    'general': [
+        "{who} is making things happen{team_part}!",
+        "what a moment from {who}!",
+        "the crowd is on its feet!",
+        "{who} is right in the thick of it!"
+    ],
+    'closers': ["", " Unbelievable!", " What a moment!", " You have to see it to believe it!",
+                " The crowd is loving this!", " Remember the name!"],
+    'team_part': " for {team}",
+    'default_who': "the player"
+}
+
+ARABIC_TEMPLATES = {
+    'openers': ["يا سلام!", "يا إلهي!", "لا يصدق!", "ما هذا!", "انظروا إلى هذا!", ""],
+    'goal': [
+        "{who} يسجل هدفًا رائعًا{team_part}!",
+        "الكرة في الشباك و{who} يحتفل!",
+        "{who} لا يرحم أمام المرمى!",
+        "هدف ولا أروع من {who}{team_part}!"
+    ],
+    'save': [
+        "تصدي رائع يحرم {who} من الهدف!",
+        "الحارس يطير ويبعد الكرة!",
+        "{who} كان قريبًا جدًا لكن الحارس بالمرصاد!"
+    ],
+    'shot': [
+        "{who} يسدد{team_part}!",
+        "تسديدة قوية من {who}!",
+        "{who} يحاول من بعيد!"
+    ],
+    'foul': [
+        "الحكم يطلق صافرته!",
+        "خطأ واضح على {who}!",
+        "تدخل قوي والحكم يتدخل!"
+    ],
+    'build_up': [
+        "{who} ينطلق بالكرة{team_part}!",
+        "تمريرة ذكية من {who}!",
+        "{who} يراوغ بمهارة!"
+    ],
+    'general': [
+        "{who} يصنع الفارق{team_part}!",
+        "لحظة رائعة من {who}!",
+        "الجماهير تشتعل في المدرجات!"
+    ],
+    'closers': ["", " لا يصدق!", " يا لها من لحظة!", " الجماهير على أقدامها!", " تذكروا هذا الاسم!"],
+    'team_part': " لصالح {team}",
+    'default_who': "اللاعب"
+}
+
+# Capitalized words that start descriptions but are not names
+NAME_STOPWORDS = {"The", "A", "An", "And", "But", "He", "She", "They", "His", "Her", "Their", "What",
+                  "After", "With", "From", "In", "On", "At", "It", "This", "That", "Oh", "Wow",
+                  "Throw-in", "Corner", "Penalty", "Free", "Kick", "Goal", "Yellow", "Red", "Foul",
+                  "Offside", "Substitution", "Kick-off", "Half-time", "Full-time", "Replay"}
+
+NAME_PATTERN = re.compile(r"\b([A-Z][\w'é-]+(?:\s+[A-Z][\w'é-]+)*)")
+
+def guess_player_name(event_description):
+    """
+    Guess the main player of an event as the first capitalized name in its description
+
+    Args:
+        event_description: Description of the event
+
+    Returns:
+        Name or None
+    """
+    for match in NAME_PATTERN.finditer(event_description):
+        words = [word for word in match.group(1).split() if word not in NAME_STOPWORDS]
+        if words:
+            return " ".join(words)
+    return None
+
+class TemplateBackend:
+    """
+    Local commentary from a template grammar keyed by sport, event kind and entities.
+
+    Each line is an opener, a body for the detected event kind (goal, save,
+    shot, foul, build-up) filled with the player and team, and a closer.
+    Openers for goals and shots use the sport terminology from the model
+    instructions. Generation is pure string work, so it produces thousands of
+    lines per second and serves as a low-latency tier and a degrade path when
+    the upstream model is unavailable or throttling.
+    """
+    name = "template"
+    is_remote = False
+
+    def __init__(self, language="english", seed=None):
+        self.language = language.lower()
+        self.templates = ARABIC_TEMPLATES if self.language == "arabic" else ENGLISH_TEMPLATES
+        self.rng = random.Random(seed)
+
+        # Last body used per event kind, to avoid repeating the same line back to back
+        self.last_body = {}
+
+    def generate(self, event_description, sport="general", entities=None, payload=None):
+        """
+        Generate a commentary line
+
+        Args:
+            event_description: Description of the event
+            sport: Detected sport type
+            entities: Dict with 'players' and 'teams' lists (guessed from the description if empty)
+            payload: Ignored, accepted for interface compatibility
+
+        Returns:
+            Commentary text
+        """
+        entities = entities or {}
+        players = entities.get('players') or []
+        teams = entities.get('teams') or []
+
+        who = players[0] if players else guess_player_name(event_description)
+        team = teams[0] if teams else None
+        if who is None or who == team:
+            who = team or self.templates['default_who']
+        team_part = self.templates['team_part'].format(team=team) if team and team != who else ""
+
+        kind = detect_event_kind(event_description)
+
+        # Pick a body (sport-specific if there is one), avoiding the one used last time
+        bodies = self.templates.get(f"{kind}_{sport}") or self.templates[kind]
+        index = self.rng.randrange(len(bodies))
+        if index == self.last_body.get(kind) and len(bodies) > 1:
+            index = (index + 1) % len(bodies)
+        self.last_body[kind] = index
+        body = bodies[index].format(who=who, team_part=team_part)
+
+        openers = self.templates['openers']
+        if kind in ('goal', 'shot'):
+            terms = ARABIC_TERMS if self.language == "arabic" else SPORT_TERMS.get(sport, SPORT_TERMS['general'])
+            openers = openers + [f"{term}!" for term in terms]
+        opener = self.rng.choice(openers)
+
+        # Sentence-case the body when it starts the line or follows an exclamation
+        body = body[0].upper() + body[1:]
+        line = f"{opener} {body}" if opener else body
+        return (line + self.rng.choice(self.templates['closers'])).strip()
+
+    async def generate_async(self, event_description, sport="general", entities=None, payload=None):
+        """Generate a commentary line; template generation is fast enough to run inline on the event loop"""
+        return self.generate(event_description, sport, entities)
+
+    def stream(self, event_description, sport="general", entities=None, payload=None):
+        """
+        Generate a commentary line as a stream of text deltas
+
+        Args:
+            Same as generate()
+
+        Returns:
+            Generator of text deltas
+        """
+        return stream_text(self.generate(event_description, sport, entities))
+
+def create_commentary_backend(api_key=None, language="english", name=None):
+    """
+    Create the commentary backend selected by name or the COMMENTARY_BACKEND environment variable
+
+    Args:
+        api_key: OpenAI API key, if any
+        language: Commentary language for the template backend
+        name: "openai", "template" or "auto" (OpenAI when a key is set)
+
+    Returns:
+        Commentary backend instance
+    """
+    name = (name or os.getenv("COMMENTARY_BACKEND", "auto")).lower()
+
+    if name == "template":
+        return TemplateBackend(language)
+    if name == "openai":
+        return OpenAIBackend(api_key)
+    if name != "auto":
+        print(f"Warning: unknown COMMENTARY_BACKEND '{name}', using auto selection")
+
+    return OpenAIBackend(api_key) if api_key else TemplateBackend(language)
+
+def create_fallback_backend(backend, language="english"):
+    """Template fallback for a remote backend, unless disabled with COMMENTARY_FALLBACK=none"""
+    if not backend.is_remote or os.getenv("COMMENTARY_FALLBACK", "template").lower() == "none":
+        return None
+    return TemplateBackend(language)
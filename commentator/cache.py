@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import OrderedDict
+
+class CommentaryCache:
+    """
+    Thread-safe LRU cache for generated commentary lines.
+
+    Entries are keyed by whatever the caller considers identical requests
+    (for example language and event description) and expire after `ttl` seconds.
+    """
+    def __init__(self, max_size=1024, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+        # Simple counters for monitoring
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Get a cached value
+
+        Args:
+            key: Hashable cache key
+
+        Returns:
+            Cached value or None if missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                self.misses += 1
+                return None
+
+            # Mark as most recently used
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if full
+
+        Args:
+            key: Hashable cache key
+            value: Value to cache
+        """
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute_fn):
+        """
+        Return the cached value for a key, computing and storing it on a miss
+
+        Args:
+            key: Hashable cache key
+            compute_fn: Function with no arguments producing the value
+
+        Returns:
+            Tuple of (value, was_cached)
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+
+        value = compute_fn()
+        if value:
+            self.set(key, value)
+        return value, False
+
+    def stats(self):
+        """Return cache statistics"""
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -1,18 +1,41 @@
 import os
-import requests
 import json
 import re
+import time
+import asyncio
 from dotenv import load_dotenv
+from .streaming import CommentaryStream, stream_text
+from .backends import TemplateBackend, create_commentary_backend, create_fallback_backend
+from .router import create_router
+from .prompts import PromptTemplate, get_prompt_template
+from .session import MatchSession
 
 load_dotenv()
 
 class Commentator:
-    def __init__(self):
+    def __init__(self, backend=None, router=None, match_context=None):
         # Load API key from environment variables
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             print("Warning: OPENAI_API_KEY not found in environment variables")
         
+        # Generation backend: OpenAI when a key is available, local templates otherwise
+        # (override with the backend argument or the COMMENTARY_BACKEND environment variable)
+        self.backend = backend or create_commentary_backend(self.api_key)
+        self.fallback_backend = create_fallback_backend(self.backend)
+        
+        # Optional importance routing across the large model, a fast model and local templates
+        # (pass a CommentaryRouter or set COMMENTARY_ROUTING=on)
+        self.router = router or create_router()
+        self.local_backend = self.backend if not self.backend.is_remote else (self.fallback_backend or TemplateBackend())
+        
+        # Match-level commentary keeps a rolling summary and batches adjacent events
+        # (enable with match_context=True or COMMENTARY_MATCH_CONTEXT=on, calls are stateless otherwise)
+        if match_context is None:
+            match_context = os.getenv("COMMENTARY_MATCH_CONTEXT", "off").lower() in ("1", "on", "true", "yes")
+        self.match_context = match_context
+        self.session = None
+        
         # Commentator personality and style can be adjusted here
         self.commentator_style = "enthusiastic sports commentator"
         self.voice_style = "excited"
@@ -37,15 +60,54 @@ class Commentator:
         Returns:
             List of commentary texts with timestamps
         """
-        commentary_segments = []
+        if self.match_context:
+            # One session per call: the events are a match (or a continuous part of one)
+            self.session = MatchSession(self)
+            results = self.session.commentate(events)
+        else:
+            results = []
+            for event in events:
+                # Detect sport type from event description
+                sport = self._detect_sport(event['description'])
+                
+                # Generate commentary for the event
+                results.append((event, self._generate_commentary_for_event(event['description'], sport), sport))
         
-        for event in events:
-            # Detect sport type from event description
-            sport = self._detect_sport(event['description'])
-            
-            # Generate commentary for the event
-            commentary = self._generate_commentary_for_event(event['description'], sport)
+        return self._segments(results)
+    
+    async def generate_commentary_async(self, events, max_concurrency=16):
+        """
+        Generate commentary for each event without blocking the event loop
+        
+        Without match context, events are commentated concurrently with at
+        most `max_concurrency` requests in flight.
+        
+        Args:
+            events: List of events with descriptions and timestamps
+            max_concurrency: Maximum number of concurrent model requests
             
+        Returns:
+            List of commentary texts with timestamps
+        """
+        if self.match_context:
+            self.session = MatchSession(self)
+            return self._segments(await self.session.commentate_async(events))
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def commentate(event):
+            sport = self._detect_sport(event['description'])
+            async with semaphore:
+                commentary = await self._generate_commentary_for_event_async(event['description'], sport)
+            return event, commentary, sport
+        
+        return self._segments(await asyncio.gather(*(commentate(event) for event in events)))
+    
+    def _segments(self, results):
+        """Turn (event, commentary, sport) tuples into commentary segments"""
+        commentary_segments = []
+        
+        for event, commentary, sport in results:
             if commentary:
                 segment = {
                     'timestamp': event['timestamp'],
@@ -57,6 +119,18 @@ class Commentator:
         
         return commentary_segments
     
+    def _event_context(self, description):
+        """
+        Sport and entities of an event, as used by MatchSession
+        
+        Args:
+            description: Event description
+            
+        Returns:
+            Tuple of (sport, entities or None)
+        """
+        return self._detect_sport(description), None
+    
     def _detect_sport(self, description):
         """
         Detect the sport from the event description
@@ -75,7 +149,7 @@ class Commentator:
     
     def _generate_commentary_for_event(self, event_description, sport):
         """
-        Use OpenAI API to generate commentary for a specific event
+        Use the configured backend to generate commentary for a specific event
         
         Args:
             event_description: Description of the event
@@ -84,64 +158,179 @@ class Commentator:
         Returns:
             Commentary text
         """
-        if not self.api_key:
-            # For demonstration, return dummy data if no API key
-            return f"Wow! What an incredible moment! {event_description}"
+        return self._generate_commentary_with_source(event_description, sport)[0]
+    
+    def _generate_commentary_with_source(self, event_description, sport):
+        """
+        Same as _generate_commentary_for_event(), also telling whether the backend failed
         
-        try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            # Customize the prompt based on the detected sport
-            sport_specific_instruction = self._get_sport_specific_instruction(sport)
-            
-            prompt = f"""
-            You are an {self.commentator_style} specializing in {sport}. Generate an {self.voice_style} commentary for the following event:
+        Args:
+            event_description: Description of the event
+            sport: Detected sport type
             
-            Event: {event_description}
+        Returns:
+            Tuple of (commentary text, whether a fallback produced it), callers
+            caching commentary should not keep fallback lines
+        """
+        backend, payload, tier = self._select_backend(event_description, sport)
+        start_time = time.perf_counter()
+        
+        try:
+            return backend.generate(event_description, sport, payload=payload), False
+        except Exception as e:
+            print(f"Exception in commentary generation: {e}")
+            if self.fallback_backend:
+                return self.fallback_backend.generate(event_description, sport), True
+            return f"What a moment! {event_description}", True
+        finally:
+            if tier:
+                self.router.record(tier, time.perf_counter() - start_time)
+    
+    async def _generate_commentary_for_event_async(self, event_description, sport):
+        """Same as _generate_commentary_for_event(), awaiting the backend"""
+        backend, payload, tier = self._select_backend(event_description, sport)
+        start_time = time.perf_counter()
+        
+        try:
+            return await backend.generate_async(event_description, sport, payload=payload)
+        except Exception as e:
+            print(f"Exception in commentary generation: {e}")
+            if self.fallback_backend:
+                return self.fallback_backend.generate(event_description, sport)
+            return f"What a moment! {event_description}"
+        finally:
+            if tier:
+                self.router.record(tier, time.perf_counter() - start_time)
+    
+    def stream_commentary_for_event(self, event_description, sport=None):
+        """
+        Generate commentary for a specific event, streaming tokens as they arrive
+        
+        Args:
+            event_description: Description of the event
+            sport: Sport type (detected from the description if not given)
             
-            {sport_specific_instruction}
+        Returns:
+            CommentaryStream yielding text deltas, with time_to_first_token
+            available once the first token has been received, and `fallback`
+            set if the backend failed
+        """
+        sport = sport or self._detect_sport(event_description)
+        # The generator runs once the stream is iterated, so it can flag the stream it feeds
+        stream = CommentaryStream(self._stream_tokens(event_description, sport, lambda: stream.mark_fallback()))
+        return stream
+    
+    def _stream_tokens(self, event_description, sport, on_fallback=None):
+        """Yield commentary tokens, falling back to the local backend on failure"""
+        backend, payload, tier = self._select_backend(event_description, sport)
+        start_time = time.perf_counter()
+        
+        received = False
+        try:
+            for token in backend.stream(event_description, sport, payload=payload):
+                received = True
+                yield token
+        except Exception as e:
+            print(f"Exception in streaming commentary generation: {e}")
+            if on_fallback:
+                on_fallback()
+            if not received:
+                if self.fallback_backend:
+                    yield from self.fallback_backend.stream(event_description, sport)
+                else:
+                    yield from stream_text(f"What a moment! {event_description}")
+        
+        if tier:
+            self.router.record(tier, time.perf_counter() - start_time)
+    
+    def _select_backend(self, event_description, sport):
+        """
+        Pick the backend and payload for an event, routing by importance if enabled
+        
+        Args:
+            event_description: Description of the event
+            sport: Detected sport type
             
-            Provide a realistic, engaging, and natural-sounding commentary that a real commentator might say. 
-            Keep it brief (1-2 sentences max) and conversational. Focus on the excitement and significance of the moment.
-            Include player names if mentioned in the event.
-            """
+        Returns:
+            Tuple of (backend, payload or None, routing tier or None)
+        """
+        tier = self.router.route(event_description, sport) if self.router and self.backend.is_remote else None
+        
+        if (tier and tier['model'] is None) or not self.backend.is_remote:
+            return self.local_backend, None, tier
+        
+        payload = self._build_payload(event_description, sport)
+        if tier:
+            payload["model"] = tier['model']
+            payload["max_tokens"] = tier['max_tokens']
+        return self.backend, payload, tier
+    
+    def _build_payload(self, event_description, sport):
+        """
+        Build the chat completion payload for an event
+        
+        Args:
+            event_description: Description of the event
+            sport: Detected sport type
             
-            payload = {
-                "model": "gpt-4-turbo",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": f"You are an {self.commentator_style} specializing in {sport}. Your commentary should be exciting, authentic, and concise."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 100,
-                "temperature": 0.7
-            }
+        Returns:
+            Payload for the OpenAI chat completions API
+        """
+        key = ("sport", sport, self.commentator_style, self.voice_style)
+        template = get_prompt_template(key, lambda: self._compile_prompt(sport))
+        return template.render(event=event_description)
+    
+    def _compile_prompt(self, sport):
+        """
+        Compile the static part of the prompt for a sport
+        
+        The persona and all instructions go into the system message so that
+        every request for the sport shares the same prefix; only the event
+        goes after it.
+        
+        Args:
+            sport: Detected sport type
             
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
+        Returns:
+            PromptTemplate for the sport
+        """
+        # Customize the prompt based on the detected sport
+        sport_specific_instruction = self._get_sport_specific_instruction(sport)
+        
+        system = "\n".join([
+            f"You are an {self.commentator_style} specializing in {sport}. Your commentary should be exciting, authentic, and concise.",
+            f"Generate an {self.voice_style} commentary for the event given by the user.",
+            sport_specific_instruction,
+            "Provide a realistic, engaging, and natural-sounding commentary that a real commentator might say.",
+            "Keep it brief (1-2 sentences max) and conversational. Focus on the excitement and significance of the moment.",
+            "Include player names if mentioned in the event."
+        ])
+        
+        return PromptTemplate(system, "Event: {event}")
+    
+    def _session_template(self, sport):
+        """
+        Compiled prompt for match-level commentary with a rolling summary
+        
+        Args:
+            sport: Sport of the match
             
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"].strip()
-            else:
-                print(f"Error calling OpenAI API: {response.status_code}")
-                print(response.text)
-                return f"Amazing play! {event_description}"
-                
-        except Exception as e:
-            print(f"Exception in commentary generation: {e}")
-            return f"What a moment! {event_description}"
+        Returns:
+            PromptTemplate taking the match summary and the numbered new events
+        """
+        def compile_prompt():
+            system = "\n".join([
+                f"You are an {self.commentator_style} specializing in {sport}, commentating a whole match live.",
+                f"Your commentary should be {self.voice_style}, exciting, authentic, and concise.",
+                self._get_sport_specific_instruction(sport),
+                "Each message gives the match state so far and one or more new numbered events.",
+                "Reply with exactly one commentary line per new event, numbered the same way (\"1. ...\"), and nothing else.",
+                "Keep each line brief (1-2 sentences) and conversational. Include player names if mentioned.",
+                "Build on the match state: refer back to earlier moments or the score when it adds something, and never repeat earlier lines."
+            ])
+            return PromptTemplate(system, "Match state:\n{summary}\n\nNew events:\n{events}")
+        
+        return get_prompt_template(("sport-session", sport, self.commentator_style, self.voice_style), compile_prompt)
     
     def _get_sport_specific_instruction(self, sport):
         """
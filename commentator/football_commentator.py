@@ -1,13 +1,19 @@
 import os
-import requests
 import json
 import re
+import time
+import asyncio
 from dotenv import load_dotenv
+from .streaming import CommentaryStream, stream_text
+from .backends import TemplateBackend, create_commentary_backend, create_fallback_backend
+from .router import create_router
+from .prompts import PromptTemplate, get_prompt_template
+from .session import MatchSession
 
 load_dotenv()
 
 class FootballCommentator:
-    def __init__(self, language="english"):
+    def __init__(self, language="english", backend=None, router=None, match_context=None):
         # Load API key from environment variables
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
@@ -16,6 +22,23 @@ class FootballCommentator:
         # Set the language for commentary
         self.language = language.lower()
         
+        # Generation backend: OpenAI when a key is available, local templates otherwise
+        # (override with the backend argument or the COMMENTARY_BACKEND environment variable)
+        self.backend = backend or create_commentary_backend(self.api_key, self.language)
+        self.fallback_backend = create_fallback_backend(self.backend, self.language)
+        
+        # Optional importance routing across the large model, a fast model and local templates
+        # (pass a CommentaryRouter or set COMMENTARY_ROUTING=on)
+        self.router = router or create_router()
+        self.local_backend = self.backend if not self.backend.is_remote else (self.fallback_backend or TemplateBackend(self.language))
+        
+        # Match-level commentary keeps a rolling summary and batches adjacent events
+        # (enable with match_context=True or COMMENTARY_MATCH_CONTEXT=on, calls are stateless otherwise)
+        if match_context is None:
+            match_context = os.getenv("COMMENTARY_MATCH_CONTEXT", "off").lower() in ("1", "on", "true", "yes")
+        self.match_context = match_context
+        self.session = None
+        
         # Commentator personality and style
         if self.language == "arabic":
             self.commentator_style = "متحمس معلق كرة قدم عربي"
@@ -37,6 +60,10 @@ class FootballCommentator:
             "Benzema", "Lewandowski", "Neymar", "Mahrez", "Hakimi", "Ziyech",
             "Bounou", "Mané", "Mendy", "Osimhen", "Aboubakar", "Elneny"
         ]
+        
+        # Entity patterns are compiled once rather than on every event
+        self.team_patterns = [(team, re.compile(r'\b' + re.escape(team) + r'\b', re.IGNORECASE)) for team in self.teams]
+        self.player_patterns = [(player, re.compile(r'\b' + re.escape(player) + r'\b', re.IGNORECASE)) for player in self.players]
     
     def generate_commentary(self, events):
         """
@@ -48,12 +75,48 @@ class FootballCommentator:
         Returns:
             List of commentary texts with timestamps
         """
-        commentary_segments = []
+        if self.match_context:
+            # One session per call: the events are a match (or a continuous part of one)
+            self.session = MatchSession(self)
+            results = self.session.commentate(events)
+        else:
+            # Generate commentary for each event independently
+            results = [(event, self._generate_commentary_for_event(event['description']), 'soccer') for event in events]
+        
+        return self._segments(results)
+    
+    async def generate_commentary_async(self, events, max_concurrency=16):
+        """
+        Generate football commentary for each event without blocking the event loop
         
-        for event in events:
-            # Generate commentary for the event
-            commentary = self._generate_commentary_for_event(event['description'])
+        Without match context, events are commentated concurrently with at
+        most `max_concurrency` requests in flight.
+        
+        Args:
+            events: List of events with descriptions and timestamps
+            max_concurrency: Maximum number of concurrent model requests
             
+        Returns:
+            List of commentary texts with timestamps
+        """
+        if self.match_context:
+            self.session = MatchSession(self)
+            return self._segments(await self.session.commentate_async(events))
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def commentate(event):
+            async with semaphore:
+                commentary = await self._generate_commentary_for_event_async(event['description'])
+            return event, commentary, 'soccer'
+        
+        return self._segments(await asyncio.gather(*(commentate(event) for event in events)))
+    
+    def _segments(self, results):
+        """Turn (event, commentary, sport) tuples into commentary segments"""
+        commentary_segments = []
+        
+        for event, commentary, _ in results:
             if commentary:
                 segment = {
                     'timestamp': event['timestamp'],
@@ -66,6 +129,18 @@ class FootballCommentator:
         
         return commentary_segments
     
+    def _event_context(self, description):
+        """
+        Sport and entities of an event, as used by MatchSession
+        
+        Args:
+            description: Event description
+            
+        Returns:
+            Tuple of (sport, entities)
+        """
+        return 'soccer', self._extract_entities(description)
+    
     def _extract_entities(self, description):
         """
         Extract teams and players from the description
@@ -76,20 +151,20 @@ class FootballCommentator:
         }
         
         # Extract teams
-        for team in self.teams:
-            if re.search(r'\b' + re.escape(team) + r'\b', description, re.IGNORECASE):
+        for team, pattern in self.team_patterns:
+            if pattern.search(description):
                 found_entities['teams'].append(team)
         
         # Extract players
-        for player in self.players:
-            if re.search(r'\b' + re.escape(player) + r'\b', description, re.IGNORECASE):
+        for player, pattern in self.player_patterns:
+            if pattern.search(description):
                 found_entities['players'].append(player)
         
         return found_entities
     
     def _generate_commentary_for_event(self, event_description):
         """
-        Use OpenAI API to generate commentary for a specific football event
+        Use the configured backend to generate commentary for a specific football event
         
         Args:
             event_description: Description of the event
@@ -97,94 +172,215 @@ class FootballCommentator:
         Returns:
             Commentary text
         """
-        if not self.api_key:
-            # For demonstration, return dummy data if no API key
-            if self.language == "arabic":
-                return f"يا إلهي! لحظة رائعة! {event_description}"
-            else:
-                return f"Wow! What an incredible moment! {event_description}"
+        return self._generate_commentary_with_source(event_description)[0]
+    
+    def _generate_commentary_with_source(self, event_description):
+        """
+        Same as _generate_commentary_for_event(), also telling whether the backend failed
+        
+        Args:
+            event_description: Description of the event
+            
+        Returns:
+            Tuple of (commentary text, whether a fallback produced it), callers
+            caching commentary should not keep fallback lines
+        """
+        entities = self._extract_entities(event_description)
+        backend, payload, tier = self._select_backend(event_description, entities)
+        start_time = time.perf_counter()
+        
+        try:
+            return backend.generate(event_description, 'soccer', entities, payload), False
+        except Exception as e:
+            print(f"Exception in commentary generation: {e}")
+            if self.fallback_backend:
+                return self.fallback_backend.generate(event_description, 'soccer', entities), True
+            return self._fallback_commentary(event_description), True
+        finally:
+            if tier:
+                self.router.record(tier, time.perf_counter() - start_time)
+    
+    async def _generate_commentary_for_event_async(self, event_description):
+        """Same as _generate_commentary_for_event(), awaiting the backend"""
+        entities = self._extract_entities(event_description)
+        backend, payload, tier = self._select_backend(event_description, entities)
+        start_time = time.perf_counter()
         
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
+            return await backend.generate_async(event_description, 'soccer', entities, payload)
+        except Exception as e:
+            print(f"Exception in commentary generation: {e}")
+            if self.fallback_backend:
+                return self.fallback_backend.generate(event_description, 'soccer', entities)
+            return self._fallback_commentary(event_description)
+        finally:
+            if tier:
+                self.router.record(tier, time.perf_counter() - start_time)
+    
+    def stream_commentary_for_event(self, event_description):
+        """
+        Generate football commentary for an event, streaming tokens as they arrive
+        
+        Args:
+            event_description: Description of the event
             
-            # Extract entities to emphasize in the commentary
-            entities = self._extract_entities(event_description)
-            entities_text = ""
+        Returns:
+            CommentaryStream yielding text deltas, with time_to_first_token
+            available once the first token has been received, and `fallback`
+            set if the backend failed
+        """
+        # The generator runs once the stream is iterated, so it can flag the stream it feeds
+        stream = CommentaryStream(self._stream_tokens(event_description, lambda: stream.mark_fallback()))
+        return stream
+    
+    def _stream_tokens(self, event_description, on_fallback=None):
+        """Yield commentary tokens, falling back to the local backend on failure"""
+        entities = self._extract_entities(event_description)
+        backend, payload, tier = self._select_backend(event_description, entities)
+        start_time = time.perf_counter()
+        
+        received = False
+        try:
+            for token in backend.stream(event_description, 'soccer', entities, payload):
+                received = True
+                yield token
+        except Exception as e:
+            print(f"Exception in streaming commentary generation: {e}")
+            if on_fallback:
+                on_fallback()
+            if not received:
+                if self.fallback_backend:
+                    yield from self.fallback_backend.stream(event_description, 'soccer', entities)
+                else:
+                    yield from stream_text(self._fallback_commentary(event_description))
+        
+        if tier:
+            self.router.record(tier, time.perf_counter() - start_time)
+    
+    def _select_backend(self, event_description, entities):
+        """
+        Pick the backend and payload for an event, routing by importance if enabled
+        
+        Args:
+            event_description: Description of the event
+            entities: Teams and players found in the description
             
-            if entities['players'] or entities['teams']:
-                entities_text = "Focus on these entities in your commentary: "
-                if entities['players']:
-                    entities_text += f"Players: {', '.join(entities['players'])}. "
-                if entities['teams']:
-                    entities_text += f"Teams: {', '.join(entities['teams'])}."
+        Returns:
+            Tuple of (backend, payload or None, routing tier or None)
+        """
+        tier = self.router.route(event_description, 'soccer', entities) if self.router and self.backend.is_remote else None
+        
+        if (tier and tier['model'] is None) or not self.backend.is_remote:
+            return self.local_backend, None, tier
+        
+        payload = self._build_payload(event_description, entities)
+        if tier:
+            payload["model"] = tier['model']
+            payload["max_tokens"] = tier['max_tokens']
+        return self.backend, payload, tier
+    
+    def _fallback_commentary(self, event_description):
+        """Commentary used when no backend is able to generate a line"""
+        if self.language == "arabic":
+            return f"يا إلهي! لحظة رائعة! {event_description}"
+        else:
+            return f"Wow! What an incredible moment! {event_description}"
+    
+    def _build_payload(self, event_description, entities=None):
+        """
+        Build the chat completion payload for a football event
+        
+        Args:
+            event_description: Description of the event
+            entities: Teams and players found in the description (extracted if not given)
             
-            # Create language-specific prompts
-            if self.language == "arabic":
-                prompt = f"""
-                أنت {self.commentator_style}. قم بإنشاء تعليق {self.voice_style} للحدث التالي في مباراة كرة القدم:
-                
-                الحدث: {event_description}
-                
-                {entities_text}
-                
-                قدم تعليقًا واقعيًا وجذابًا وطبيعيًا كما قد يقوله معلق حقيقي.
-                احتفظ بإيجاز (1-2 جمل كحد أقصى) وبأسلوب محادثة. ركز على الإثارة وأهمية اللحظة.
-                استخدم مصطلحات كرة القدم العربية مثل "يسدد"، "يراوغ"، "هدف رائع"، "تسديدة صاروخية" إلخ.
-                اذكر أسماء اللاعبين أو الفرق إذا ذكرت في الحدث.
-                """
-            else:
-                prompt = f"""
-                You are a {self.commentator_style}. Generate a {self.voice_style} commentary for the following event in a football match:
-                
-                Event: {event_description}
-                
-                {entities_text}
-                
-                Provide a realistic, engaging, and natural-sounding commentary that a real commentator might say.
-                Keep it brief (1-2 sentences max) and conversational. Focus on the excitement and significance of the moment.
-                Use football terminology like 'beautiful strike', 'clinical finish', 'top corner', etc.
-                Include player names or teams if mentioned in the event.
-                """
+        Returns:
+            Payload for the OpenAI chat completions API
+        """
+        # Extract entities to emphasize in the commentary
+        if entities is None:
+            entities = self._extract_entities(event_description)
+        entities_text = ""
+        
+        if entities['players'] or entities['teams']:
+            entities_text = "Focus on these entities in your commentary: "
+            if entities['players']:
+                entities_text += f"Players: {', '.join(entities['players'])}. "
+            if entities['teams']:
+                entities_text += f"Teams: {', '.join(entities['teams'])}."
+        
+        return self._prompt_template().render(event=event_description, entities=entities_text)
+    
+    def _prompt_template(self):
+        """Compiled prompt for the current language and style, shared across instances"""
+        key = ("football", self.language, self.commentator_style, self.voice_style)
+        return get_prompt_template(key, self._compile_prompt)
+    
+    def _compile_prompt(self):
+        """
+        Compile the static part of the prompt
+        
+        The persona and all instructions go into the system message so that
+        every request shares the same prefix; only the event goes after it.
+        
+        Returns:
+            PromptTemplate for this commentator
+        """
+        if self.language == "arabic":
+            system = "\n".join([
+                f"أنت {self.commentator_style}. يجب أن يكون تعليقك مثيرًا وأصيلًا وموجزًا.",
+                f"قم بإنشاء تعليق {self.voice_style} للحدث الذي يرسله المستخدم في مباراة كرة القدم.",
+                "قدم تعليقًا واقعيًا وجذابًا وطبيعيًا كما قد يقوله معلق حقيقي.",
+                "احتفظ بإيجاز (1-2 جمل كحد أقصى) وبأسلوب محادثة. ركز على الإثارة وأهمية اللحظة.",
+                'استخدم مصطلحات كرة القدم العربية مثل "يسدد"، "يراوغ"، "هدف رائع"، "تسديدة صاروخية" إلخ.',
+                "اذكر أسماء اللاعبين أو الفرق إذا ذكرت في الحدث."
+            ])
+            event_template = "الحدث: {event}\n\n{entities}"
+        else:
+            system = "\n".join([
+                f"You are a {self.commentator_style}. Your commentary should be exciting, authentic, and concise.",
+                f"Generate a {self.voice_style} commentary for the event in a football match given by the user.",
+                "Provide a realistic, engaging, and natural-sounding commentary that a real commentator might say.",
+                "Keep it brief (1-2 sentences max) and conversational. Focus on the excitement and significance of the moment.",
+                "Use football terminology like 'beautiful strike', 'clinical finish', 'top corner', etc.",
+                "Include player names or teams if mentioned in the event."
+            ])
+            event_template = "Event: {event}\n\n{entities}"
+        
+        return PromptTemplate(system, event_template)
+    
+    def _session_template(self, sport='soccer'):
+        """
+        Compiled prompt for match-level commentary with a rolling summary
+        
+        Args:
+            sport: Ignored, accepted for interface compatibility with Commentator
             
-            # Set the appropriate system message based on language
+        Returns:
+            PromptTemplate taking the match summary and the numbered new events
+        """
+        def compile_prompt():
             if self.language == "arabic":
-                system_message = f"أنت {self.commentator_style}. يجب أن يكون تعليقك مثيرًا وأصيلًا وموجزًا."
+                system = "\n".join([
+                    f"أنت {self.commentator_style} تعلق على مباراة كرة قدم كاملة مباشرة. يجب أن يكون تعليقك {self.voice_style} وأصيلًا وموجزًا.",
+                    'استخدم مصطلحات كرة القدم العربية مثل "يسدد"، "يراوغ"، "هدف رائع"، "تسديدة صاروخية" إلخ.',
+                    "كل رسالة تحتوي على حالة المباراة حتى الآن وحدث جديد أو أكثر مرقمة.",
+                    "أجب بسطر تعليق واحد لكل حدث جديد، مرقم بنفس الطريقة (\"1. ...\")، ولا شيء غير ذلك.",
+                    "احتفظ بإيجاز كل سطر (1-2 جمل) واذكر أسماء اللاعبين أو الفرق إذا ذكرت.",
+                    "استفد من حالة المباراة: أشر إلى اللحظات السابقة أو النتيجة عندما يضيف ذلك شيئًا، ولا تكرر التعليقات السابقة."
+                ])
+                event_template = "حالة المباراة:\n{summary}\n\nالأحداث الجديدة:\n{events}"
             else:
-                system_message = f"You are a {self.commentator_style}. Your commentary should be exciting, authentic, and concise."
-            
-            payload = {
-                "model": "gpt-4-turbo",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": system_message
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": 100,
-                "temperature": 0.7
-            }
-            
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"].strip()
-            else:
-                print(f"Error calling OpenAI API: {response.status_code}")
-                print(response.text)
-                return f"Amazing play! {event_description}"
-                
-        except Exception as e:
-            print(f"Exception in commentary generation: {e}")
-            return f"What a moment! {event_description}" 
\ No newline at end of file
+                system = "\n".join([
+                    f"You are a {self.commentator_style}, commentating a whole football match live. Your commentary should be {self.voice_style}, authentic, and concise.",
+                    "Use football terminology like 'beautiful strike', 'clinical finish', 'top corner', etc.",
+                    "Each message gives the match state so far and one or more new numbered events.",
+                    "Reply with exactly one commentary line per new event, numbered the same way (\"1. ...\"), and nothing else.",
+                    "Keep each line brief (1-2 sentences) and conversational. Include player names or teams if mentioned.",
+                    "Build on the match state: refer back to earlier moments or the score when it adds something, and never repeat earlier lines."
+                ])
+                event_template = "Match state:\n{summary}\n\nNew events:\n{events}"
+            return PromptTemplate(system, event_template)
+        
+        key = ("football-session", self.language, self.commentator_style, self.voice_style)
+        return get_prompt_template(key, compile_prompt)
@@ -0,0 +1,119 @@
+import threading
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # tiktoken is optional, token counts fall back to an estimate
+    _ENCODING = None
+
+def count_tokens(text):
+    """
+    Count the tokens of a piece of text
+
+    Uses tiktoken when installed, otherwise estimates roughly 4 characters per
+    token for ASCII text and 2 for other scripts such as Arabic.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Number of tokens
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return max(1, round(ascii_chars / 4 + (len(text) - ascii_chars) / 2))
+
+# Per-message overhead of the chat format, in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class PromptTemplate:
+    """
+    Precompiled chat prompt with a static prefix and a small per-event suffix.
+
+    The system message holds the persona and all instructions and is built
+    once, so every request for the same language and style starts with an
+    identical prefix that providers can serve from their prompt cache. Only
+    the short user message with the event is formatted per request. Token
+    counts are tracked per request; the prefix is counted once.
+    """
+    def __init__(self, system, event_template, model="gpt-4-turbo", max_tokens=100, temperature=0.7):
+        """
+        Args:
+            system: Static system message (persona and instructions)
+            event_template: str.format template for the per-event user message
+            model: Chat model to use
+            max_tokens: Completion token limit
+            temperature: Sampling temperature
+        """
+        self.system_message = {"role": "system", "content": system}
+        self.event_template = event_template
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+        self.static_tokens = count_tokens(system) + MESSAGE_OVERHEAD_TOKENS
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.total_tokens = 0
+        self.last_tokens = None
+
+    def render(self, **fields):
+        """
+        Build the chat completion payload for one request
+
+        Args:
+            **fields: Values for the event template
+
+        Returns:
+            Payload for the OpenAI chat completions API
+        """
+        content = self.event_template.format(**fields).strip()
+        tokens = self.static_tokens + count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+        with self.lock:
+            self.requests += 1
+            self.total_tokens += tokens
+            self.last_tokens = tokens
+
+        return {
+            "model": self.model,
+            "messages": [self.system_message, {"role": "user", "content": content}],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        }
+
+    def stats(self):
+        """Return prompt token statistics"""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'static_prefix_tokens': self.static_tokens,
+                'last_prompt_tokens': self.last_tokens,
+                'mean_prompt_tokens': round(self.total_tokens / self.requests, 1) if self.requests else None,
+                'total_prompt_tokens': self.total_tokens
+            }
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+def get_prompt_template(key, factory):
+    """
+    Return the compiled template for a key, compiling it on first use
+
+    Args:
+        key: Hashable key, e.g. (commentator, language, style)
+        factory: Function with no arguments returning a PromptTemplate
+
+    Returns:
+        PromptTemplate shared by all commentators using the same key
+    """
+    template = _templates.get(key)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(key)
+            if template is None:
+                template = factory()
+                _templates[key] = template
+    return template
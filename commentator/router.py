@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+from .backends import detect_event_kind
+
+# Base importance per event kind
+EVENT_KIND_IMPORTANCE = {
+    'goal': 0.8,
+    'save': 0.55,
+    'shot': 0.45,
+    'foul': 0.3,
+    'build_up': 0.2,
+    'general': 0.15
+}
+
+# Words that make any event matter more (decisive moments, cards, records)
+HIGH_STAKES_PATTERN = re.compile(
+    r"\b(penalty|red card|sent off|winner|winning|equali[sz]er|last.minute|stoppage time|injury time|final|"
+    r"record|hat.trick|match point|championship|buzzer.beater|game.winning|overtime|disallowed|var)\b"
+    r"|ركلة جزاء|بطاقة حمراء|هدف الفوز|التعادل|الدقيقة الأخيرة|رقم قياسي|هاتريك",
+    re.IGNORECASE
+)
+EXCITEMENT_PATTERN = re.compile(
+    r"\b(incredible|stunning|spectacular|brilliant|amazing|unbelievable|sensational|wonder|screamer|"
+    r"top corner|bicycle|overhead|long range|solo)\b|رائع|مذهل|صاروخية",
+    re.IGNORECASE
+)
+
+def score_event_importance(event_description, sport="general", entities=None):
+    """
+    Score how important an event is for commentary, from 0 (minor) to 1 (decisive)
+
+    Args:
+        event_description: Description of the event
+        sport: Detected sport type
+        entities: Dict with 'players' and 'teams' lists, if known
+
+    Returns:
+        Importance score between 0 and 1
+    """
+    score = EVENT_KIND_IMPORTANCE[detect_event_kind(event_description)]
+
+    if HIGH_STAKES_PATTERN.search(event_description):
+        score += 0.25
+    if EXCITEMENT_PATTERN.search(event_description):
+        score += 0.1
+    if "!" in event_description:
+        score += 0.05
+
+    # Known star players and teams draw the audience's attention
+    if entities:
+        score += 0.05 * min(2, len(entities.get('players', [])))
+        score += 0.025 * min(2, len(entities.get('teams', [])))
+
+    # Unrecognized sports give the scorer less to go on, so stay conservative
+    if sport == "general":
+        score -= 0.05
+
+    return max(0.0, min(1.0, score))
+
+def default_tiers():
+    """
+    Default routing tiers, from the most to the least important events
+
+    Models can be overridden with COMMENTARY_LARGE_MODEL and COMMENTARY_FAST_MODEL.
+    A tier with no model is handled by the local template backend.
+    """
+    return [
+        {'name': 'large', 'model': os.getenv("COMMENTARY_LARGE_MODEL", "gpt-4-turbo"), 'max_tokens': 100, 'min_score': 0.7},
+        {'name': 'fast', 'model': os.getenv("COMMENTARY_FAST_MODEL", "gpt-3.5-turbo"), 'max_tokens': 60, 'min_score': 0.4},
+        {'name': 'template', 'model': None, 'max_tokens': 0, 'min_score': 0.0}
+    ]
+
+class CommentaryRouter:
+    """
+    Routes each event to a commentary tier by importance and keeps per-match statistics.
+
+    High-importance events go to the large model, mid-tier events to a
+    cheaper and faster model, and the rest to the local template generator.
+    `report()` summarizes how many upstream calls and how much latency the
+    routing saved compared with sending every event to the large model.
+    """
+    def __init__(self, tiers=None, large_latency_estimate=1.5):
+        """
+        Args:
+            tiers: List of tier dicts (name, model, max_tokens, min_score), ordered by min_score descending
+            large_latency_estimate: Assumed large model latency in seconds until one has been measured
+        """
+        self.tiers = sorted(tiers or default_tiers(), key=lambda tier: tier['min_score'], reverse=True)
+        self.large_latency_estimate = large_latency_estimate
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear the statistics, e.g. at the start of a new match"""
+        with self.lock:
+            self.stats = {tier['name']: {'count': 0, 'total_latency': 0.0} for tier in self.tiers}
+
+    def route(self, event_description, sport="general", entities=None):
+        """
+        Pick the tier for an event
+
+        Args:
+            event_description: Description of the event
+            sport: Detected sport type
+            entities: Dict with 'players' and 'teams' lists, if known
+
+        Returns:
+            Tier dict, with the importance score added under 'score'
+        """
+        score = score_event_importance(event_description, sport, entities)
+        for tier in self.tiers:
+            if score >= tier['min_score']:
+                return {**tier, 'score': score}
+        return {**self.tiers[-1], 'score': score}
+
+    def record(self, tier, latency):
+        """
+        Record the generation latency of a routed event
+
+        Args:
+            tier: Tier dict returned by route()
+            latency: Generation time in seconds
+        """
+        with self.lock:
+            stats = self.stats.setdefault(tier['name'], {'count': 0, 'total_latency': 0.0})
+            stats['count'] += 1
+            stats['total_latency'] += latency
+
+    def report(self):
+        """
+        Summarize routing for the match so far
+
+        Returns:
+            Dict with per-tier counts and latencies, upstream calls saved and
+            estimated latency saved versus sending every event to the top tier
+        """
+        with self.lock:
+            top = self.tiers[0]['name']
+            events = sum(stats['count'] for stats in self.stats.values())
+
+            tiers = {}
+            for tier in self.tiers:
+                stats = self.stats[tier['name']]
+                tiers[tier['name']] = {
+                    'model': tier['model'] or 'template',
+                    'count': stats['count'],
+                    'mean_latency_ms': round(stats['total_latency'] / stats['count'] * 1000, 1) if stats['count'] else None,
+                    'total_latency_ms': round(stats['total_latency'] * 1000, 1)
+                }
+
+            top_stats = self.stats[top]
+            top_latency = (top_stats['total_latency'] / top_stats['count']) if top_stats['count'] else self.large_latency_estimate
+            actual_latency = sum(stats['total_latency'] for stats in self.stats.values())
+            local_calls = sum(self.stats[tier['name']]['count'] for tier in self.tiers if tier['model'] is None)
+
+            return {
+                'events': events,
+                'tiers': tiers,
+                'upstream_calls': events - local_calls,
+                'upstream_calls_saved': local_calls,
+                'large_model_calls_saved': events - top_stats['count'],
+                'estimated_latency_saved_ms': round(max(0.0, events * top_latency - actual_latency) * 1000, 1)
+            }
+
+def create_router(enabled=None):
+    """
+    Create a router if routing is enabled by argument or COMMENTARY_ROUTING=on
+
+    Args:
+        enabled: True/False to force, or None to read the environment
+
+    Returns:
+        CommentaryRouter or None
+    """
+    if enabled is None:
+        enabled = os.getenv("COMMENTARY_ROUTING", "off").lower() in ("1", "on", "true", "yes")
+    return CommentaryRouter() if enabled else None
@@ -0,0 +1,256 @@
+import re
+import time
+from collections import Counter, deque
+from .backends import detect_event_kind, guess_player_name
+
+# Numbered reply lines, e.g. "1. What a goal!" or "2) ..."
+NUMBERED_LINE = re.compile(r"^\s*(\d+)\s*[.):-]\s*(.+?)\s*$")
+
+class MatchSession:
+    """
+    Match-level commentary with a compact rolling state.
+
+    Instead of describing every event from scratch, each model request sends
+    a short summary of the match so far (score, players involved, the last
+    few lines) plus only the new events. Events that fall within
+    `window` seconds of each other are commentated in a single call, with
+    one numbered line per event. With routing enabled a batch makes one call
+    per tier, so each event gets its tier's model and token budget. The
+    static instructions live in the commentator's compiled session prompt,
+    so they form a cacheable prefix.
+    """
+    def __init__(self, commentator, window=10.0, max_batch=4, recent_events=3, max_players=5):
+        """
+        Args:
+            commentator: Commentator or FootballCommentator providing the backends and prompts
+            window: Maximum time span in seconds of events batched into one call
+            max_batch: Maximum number of events per call
+            recent_events: Number of recent moments kept in the summary
+            max_players: Number of most mentioned players kept in the summary
+        """
+        self.commentator = commentator
+        self.window = window
+        self.max_batch = max_batch
+        self.max_players = max_players
+
+        self.score = Counter()
+        self.players = Counter()
+        self.recent = deque(maxlen=recent_events)
+
+        self.calls = 0
+        self.events = 0
+        self.local_events = 0
+        self.prompt_tokens = 0
+        self.generation_time = 0.0
+
+    def summary(self):
+        """
+        Compact description of the match state
+
+        Returns:
+            Summary text (empty at the start of the match)
+        """
+        parts = []
+        if self.score:
+            parts.append("Score: " + ", ".join(f"{team} {goals}" for team, goals in self.score.items()))
+        if self.players:
+            parts.append("Players so far: " + ", ".join(name for name, _ in self.players.most_common(self.max_players)))
+        if self.recent:
+            # The lines already said carry the content of recent moments and prevent repetition
+            parts.append("Recent lines:\n" + "\n".join(f"- [{timestamp:.0f}s] {line}" for timestamp, line in self.recent))
+        return "\n".join(parts)
+
+    def commentate(self, events):
+        """
+        Generate commentary for a list of events in match order
+
+        Args:
+            events: List of events with descriptions and timestamps
+
+        Returns:
+            List of (event, commentary, sport) tuples in timestamp order
+        """
+        results = []
+        for batch in self._batches(sorted(events, key=lambda event: event['timestamp'])):
+            results.extend(self._commentate_batch(batch))
+        return results
+
+    async def commentate_async(self, events):
+        """
+        Generate commentary for a list of events without blocking the event loop
+
+        Batches are still requested one after another, since each request
+        carries the match state left by the previous one.
+
+        Args:
+            events: List of events with descriptions and timestamps
+
+        Returns:
+            List of (event, commentary, sport) tuples in timestamp order
+        """
+        results = []
+        for batch in self._batches(sorted(events, key=lambda event: event['timestamp'])):
+            contexts, lines, groups = self._plan_batch(batch)
+            for tier, indexes in groups:
+                start_time = time.perf_counter()
+                replies = await self._request_async([batch[i] for i in indexes], contexts[indexes[0]][0], tier)
+                self._record_call(tier, len(indexes), start_time)
+                for position, i in enumerate(indexes):
+                    lines[i] = replies.get(position + 1)
+            results.extend(self._finish_batch(batch, contexts, lines))
+        return results
+
+    def _batches(self, events):
+        """Group events that fall within the batching window"""
+        batch = []
+        for event in events:
+            if batch and (event['timestamp'] - batch[0]['timestamp'] > self.window or len(batch) >= self.max_batch):
+                yield batch
+                batch = []
+            batch.append(event)
+        if batch:
+            yield batch
+
+    def _commentate_batch(self, batch):
+        """Commentate one batch of adjacent events with one model call per routing tier"""
+        contexts, lines, groups = self._plan_batch(batch)
+
+        for tier, indexes in groups:
+            start_time = time.perf_counter()
+            replies = self._request([batch[i] for i in indexes], contexts[indexes[0]][0], tier)
+            self._record_call(tier, len(indexes), start_time)
+            for position, i in enumerate(indexes):
+                lines[i] = replies.get(position + 1)
+
+        return self._finish_batch(batch, contexts, lines)
+
+    def _plan_batch(self, batch):
+        """
+        Route the events of a batch, commentating the minor ones locally
+
+        Returns:
+            Tuple of (event contexts, commentary lines so far, list of
+            (routing tier or None, indexes of events for that tier's model))
+        """
+        contexts = [self.commentator._event_context(event['description']) for event in batch]
+        lines = [None] * len(batch)
+        router = self.commentator.router if self.commentator.backend.is_remote else None
+
+        # Events the router considers minor are handled locally, the rest go to their tier's model
+        groups = {}
+        for i, (event, (sport, entities)) in enumerate(zip(batch, contexts)):
+            tier = router.route(event['description'], sport, entities) if router else None
+            if not self.commentator.backend.is_remote or (tier and tier['model'] is None):
+                start_time = time.perf_counter()
+                lines[i] = self.commentator.local_backend.generate(event['description'], sport, entities)
+                self.local_events += 1
+                if tier:
+                    router.record(tier, time.perf_counter() - start_time)
+            else:
+                groups.setdefault(tier['name'] if tier else None, (tier, []))[1].append(i)
+        return contexts, lines, list(groups.values())
+
+    def _record_call(self, tier, count, start_time):
+        """Add a model call to the session time and the router statistics"""
+        latency = time.perf_counter() - start_time
+        self.generation_time += latency
+        if tier:
+            # Each event of the call is charged an equal share of its latency
+            for _ in range(count):
+                self.commentator.router.record(tier, latency / count)
+
+    def _finish_batch(self, batch, contexts, lines):
+        """Fill in missing lines and fold the batch into the match state"""
+        results = []
+        for event, (sport, entities), line in zip(batch, contexts, lines):
+            if not line:
+                # Missing or unparsable reply for this event
+                backend = self.commentator.fallback_backend or self.commentator.local_backend
+                line = backend.generate(event['description'], sport, entities)
+            self._update_state(event, entities, line)
+            results.append((event, line, sport))
+        return results
+
+    def _request(self, events, sport, tier=None):
+        """
+        Send the match summary and the new events to the model
+
+        Args:
+            events: Events to commentate in this call
+            sport: Sport of the events
+            tier: Routing tier selecting the model and token budget, if routing is enabled
+
+        Returns:
+            Dict mapping event number (1-based) to commentary line
+        """
+        payload = self._request_payload(events, sport, tier)
+        try:
+            reply = self.commentator.backend.generate(events[0]['description'], sport, payload=payload)
+        except Exception as e:
+            print(f"Exception in match commentary generation: {e}")
+            return {}
+        return self._parse_replies(reply, len(events))
+
+    async def _request_async(self, events, sport, tier=None):
+        """Same as _request(), awaiting the backend"""
+        payload = self._request_payload(events, sport, tier)
+        try:
+            reply = await self.commentator.backend.generate_async(events[0]['description'], sport, payload=payload)
+        except Exception as e:
+            print(f"Exception in match commentary generation: {e}")
+            return {}
+        return self._parse_replies(reply, len(events))
+
+    def _request_payload(self, events, sport, tier=None):
+        """Render the session prompt for the new events and count the request"""
+        template = self.commentator._session_template(sport)
+        numbered = "\n".join(f"{i}. [{event['timestamp']:.0f}s] {event['description']}"
+                             for i, event in enumerate(events, 1))
+        payload = template.render(summary=self.summary() or "-", events=numbered)
+        payload["max_tokens"] = (tier['max_tokens'] if tier else template.max_tokens) * len(events)
+        if tier:
+            payload["model"] = tier['model']
+
+        self.calls += 1
+        self.events += len(events)
+        self.prompt_tokens += template.last_tokens or 0
+        return payload
+
+    def _parse_replies(self, reply, count):
+        """Map the numbered lines of a reply to event numbers"""
+        replies = {}
+        for line in reply.splitlines():
+            match = NUMBERED_LINE.match(line)
+            if match:
+                replies[int(match.group(1))] = match.group(2)
+        if not replies and count == 1 and reply.strip():
+            replies[1] = reply.strip()
+        return replies
+
+    def _update_state(self, event, entities, line):
+        """Fold an event and its commentary into the rolling state"""
+        description = event['description']
+        players = (entities or {}).get('players') or []
+        if not players:
+            name = guess_player_name(description)
+            players = [name] if name else []
+        self.players.update(players)
+
+        teams = (entities or {}).get('teams') or []
+        if teams and detect_event_kind(description) == 'goal':
+            # The first team named in a goal event is taken as the scoring side
+            self.score[teams[0]] += 1
+
+        short = line if len(line) <= 100 else line[:97] + "..."
+        self.recent.append((event['timestamp'], short))
+
+    def stats(self):
+        """Return model call and token statistics for the session"""
+        return {
+            'model_calls': self.calls,
+            'local_events': self.local_events,
+            'events_per_call': round(self.events / self.calls, 2) if self.calls else None,
+            'prompt_tokens': self.prompt_tokens,
+            'prompt_tokens_per_event': round(self.prompt_tokens / self.events, 1) if self.events else None,
+            'generation_time_ms': round(self.generation_time * 1000, 1)
+        }
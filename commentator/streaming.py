@@ -0,0 +1,112 @@
+import json
+import time
+from http_client.client import get_client
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+class CommentaryStream:
+    """
+    Iterator over commentary tokens as they arrive from the model.
+
+    Iterating yields text deltas. Timing is recorded along the way so callers
+    can report time-to-first-token and total generation time, and the full
+    text is available in `text` once the stream is exhausted. `fallback` is
+    set when the backend failed, so the text is a fallback line or was cut
+    short.
+    """
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self.start_time = time.perf_counter()
+        self.time_to_first_token = None
+        self.total_time = None
+        self.text = ""
+        self.fallback = False
+
+    def mark_fallback(self):
+        """Record that the backend failed while producing this stream"""
+        self.fallback = True
+
+    def __iter__(self):
+        for token in self._tokens:
+            if not token:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self.start_time
+            self.text += token
+            yield token
+        self.total_time = time.perf_counter() - self.start_time
+        self.text = self.text.strip()
+
+    def read(self):
+        """
+        Consume the whole stream
+
+        Returns:
+            Full commentary text
+        """
+        for _ in self:
+            pass
+        return self.text
+
+def stream_chat_completion(api_key, payload):
+    """
+    Call the OpenAI chat completions API with streaming enabled
+
+    Args:
+        api_key: OpenAI API key
+        payload: Chat completion payload (the `stream` flag is added here)
+
+    Returns:
+        Generator of text deltas
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+    response = get_client().post(
+        OPENAI_CHAT_URL,
+        endpoint="openai.chat.stream",
+        headers=headers,
+        json={**payload, "stream": True},
+        stream=True
+    )
+
+    try:
+        if response.status_code != 200:
+            raise RuntimeError(f"Error calling OpenAI API: {response.status_code} {response.text}")
+
+        # Server-sent events are UTF-8; without a charset requests would assume ISO-8859-1 for text/*
+        response.encoding = "utf-8"
+
+        # Server-sent events: one "data: {...}" line per chunk, terminated by "data: [DONE]"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            choices = chunk.get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+    finally:
+        response.close()
+
+def stream_text(text):
+    """
+    Stream an already available text word by word
+
+    Used for fallback commentary so callers get the same interface
+    whether or not the model is reachable.
+
+    Args:
+        text: Text to stream
+
+    Returns:
+        Generator of text deltas
+    """
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        yield word if i == 0 else " " + word
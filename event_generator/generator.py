@@ -1,10 +1,13 @@
 import os
-import requests
 import json
 import base64
+import asyncio
 import cv2
 import numpy as np
 from dotenv import load_dotenv
+from http_client.client import get_client, get_async_client
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
 
 load_dotenv()
 
@@ -29,8 +32,7 @@ class EventGenerator:
         
         for highlight in highlights:
             # Convert frame to base64 for API
-            _, buffer = cv2.imencode('.jpg', highlight['frame'])
-            encoded_frame = base64.b64encode(buffer).decode('utf-8')
+            encoded_frame = _encode_frame(highlight['frame'])
             
             # Generate event description using OpenAI Vision
             event_description = self._analyze_frame_with_llm(encoded_frame)
@@ -45,6 +47,38 @@ class EventGenerator:
                 
         return events
     
+    async def generate_events_async(self, highlights, max_concurrency=16):
+        """
+        Generate events from video highlights without blocking the event loop
+        
+        JPEG encoding runs in the default executor and the vision requests run
+        concurrently, with at most `max_concurrency` in flight.
+        
+        Args:
+            highlights: List of highlights with timestamps and frame data
+            max_concurrency: Maximum number of concurrent API requests
+            
+        Returns:
+            List of events with descriptions and timestamps
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def analyze(highlight):
+            encoded_frame = await loop.run_in_executor(None, _encode_frame, highlight['frame'])
+            async with semaphore:
+                event_description = await self._analyze_frame_with_llm_async(encoded_frame)
+            if event_description:
+                return {
+                    'timestamp': highlight['timestamp'],
+                    'description': event_description,
+                    'frame_idx': highlight['frame_idx']
+                }
+            return None
+        
+        results = await asyncio.gather(*(analyze(highlight) for highlight in highlights))
+        return [event for event in results if event]
+    
     def _analyze_frame_with_llm(self, encoded_frame):
         """
         Use OpenAI Vision API to analyze the frame
@@ -60,38 +94,27 @@ class EventGenerator:
             return "Exciting play detected at this timestamp"
             
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
+            response = get_client().post(OPENAI_CHAT_URL, **self._request_args(encoded_frame))
             
-            payload = {
-                "model": "gpt-4-vision-preview",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "You are a sports analyst AI. Describe the key event happening in this sports highlight. Be specific and concise. Focus on what makes this a highlight moment."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{encoded_frame}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": 100
-            }
+            if response.status_code == 200:
+                result = response.json()
+                return result["choices"][0]["message"]["content"].strip()
+            else:
+                print(f"Error calling OpenAI API: {response.status_code}")
+                print(response.text)
+                return "Error analyzing highlight"
+                
+        except Exception as e:
+            print(f"Exception in LLM analysis: {e}")
+            return "Error analyzing highlight" 
+    
+    async def _analyze_frame_with_llm_async(self, encoded_frame):
+        """Same as _analyze_frame_with_llm(), awaiting the request"""
+        if not self.api_key:
+            return "Exciting play detected at this timestamp"
             
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload
-            )
+        try:
+            response = await get_async_client().post(OPENAI_CHAT_URL, **self._request_args(encoded_frame))
             
             if response.status_code == 200:
                 result = response.json()
@@ -103,4 +126,53 @@ class EventGenerator:
                 
         except Exception as e:
             print(f"Exception in LLM analysis: {e}")
-            return "Error analyzing highlight" 
\ No newline at end of file
+            return "Error analyzing highlight"
+    
+    def _request_args(self, encoded_frame):
+        """
+        Build the vision API request for a frame
+        
+        Args:
+            encoded_frame: Base64 encoded frame
+            
+        Returns:
+            Keyword arguments for the HTTP client's post()
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        
+        payload = {
+            "model": "gpt-4-vision-preview",
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "You are a sports analyst AI. Describe the key event happening in this sports highlight. Be specific and concise. Focus on what makes this a highlight moment."
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:image/jpeg;base64,{encoded_frame}"
+                            }
+                        }
+                    ]
+                }
+            ],
+            "max_tokens": 100
+        }
+        
+        return {
+            'endpoint': "openai.vision",
+            'timeout': (3.05, 90),
+            'headers': headers,
+            'json': payload
+        }
+
+def _encode_frame(frame):
+    """Encode a frame as base64 JPEG for the vision API"""
+    _, buffer = cv2.imencode('.jpg', frame)
+    return base64.b64encode(buffer).decode('utf-8')
@@ -0,0 +1,572 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import weakref
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:
+    # aiohttp is optional, async requests then run the sync client in worker threads
+    aiohttp = None
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, float("inf")]
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised when a host's circuit breaker is open and requests are not attempted"""
+
+class LatencyHistogram:
+    """Thread-safe latency histogram with fixed buckets"""
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.lock = threading.Lock()
+        self.total = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+
+    def record(self, latency, error=False):
+        """
+        Record one request
+
+        Args:
+            latency: Latency in seconds
+            error: Whether the request failed
+        """
+        latency_ms = latency * 1000
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if latency_ms <= bound:
+                    self.counts[i] += 1
+                    break
+            self.total += 1
+            self.sum_ms += latency_ms
+            if error:
+                self.errors += 1
+
+    def percentile(self, q):
+        """
+        Approximate a latency percentile from the buckets
+
+        Args:
+            q: Percentile between 0 and 100
+
+        Returns:
+            Upper bound of the bucket holding the percentile, in milliseconds, or None without samples
+        """
+        with self.lock:
+            if not self.total:
+                return None
+            target = self.total * q / 100
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= target:
+                    return bound
+            return self.buckets[-1]
+
+    def snapshot(self):
+        """Return the histogram as a JSON-serializable dict"""
+        p50, p95, p99 = self.percentile(50), self.percentile(95), self.percentile(99)
+        with self.lock:
+            return {
+                'count': self.total,
+                'errors': self.errors,
+                'mean_ms': round(self.sum_ms / self.total, 1) if self.total else None,
+                'p50_ms': p50,
+                'p95_ms': p95,
+                'p99_ms': p99,
+                'buckets': {("inf" if bound == float("inf") else str(bound)): count
+                            for bound, count in zip(self.buckets, self.counts)}
+            }
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    requests fail fast for `reset_timeout` seconds. Then a single trial
+    request is let through (half-open); its outcome closes or reopens it.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def allow(self):
+        """Return True if a request may be sent"""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.trial_in_flight = False
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of recent traffic.
+
+    Every request deposits `ratio` tokens (up to `max_tokens`) and every retry
+    spends one, so a struggling upstream sees at most about `ratio` extra load
+    instead of a retry storm. `min_tokens` lets low-traffic clients still retry.
+    """
+    def __init__(self, ratio=0.2, min_tokens=3, max_tokens=20):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(min_tokens)
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Return True and spend a token if a retry is allowed"""
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+class HTTPClient:
+    """
+    Shared HTTP client for all upstream calls (OpenAI, ElevenLabs).
+
+    Uses one pooled session with a bounded number of connections per host,
+    default connect/read timeouts, retries with exponential backoff and
+    jitter within a retry budget, a circuit breaker per host, optional
+    request hedging for tail latency, and a latency histogram per endpoint.
+    """
+    def __init__(self, timeout=(3.05, 60), max_connections_per_host=10, max_retries=2,
+                 backoff_base=0.5, backoff_max=8.0, failure_threshold=5, reset_timeout=30.0):
+        """
+        Args:
+            timeout: Default (connect, read) timeout in seconds
+            max_connections_per_host: Connection pool size per host; extra requests wait for a free connection
+            max_retries: Retries per request after the first attempt
+            backoff_base: First backoff delay in seconds, doubled on each retry
+            backoff_max: Maximum backoff delay in seconds
+            failure_threshold: Consecutive failures that open a host's circuit
+            reset_timeout: Seconds before an open circuit lets a trial request through
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max_connections_per_host, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.histograms = {}
+        self.retry_budget = RetryBudget()
+        self.hedges = 0
+        self.hedge_wins = 0
+
+        # Threads for hedged requests, sized to the per-host connection limit
+        self.hedge_executor = ThreadPoolExecutor(max_workers=max_connections_per_host * 2,
+                                                 thread_name_prefix="http-hedge")
+
+    def breaker(self, host):
+        """Return the circuit breaker for a host"""
+        with self.lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[host]
+
+    def histogram(self, endpoint):
+        """Return the latency histogram for an endpoint"""
+        with self.lock:
+            if endpoint not in self.histograms:
+                self.histograms[endpoint] = LatencyHistogram()
+            return self.histograms[endpoint]
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, endpoint=None, timeout=None, retries=None, hedge=False, **kwargs):
+        """
+        Send a request with timeouts, retries, circuit breaking and optional hedging
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            endpoint: Name for the latency histogram (defaults to host and path)
+            timeout: (connect, read) timeout in seconds or one number for both, defaults to the client's
+            retries: Maximum retries, defaults to the client's
+            hedge: Send a second copy if the first is slower than the endpoint's p95 latency
+                (only use for requests that are safe to duplicate)
+            **kwargs: Passed to requests (headers, json, stream, ...)
+
+        Returns:
+            requests.Response (the last one if all retries returned a retryable status)
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open
+            requests.RequestException: If the last attempt failed to get a response
+        """
+        parsed = urlparse(url)
+        endpoint = endpoint or f"{parsed.netloc}{parsed.path}"
+        breaker = self.breaker(parsed.netloc)
+        histogram = self.histogram(endpoint)
+        kwargs["timeout"] = timeout or self.timeout
+        retries = self.max_retries if retries is None else retries
+
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {parsed.netloc}, not calling {endpoint}")
+
+            start_time = time.perf_counter()
+            try:
+                if hedge and not kwargs.get("stream"):
+                    response = self._send_hedged(method, url, histogram, kwargs)
+                else:
+                    response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                histogram.record(time.perf_counter() - start_time, error=True)
+                breaker.record_failure()
+                if attempt >= retries or not self.retry_budget.withdraw():
+                    raise
+                print(f"Request to {endpoint} failed ({e}), retrying")
+                delay = self.backoff(attempt)
+            else:
+                failed = response.status_code >= 500
+                histogram.record(time.perf_counter() - start_time, error=failed or response.status_code == 429)
+                if failed:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                if response.status_code not in RETRY_STATUSES or attempt >= retries or not self.retry_budget.withdraw():
+                    return response
+
+                delay = self.backoff(attempt, response.headers.get("Retry-After"))
+                print(f"{endpoint} returned {response.status_code}, retrying in {delay:.1f}s")
+                response.close()
+
+            time.sleep(delay)
+            attempt += 1
+
+    def backoff(self, attempt, retry_after=None):
+        """Exponential backoff with full jitter, honoring Retry-After when given"""
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _send_hedged(self, method, url, histogram, kwargs):
+        """
+        Send a request and, if it is slower than the endpoint's p95, a second copy
+
+        The first response to arrive wins; the other one is closed when it
+        completes. Hedging only starts once the endpoint has enough samples
+        for a meaningful p95.
+        """
+        first = self.hedge_executor.submit(self.session.request, method, url, **kwargs)
+        timeout = kwargs["timeout"]
+        hedge_delay = self.hedge_delay(histogram, timeout[1] if isinstance(timeout, tuple) else timeout)
+        if hedge_delay is None:
+            return first.result()
+
+        done, _ = wait([first], timeout=hedge_delay)
+        if done:
+            return first.result()
+
+        with self.lock:
+            self.hedges += 1
+        second = self.hedge_executor.submit(self.session.request, method, url, **kwargs)
+        pending = {first, second}
+        error = None
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    other.add_done_callback(_close_response)
+                if future is second:
+                    with self.lock:
+                        self.hedge_wins += 1
+                return future.result()
+        raise error
+
+    def hedge_delay(self, histogram, read_timeout=None):
+        """
+        Seconds to wait before hedging a request to an endpoint
+
+        Args:
+            histogram: LatencyHistogram of the endpoint
+            read_timeout: Read timeout of the request in seconds, if any
+
+        Returns:
+            The endpoint's p95 latency, or None (do not hedge) without enough
+            samples or when the p95 is unbounded or not below the read timeout
+        """
+        p95 = histogram.percentile(95) if histogram.total >= 20 else None
+        if p95 is None or not math.isfinite(p95):
+            return None
+        if read_timeout is not None and p95 / 1000 >= read_timeout:
+            # The first request times out before a copy sent this late could win
+            return None
+        return p95 / 1000
+
+    def stats(self):
+        """
+        Return per-endpoint latency histograms and client state
+
+        Returns:
+            Dict with histograms, circuit breaker states and hedging counters
+        """
+        with self.lock:
+            histograms = dict(self.histograms)
+            breakers = dict(self.breakers)
+            hedges, hedge_wins = self.hedges, self.hedge_wins
+        return {
+            'endpoints': {endpoint: histogram.snapshot() for endpoint, histogram in histograms.items()},
+            'circuits': {host: breaker.state for host, breaker in breakers.items()},
+            'hedges': hedges,
+            'hedge_wins': hedge_wins,
+            'retry_tokens': round(self.retry_budget.tokens, 2)
+        }
+
+class AsyncResponse:
+    """Fully read response of an async request, with the parts of the requests.Response interface callers use"""
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+class AsyncHTTPClient:
+    """
+    asyncio counterpart of HTTPClient for use inside an event loop.
+
+    With aiohttp installed, requests run on one connection pool per event
+    loop without a thread per request, so thousands of upstream calls can be
+    in flight at once. Retries, circuit breakers, retry budget and latency
+    histograms are shared with the sync client, so `/upstream_stats` covers
+    both. Without aiohttp, requests run the sync client in worker threads.
+    """
+    def __init__(self, client, max_connections_per_host=100):
+        """
+        Args:
+            client: HTTPClient whose settings and statistics are shared
+            max_connections_per_host: Concurrent connections per host
+        """
+        self.client = client
+        self.max_connections_per_host = max_connections_per_host
+        self.session = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.max_connections_per_host)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        """Close the connection pool"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def request(self, method, url, endpoint=None, timeout=None, retries=None, hedge=False, **kwargs):
+        """
+        Send a request with timeouts, retries, circuit breaking and optional hedging
+
+        Args:
+            Same as HTTPClient.request (streaming is not supported)
+
+        Returns:
+            AsyncResponse (the last one if all retries returned a retryable status)
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open
+            requests.RequestException: If the last attempt failed to get a response
+        """
+        if aiohttp is None:
+            response = await asyncio.to_thread(self.client.request, method, url, endpoint=endpoint,
+                                               timeout=timeout, retries=retries, hedge=hedge, **kwargs)
+            return AsyncResponse(response.status_code, response.headers, response.content)
+
+        client = self.client
+        parsed = urlparse(url)
+        endpoint = endpoint or f"{parsed.netloc}{parsed.path}"
+        breaker = client.breaker(parsed.netloc)
+        histogram = client.histogram(endpoint)
+        timeout = timeout or client.timeout
+        # A single number is both the connect and the read timeout, as with requests
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        kwargs["timeout"] = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        retries = client.max_retries if retries is None else retries
+
+        client.retry_budget.deposit()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {parsed.netloc}, not calling {endpoint}")
+
+            start_time = time.perf_counter()
+            try:
+                if hedge:
+                    response = await self._send_hedged(method, url, histogram, kwargs)
+                else:
+                    response = await self._send(method, url, kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                histogram.record(time.perf_counter() - start_time, error=True)
+                breaker.record_failure()
+                if attempt >= retries or not client.retry_budget.withdraw():
+                    raise requests.exceptions.ConnectionError(f"{endpoint} failed: {e!r}")
+                print(f"Request to {endpoint} failed ({e!r}), retrying")
+                delay = client.backoff(attempt)
+            else:
+                failed = response.status_code >= 500
+                histogram.record(time.perf_counter() - start_time, error=failed or response.status_code == 429)
+                if failed:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+
+                if response.status_code not in RETRY_STATUSES or attempt >= retries or not client.retry_budget.withdraw():
+                    return response
+
+                delay = client.backoff(attempt, response.headers.get("Retry-After"))
+                print(f"{endpoint} returned {response.status_code}, retrying in {delay:.1f}s")
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _send(self, method, url, kwargs):
+        async with self._get_session().request(method, url, **kwargs) as response:
+            return AsyncResponse(response.status, response.headers, await response.read())
+
+    async def _send_hedged(self, method, url, histogram, kwargs):
+        """Send a request and, if it is slower than the endpoint's p95, a second copy; the loser is cancelled"""
+        hedge_delay = self.client.hedge_delay(histogram, kwargs["timeout"].sock_read)
+        first = asyncio.ensure_future(self._send(method, url, kwargs))
+        if hedge_delay is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=hedge_delay)
+        if done:
+            return first.result()
+
+        with self.client.lock:
+            self.client.hedges += 1
+        second = asyncio.ensure_future(self._send(method, url, kwargs))
+        pending = {first, second}
+        error = None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                if task is second:
+                    with self.client.lock:
+                        self.client.hedge_wins += 1
+                return task.result()
+        raise error
+
+def _close_response(future):
+    """Close the response of a hedged request that lost the race"""
+    if future.exception() is None:
+        future.result().close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    Return the process-wide HTTP client, creating it on first use
+
+    Configured with HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    HTTP_MAX_CONNECTIONS_PER_HOST and HTTP_MAX_RETRIES.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTPClient(
+                    timeout=(float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05)), float(os.getenv("HTTP_READ_TIMEOUT", 60))),
+                    max_connections_per_host=int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 10)),
+                    max_retries=int(os.getenv("HTTP_MAX_RETRIES", 2))
+                )
+    return _client
+
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_client():
+    """
+    Return the async HTTP client of the running event loop, creating it on first use
+
+    Configured with HTTP_ASYNC_MAX_CONNECTIONS_PER_HOST; shares settings and
+    statistics with get_client().
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncHTTPClient(get_client(), int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS_PER_HOST", 100)))
+        _async_clients[loop] = client
+    return client
@@ -1,16 +1,23 @@
 import os
 import argparse
+import asyncio
 from video_processor.processor import VideoProcessor
 from event_generator.generator import EventGenerator
 from commentator.commentator import Commentator
 from tts_module.tts import TTSModule
+from http_client.client import get_async_client
 
 def main():
     parser = argparse.ArgumentParser(description='AI Sports Commentator')
     parser.add_argument('--video', type=str, required=True, help='Path to the video file')
     parser.add_argument('--output', type=str, default='output.mp4', help='Path to the output video file')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Run the pipeline on an asyncio event loop with concurrent API calls')
     args = parser.parse_args()
     
+    if args.use_async:
+        asyncio.run(main_async(args))
+        return
+    
     # Initialize modules
     video_processor = VideoProcessor()
     event_generator = EventGenerator()
@@ -28,6 +35,7 @@ def main():
     # Generate commentary from events
     print("Generating commentary...")
     commentary = commentator.generate_commentary(events)
+    print_routing_report(commentator)
     
     # Convert commentary to speech
     print("Converting commentary to speech...")
@@ -39,5 +47,40 @@ def main():
     
     print(f"Output saved to {args.output}")
 
+async def main_async(args):
+    """Run the pipeline with the async variants of each module"""
+    video_processor = VideoProcessor()
+    event_generator = EventGenerator()
+    commentator = Commentator()
+    tts_module = TTSModule()
+    
+    try:
+        print("Processing video to detect highlights...")
+        highlights = await video_processor.process_video_async(args.video)
+        
+        print("Generating events from highlights...")
+        events = await event_generator.generate_events_async(highlights)
+        
+        print("Generating commentary...")
+        commentary = await commentator.generate_commentary_async(events)
+        print_routing_report(commentator)
+        
+        print("Converting commentary to speech...")
+        audio_segments = await tts_module.text_to_speech_async(commentary)
+        
+        print("Syncing speech with video...")
+        await video_processor.sync_audio_with_video_async(args.video, audio_segments, events, args.output)
+    finally:
+        await get_async_client().close()
+    
+    print(f"Output saved to {args.output}")
+
+def print_routing_report(commentator):
+    if commentator.router:
+        report = commentator.router.report()
+        print(f"Routing: {report['upstream_calls']} model calls for {report['events']} events, "
+              f"{report['large_model_calls_saved']} large model calls and "
+              f"~{report['estimated_latency_saved_ms'] / 1000:.1f}s saved")
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
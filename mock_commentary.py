@@ -14,7 +14,7 @@ eleven_key = os.getenv("ELEVENLABS_API_KEY")
 if not openai_key:
     print("Warning: OPENAI_API_KEY not set. Commentary generation will use fallback text.")
 if not eleven_key:
-    print("Warning: ELEVENLABS_API_KEY not set. TTS will create dummy audio files.")
+    print("Warning: ELEVENLABS_API_KEY not set. TTS will use the offline synthesizer.")
 
 # Enhanced mock event data with player names and more details
 mock_events = [
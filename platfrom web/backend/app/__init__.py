@@ -60,6 +60,10 @@ def create_app(config_name=None):
     from .utils.error_handlers import register_error_handlers
     register_error_handlers(app)
     
+    # Register SocketIO handlers pushing processing jobs progress and results
+    from .sockets import register_socket_handlers
+    register_socket_handlers(socketio, app)
+    
     # Register before request handler to initialize JSON DB connection
     @app.before_request
     def before_request():
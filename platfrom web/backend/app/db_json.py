@@ -1,60 +1,693 @@
 import json
 import os
 import uuid
+import atexit
+import logging
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Union
 import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows, the multi-process mode is not available
+    fcntl = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLLECTIONS = ['users', 'teams', 'leagues', 'matches', 'highlights', 'events', 'reports', 'reels']
+COMPACT_MIN_BYTES = 4 * 1024 * 1024  # The log is never compacted below this size
+
+# Secondary indexes: collection -> {field: unique}
+DEFAULT_INDEXES = {
+    'users': {'email': True},
+    'highlights': {'match_id': False},
+    'matches': {'status': False},
+    'events': {'match_id': False},
+    'reports': {'match_id': False}
+}
+
+class DuplicateKeyError(ValueError):
+    """Raised when a write would give two records the same id or the same value of a unique field."""
+
+class ReadWriteLock:
+    """
+    Lock held by any number of readers at once, or by a single writer.
+    
+    Waiting writers go first, so a steady flow of readers cannot starve
+    them. The lock is not reentrant.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+    
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+    
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+    
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+    
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+class Collection:
+    """Records of a collection by id, with its secondary indexes and lock."""
+    
+    def __init__(self, name: str, index_fields: Dict[str, bool]):
+        self.name = name
+        self.items = {}  # id -> record, in insertion order
+        self.index_fields = dict(index_fields)  # field -> unique
+        self.indexes = {field: {} for field in index_fields}  # field -> value -> {id: record}
+        self.index_keys = {}  # id -> {field: indexed value}, records may be changed in place by callers
+        self.lock = ReadWriteLock()
+        self.snapshot = ()  # Tuple of the records for readers, None after a write until a reader rebuilds it
 
 class JsonDB:
-    """A simple JSON file-based database implementation."""
+    """
+    A simple JSON file-based database implementation.
+    
+    The database is a JSON snapshot (`database.json`) plus an append-only
+    write-ahead log next to it (`database.json.wal`). Every change appends
+    one JSON line with the new state of the record to the log, so writes
+    cost O(record) instead of rewriting the whole file. On load, the log
+    is replayed over the snapshot; a line torn by a crash is dropped.
+    
+    When the log grows bigger than the snapshot, it is compacted: a new
+    snapshot is written to a temporary file and atomically renamed over
+    the old one, then the log is truncated. A crash at any point leaves
+    either the old or the new snapshot, never a partial one.
+    
+    In memory, each collection maps record ids to records, so lookups,
+    updates and deletes by id are O(1). Secondary hash indexes map the
+    values of a field to the records having it; they are kept up to date
+    on every change and used by get_all() when a filter key is indexed.
     
-    def __init__(self, db_path='database.json'):
-        """Initialize the database with the path to the JSON file."""
+    Each collection has its own reader-writer lock, held by writers only
+    for the in-memory change. Stored records are never changed in place
+    (writes store new dicts), so readers copy references under the read
+    lock, or not at all for get_by_id() and unfiltered reads of an
+    unchanged collection, and work on them outside the lock. The public
+    methods hand out copies of the records and store copies of the data
+    they are given, so callers can't change a stored record (or a change
+    still waiting to be logged) behind the database's back. Writing to
+    the log happens on a background flusher thread, which writes all the
+    changes queued since its last write at once (group commit). By
+    default writers don't return before their change is on the log: the
+    first waiting writer writes the whole queue, so concurrent writers
+    share one write instead of each paying for their own.
+
+    With multiprocess set, several processes (e.g. gunicorn workers) can
+    use the same files. Every logged change carries a version, increasing
+    across all the processes. Writers take an exclusive lock on
+    `database.json.lock` (fcntl), apply the changes the other processes
+    logged since their last read, then append their own change directly.
+    Before each operation, a process compares the size and inode of the log
+    with the part it has applied (one stat call) and only reads the new
+    records. A new log written by a checkpoint starts with the version of
+    the snapshot, so processes switch to it without reloading the snapshot.
+    """
+    
+    def __init__(self, db_path='database.json', fsync=False, compact_min_bytes=COMPACT_MIN_BYTES, indexes=None,
+                 wait_for_flush=True, multiprocess=False, sync_interval=0.0):
+        """
+        Initialize the database with the path to the JSON file.
+        
+        Args:
+            db_path: Path of the snapshot, the log is stored at `<db_path>.wal`
+            fsync: Whether to fsync the log after every group of writes (survives power loss, slower)
+            compact_min_bytes: Log size under which the log is never compacted
+            indexes: Secondary indexes, {collection: {field: unique}}, defaults to DEFAULT_INDEXES
+            wait_for_flush: Whether writes wait until their change is written to the log before returning.
+                Without it, writes return right away and a crash loses the changes still queued
+            multiprocess: Whether other processes use the same files (needs fcntl, i.e. not on Windows)
+            sync_interval: Seconds between two checks for changes of other processes, 0 to check on every read
+        """
+        if multiprocess and fcntl is None:
+            raise RuntimeError("The multi-process mode needs fcntl file locks, which this platform doesn't have")
         self.db_path = db_path
-        self.lock = threading.RLock()  # Thread-safe operations
-        
-        # Initialize empty database structure if file doesn't exist
-        if not os.path.exists(db_path):
-            self.data = {
-                'users': [],
-                'teams': [],
-                'leagues': [],
-                'matches': [],
-                'highlights': [],
-                'events': [],
-                'reports': [],
-                'reels': []
-            }
-            self.save()
-        else:
-            self.load()
+        self.wal_path = db_path + '.wal'
+        self.fsync = fsync
+        self.compact_min_bytes = compact_min_bytes
+        self.index_fields = {name: dict(fields) for name, fields in (DEFAULT_INDEXES if indexes is None else indexes).items()}
+        self.wait_for_flush = wait_for_flush
+        self.multiprocess = multiprocess
+        self.sync_interval = sync_interval
+        self.wal = None
+        self.wal_bytes = 0
+        self.snapshot_bytes = 0
+        self.version = 0  # Version of the last applied change, shared by all the processes using the files
+        self.wal_offset = 0  # Bytes of the log applied to the in-memory data
+        self.wal_ino = None  # Inode of the log, replaced by every checkpoint
+        self.wal_reader = None  # Read-only descriptor of the log, for the changes of other processes
+        self.last_sync = 0.0
+        self.lock_fd = os.open(db_path + '.lock', os.O_RDWR | os.O_CREAT, 0o644) if multiprocess else None
+        self._init_threading()
+        
+        # Load the database, initialized empty if the file doesn't exist
+        self.load()
+    
+        self._start_flusher()
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+    
+    def _init_threading(self):
+        self.collections_lock = threading.Lock()  # Guards the creation of collections
+        self.flush_lock = threading.RLock()  # Held while writing to the log or checkpointing
+        self.sync_lock = threading.RLock()  # Held while using the lock file or reading changes of other processes
+        self.file_locked = False
+        self.checkpoint_requested = False
+        self.pending_cond = threading.Condition()  # Guards the queue of changes not written to the log yet
+        self.pending = []
+        self.logged_seq = 0
+        self.flushed_seq = 0
+        self.closed = False
+        self.flusher = None
+    
+    def _after_fork(self):
+        """A forked process has none of the parent's threads, start its own flusher."""
+        if self.closed:
+            return
+        pending = self.pending
+        self._init_threading()
+        self.pending = pending
+        for collection in self.collections.values():
+            collection.lock = ReadWriteLock()
+        if self.multiprocess:
+            # flock locks belong to the open file, which the parent still shares
+            os.close(self.lock_fd)
+            self.lock_fd = os.open(self.db_path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        self._start_flusher()
     
     def load(self):
-        """Load the database from the JSON file."""
-        with self.lock:
-            try:
-                with open(self.db_path, 'r') as f:
-                    self.data = json.load(f)
-            except json.JSONDecodeError:
-                # Handle corrupted file
-                print(f"Error: Database file {self.db_path} is corrupted. Creating new database.")
-                self.data = {
-                    'users': [],
-                    'teams': [],
-                    'leagues': [],
-                    'matches': [],
-                    'highlights': [],
-                    'events': [],
-                    'reports': [],
-                    'reels': []
-                }
-                self.save()
+        """Load the database from the snapshot and replay the write-ahead log over it."""
+        with self.flush_lock, self.sync_lock, self._file_lock(exclusive=False):
+            self._load_locked()
+    
+    def _load_locked(self):
+        self._close_wal()
+        try:
+            with open(self.db_path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {name: [] for name in DEFAULT_COLLECTIONS}
+            self._write_snapshot(data)
+        except json.JSONDecodeError:
+            # Keep the corrupted file for inspection instead of overwriting it
+            corrupted_path = f"{self.db_path}.corrupted-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+            os.replace(self.db_path, corrupted_path)
+            logger.error(f"Database file {self.db_path} is corrupted, moved to {corrupted_path}. Creating new database.")
+            data = {name: [] for name in DEFAULT_COLLECTIONS}
+            self._write_snapshot(data)
+        self._set_data(data)
+        
+        replayed = self._replay_wal()
+        if replayed:
+            logger.info(f"Replayed {replayed} write-ahead log records over {self.db_path}")
+        self._open_wal()
+    
+    def _set_data(self, data: Dict[str, List[Dict]]):
+        """Load collections given as lists of records, and build their indexes."""
+        self.collections = {}
+        self.version = 0
+        for collection_name, items in data.items():
+            collection = self._collection(collection_name, create=True)
+            for item in items:
+                try:
+                    self._put(collection, item)
+                except DuplicateKeyError as e:
+                    logger.error(f"Skipping record {item.get('id')} of {collection_name}: {str(e)}")
     
     def save(self):
-        """Save the database to the JSON file."""
-        with self.lock:
-            with open(self.db_path, 'w') as f:
-                json.dump(self.data, f, indent=2, default=self._json_serialize)
+        """Save the whole database to the JSON file (checkpoint)."""
+        self.checkpoint()
+    
+    def checkpoint(self):
+        """
+        Write a new snapshot of the database and start a new write-ahead log.
+        
+        Writers are only stopped while the records are collected; the
+        snapshot is then written to a temporary file, flushed to disk and
+        renamed over the previous one, which is atomic. The new log starts
+        with the version of the snapshot. Replaying the old log over the new
+        snapshot after a crash between the two renames gives the same data.
+        """
+        with self.flush_lock, self.sync_lock, self._file_lock(exclusive=True):
+            self._sync(force=True)
+            self._write_pending()
+            with self.collections_lock:
+                collections = sorted(self.collections.values(), key=lambda collection: collection.name)
+                for collection in collections:
+                    collection.lock.acquire_write()
+                try:
+                    # Changes queued before the locks were taken are in the snapshot and in the old log
+                    self._write_pending()
+                    snapshot = {collection.name: list(collection.items.values()) for collection in collections}
+                    version = self.version
+                finally:
+                    for collection in reversed(collections):
+                        collection.lock.release_write()
+            
+            self._write_snapshot(snapshot)
+            
+            # The snapshot contains every logged change, start a new log
+            tmp_path = f"{self.wal_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(json.dumps({'op': 'header', 'base_version': version}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._close_wal()
+            os.replace(tmp_path, self.wal_path)
+            self.wal_offset = 0
+            self._replay_wal()
+            self._open_wal()
+    
+    def _write_snapshot(self, snapshot: Dict[str, List[Dict]]):
+        tmp_path = f"{self.db_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=2, default=self._json_serialize)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.db_path)
+        self.snapshot_bytes = os.path.getsize(self.db_path)
+    
+    def refresh(self):
+        """Apply the changes logged by other processes now, whatever the sync_interval."""
+        self._sync(force=True)
+    
+    def flush(self):
+        """Wait until every change made so far is written to the log."""
+        with self.pending_cond:
+            seq = self.logged_seq
+        self._wait_flushed(seq)
+    
+    def close(self):
+        """Write the pending changes, stop the flusher and close the write-ahead log."""
+        with self.pending_cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.pending_cond.notify_all()
+        if self.flusher is not None and self.flusher is not threading.current_thread():
+            self.flusher.join()
+        with self.flush_lock, self.sync_lock:
+            self._write_pending()
+            self._close_wal()
+            if self.lock_fd is not None:
+                os.close(self.lock_fd)
+                self.lock_fd = None
+    
+    def _open_wal(self):
+        """Open the log for appending, and for reading the changes of other processes."""
+        self.wal = open(self.wal_path, 'a', encoding='utf-8')
+        self.wal_bytes = self.wal.tell()
+        if self.multiprocess:
+            self.wal_reader = os.open(self.wal_path, os.O_RDONLY)
+            self.wal_ino = os.fstat(self.wal_reader).st_ino
+    
+    def _close_wal(self):
+        if self.wal is not None:
+            self.wal.close()
+            self.wal = None
+        if self.wal_reader is not None:
+            os.close(self.wal_reader)
+            self.wal_reader = None
+    
+    def _replay_wal(self) -> int:
+        """Apply the logged changes to the loaded snapshot, returns the number of records applied."""
+        if not os.path.exists(self.wal_path):
+            return 0
+        applied = 0
+        valid_bytes = 0
+        with open(self.wal_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete record")
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash: drop it and everything after it
+                    logger.warning(f"Dropping incomplete record at offset {valid_bytes} of {self.wal_path}")
+                    break
+                self._apply(record)
+                applied += 1
+                valid_bytes += len(line)
+        if valid_bytes < os.path.getsize(self.wal_path):
+            with open(self.wal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        self.wal_offset = valid_bytes
+        return applied
+    
+    def _apply(self, record: Dict):
+        """Apply one logged change to the in-memory data, unless it is already applied."""
+        if record['op'] == 'header':
+            self.version = max(self.version, record['base_version'])
+            return
+        if record.get('v', self.version + 1) <= self.version:
+            return
+        collection = self._collection(record['c'], create=True)
+        with collection.lock.write():
+            if record['op'] == 'put':
+                self._put(collection, record['item'])
+            elif record['op'] == 'delete':
+                self._remove(collection, record['id'])
+        self.version = record.get('v', self.version + 1)  # Logs written before versions count one per change
+    
+    def _log(self, op: str, collection_name: str, item_id: str, item: Optional[Dict] = None) -> int:
+        """
+        Queue a change for the flusher, called with the collection's write lock held so
+        the log keeps the order of the changes.
+        
+        Args:
+            op: 'put' (create or replace the record) or 'delete'
+            collection_name: The collection of the record
+            item_id: The ID of the record
+            item: The new record, for 'put'
+        
+        Returns:
+            Sequence number of the change, for _wait_flushed()
+        """
+        record = {'op': op, 'c': collection_name, 'id': item_id}
+        if item is not None:
+            record['item'] = item
+        if self.multiprocess:
+            # The lock file is held (see _writing), append the change right away
+            record['v'] = self.version + 1
+            data = (json.dumps(record, default=self._json_serialize) + '\n').encode('utf-8')
+            self.wal.buffer.write(data)
+            self.wal.flush()
+            if self.fsync:
+                os.fsync(self.wal.fileno())
+            self.version += 1
+            self.wal_offset += len(data)
+            self.wal_bytes = self.wal_offset
+            if self.wal_bytes > max(self.compact_min_bytes, self.snapshot_bytes):
+                with self.pending_cond:
+                    self.checkpoint_requested = True
+                    self.pending_cond.notify_all()
+            return 0
+        with self.pending_cond:
+            self.version += 1
+            record['v'] = self.version
+            self.logged_seq += 1
+            self.pending.append(json.dumps(record, default=self._json_serialize) + '\n')
+            self.pending_cond.notify_all()
+            return self.logged_seq
+        
+    def _after_write(self, seq: int):
+        if self.wait_for_flush:
+            self._wait_flushed(seq)
+    
+    def _wait_flushed(self, seq: int):
+        """
+        Return once the change numbered seq is written to the log.
+        
+        The waiting writer writes the queue itself instead of waking the
+        flusher thread: the first one to get the flush lock writes the
+        changes of all the others, which then find theirs already written.
+        """
+        while True:
+            with self.pending_cond:
+                if self.flushed_seq >= seq or self.closed:
+                    return
+            self._write_pending()
+            if self.wal_bytes > max(self.compact_min_bytes, self.snapshot_bytes):
+                with self.pending_cond:
+                    self.checkpoint_requested = True  # Compacting is left to the flusher
+                    self.pending_cond.notify_all()
+    
+    def _start_flusher(self):
+        self.flusher = threading.Thread(target=self._flush_loop, name='JsonDB-flusher', daemon=True)
+        self.flusher.start()
+    
+    def _flush_loop(self):
+        """Write the queued changes to the log, all at once, and compact the log when it outgrew the snapshot."""
+        while True:
+            with self.pending_cond:
+                while not self.pending and not self.checkpoint_requested and not self.closed:
+                    self.pending_cond.wait()
+                if self.closed:
+                    return
+                self.checkpoint_requested = False
+            try:
+                self._write_pending()
+                if self.wal_bytes > max(self.compact_min_bytes, self.snapshot_bytes):
+                    self._compact()
+            except Exception as e:
+                logger.error(f"Error writing to {self.wal_path}: {str(e)}")
+                time.sleep(1)
+    
+    def _compact(self):
+        """Checkpoint, unless another process compacted the log in the meantime."""
+        with self.flush_lock, self.sync_lock, self._file_lock(exclusive=True):
+            self._sync(force=True)
+            if self.wal_bytes > max(self.compact_min_bytes, self.snapshot_bytes):
+                self.checkpoint()
+    
+    # Multi-process synchronization
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """
+        Hold the lock file, exclusive for writers and checkpoints, shared for
+        loading. Called with self.sync_lock held; nested calls keep the outer lock.
+        """
+        if not self.multiprocess or self.file_locked:
+            yield
+            return
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self.file_locked = True
+        try:
+            yield
+        finally:
+            self.file_locked = False
+            fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+    
+    @contextmanager
+    def _writing(self, collection_name: str, create: bool = False):
+        """
+        Hold the write lock of a collection, and in multi-process mode the
+        exclusive file lock with the changes of the other processes applied.
+        
+        Yields:
+            The collection, None if it doesn't exist and create is not set
+        """
+        if not self.multiprocess:
+            collection = self._collection(collection_name, create)
+            if collection is None:
+                yield None
+                return
+            with collection.lock.write():
+                yield collection
+            return
+        
+        with self.sync_lock, self._file_lock(exclusive=True):
+            self._sync(force=True)
+            size = os.fstat(self.wal_reader).st_size
+            if size > self.wal_offset:
+                # Only a writer holding the lock appends, this is a record torn by a crashed process
+                logger.warning(f"Dropping incomplete record at offset {self.wal_offset} of {self.wal_path}")
+                os.truncate(self.wal_path, self.wal_offset)
+            collection = self._collection(collection_name, create)
+            if collection is None:
+                yield None
+                return
+            with collection.lock.write():
+                yield collection
+    
+    def _sync(self, force: bool = False):
+        """Apply the changes logged by other processes since the last check (multi-process mode)."""
+        if not self.multiprocess or self.wal_reader is None:
+            return
+        if not force and time.monotonic() - self.last_sync < self.sync_interval:
+            return
+        try:
+            stat = os.stat(self.wal_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self.wal_ino or stat.st_size != self.wal_offset:
+            with self.sync_lock:
+                self._read_tail()
+                if stat.st_ino != self.wal_ino:
+                    self._switch_wal()
+        self.last_sync = time.monotonic()
+    
+    def _read_tail(self):
+        """Apply the complete records appended to the open log after the applied part."""
+        size = os.fstat(self.wal_reader).st_size
+        if size <= self.wal_offset:
+            return
+        data = os.pread(self.wal_reader, size - self.wal_offset, self.wal_offset)
+        end = data.rfind(b'\n') + 1  # A record still being written is read next time
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        self.wal_offset += end
+        self.wal_bytes = self.wal_offset
+    
+    def _switch_wal(self):
+        """Move to the new log written by a checkpoint of another process."""
+        with self._file_lock(exclusive=False):
+            self._close_wal()
+            self.wal_offset = 0
+            self._open_wal()
+            self.snapshot_bytes = os.path.getsize(self.db_path)
+            first_line = os.pread(self.wal_reader, 4096, 0).split(b'\n', 1)[0]
+            header = json.loads(first_line) if first_line else {}
+            if header.get('op') == 'header' and header['base_version'] <= self.version:
+                self._read_tail()
+            else:
+                # Changes between the applied ones and the snapshot were compacted away
+                logger.info(f"Reloading {self.db_path}, written by another process")
+                self._load_locked()
+    
+    def _write_pending(self):
+        """Append the queued changes to the log in one write (group commit)."""
+        with self.flush_lock:
+            with self.pending_cond:
+                lines, self.pending = self.pending, []
+                seq = self.logged_seq
+            if lines:
+                try:
+                    data = ''.join(lines)
+                    self.wal.write(data)
+                    self.wal.flush()
+                    if self.fsync:
+                        os.fsync(self.wal.fileno())
+                except Exception:
+                    with self.pending_cond:
+                        self.pending[:0] = lines
+                    raise
+                self.wal_bytes += len(data.encode('utf-8'))
+            with self.pending_cond:
+                self.flushed_seq = max(self.flushed_seq, seq)
+                self.pending_cond.notify_all()
+    
+    # Indexes
+    def create_index(self, collection_name: str, field: str, unique: bool = False):
+        """
+        Add a secondary index on a field of a collection and build it.
+        
+        Args:
+            collection_name: The collection to index
+            field: The indexed field
+            unique: Whether two records may not have the same value of the field
+        
+        Raises:
+            DuplicateKeyError: unique is set and two records have the same value
+        """
+        with self._writing(collection_name, create=True) as collection:
+            items = list(collection.items.values())
+            index = self._build_index(collection_name, field, unique, items)
+            collection.index_fields[field] = unique
+            collection.indexes[field] = index
+            for item in items:
+                if field in item and _hashable(item[field]):
+                    collection.index_keys[item['id']][field] = item[field]
+            self.index_fields.setdefault(collection_name, {})[field] = unique
+    
+    def _build_index(self, collection_name: str, field: str, unique: bool, items: List[Dict]) -> Dict:
+        index = {}
+        for item in items:
+            if field in item and _hashable(item[field]):
+                bucket = index.setdefault(item[field], {})
+                if unique and bucket:
+                    raise DuplicateKeyError(f"Duplicate {field} {item[field]!r} in {collection_name}")
+                bucket[item['id']] = item
+        return index
+    
+    def _collection(self, collection_name: str, create: bool = False) -> Optional[Collection]:
+        """A collection, created with its indexes if it doesn't exist and create is set."""
+        collection = self.collections.get(collection_name)
+        if collection is None and create:
+            with self.collections_lock:
+                if collection_name not in self.collections:
+                    self.collections[collection_name] = Collection(collection_name, self.index_fields.get(collection_name, {}))
+                collection = self.collections[collection_name]
+        return collection
+    
+    def _check_unique(self, collection: Collection, item: Dict):
+        """Raise DuplicateKeyError if a unique field of item is already used by another record."""
+        for field, unique in collection.index_fields.items():
+            if unique and field in item and _hashable(item[field]):
+                bucket = collection.indexes[field].get(item[field], {})
+                if any(other_id != item['id'] for other_id in bucket):
+                    raise DuplicateKeyError(f"Duplicate {field} {item[field]!r} in {collection.name}")
+    
+    def _put(self, collection: Collection, item: Dict):
+        """Insert or replace a record and update the indexes, with the collection's write lock held."""
+        self._check_unique(collection, item)
+        if item['id'] in collection.items:
+            self._unindex(collection, item['id'])
+        collection.items[item['id']] = item  # Replacing keeps the position of the record
+        keys = {}
+        for field, index in collection.indexes.items():
+            if field in item and _hashable(item[field]):
+                index.setdefault(item[field], {})[item['id']] = item
+                keys[field] = item[field]
+        collection.index_keys[item['id']] = keys
+        collection.snapshot = None
+    
+    def _remove(self, collection: Collection, item_id: str) -> Optional[Dict]:
+        """Remove a record and its index entries, returns the removed record."""
+        item = collection.items.pop(item_id, None)
+        if item is not None:
+            self._unindex(collection, item_id)
+            collection.snapshot = None
+        return item
+    
+    def _unindex(self, collection: Collection, item_id: str):
+        """Remove the index entries of a record, from the values it was indexed with."""
+        for field, value in collection.index_keys.pop(item_id, {}).items():
+            bucket = collection.indexes[field]
+            bucket[value].pop(item_id, None)
+            if not bucket[value]:
+                del bucket[value]
+    
+    def _snapshot(self, collection: Collection) -> tuple:
+        """The records of a collection, rebuilt after a write by the first reader."""
+        snapshot = collection.snapshot
+        if snapshot is None:
+            with collection.lock.read():
+                snapshot = collection.snapshot
+                if snapshot is None:
+                    snapshot = collection.snapshot = tuple(collection.items.values())
+        return snapshot
     
     def _json_serialize(self, obj):
         """Helper method to serialize datetime objects."""
@@ -62,13 +695,27 @@ class JsonDB:
             return obj.isoformat()
         raise TypeError(f"Type {type(obj)} not serializable")
     
-    def _filter_items(self, collection: List[Dict], filters: Dict) -> List[Dict]:
-        """Filter items based on filter criteria."""
+    def _filter_items(self, collection: Collection, filters: Dict) -> List[Dict]:
+        """
+        Filter items based on filter criteria.
+        
+        When a filter key is indexed, only the records of the index bucket are
+        checked against the other filters instead of the whole collection.
+        """
         if not filters:
-            return collection
+            return list(self._snapshot(collection))
+        
+        indexed = [key for key, value in filters.items() if key in collection.indexes and _hashable(value)]
+        if indexed:
+            # Start from the smallest bucket
+            with collection.lock.read():
+                buckets = [collection.indexes[key].get(filters[key], {}) for key in indexed]
+                candidates = list(min(buckets, key=len).values())
+        else:
+            candidates = self._snapshot(collection)
             
         result = []
-        for item in collection:
+        for item in candidates:
             match = True
             for key, value in filters.items():
                 if key not in item or item[key] != value:
@@ -91,71 +738,76 @@ class JsonDB:
     # Generic CRUD operations
     def get_all(self, collection_name: str, filters: Optional[Dict] = None) -> List[Dict]:
         """Get all items from a collection, optionally filtered."""
-        with self.lock:
-            collection = self.data.get(collection_name, [])
-            if filters:
-                return self._filter_items(collection, filters)
-            return collection
+        self._sync()
+        collection = self._collection(collection_name)
+        if collection is None:
+            return []
+        return [_copy_record(item) for item in self._filter_items(collection, filters)]
     
     def get_by_id(self, collection_name: str, item_id: str) -> Optional[Dict]:
         """Get an item by its ID."""
-        with self.lock:
-            collection = self.data.get(collection_name, [])
-            for item in collection:
-                if item.get('id') == item_id:
-                    return item
-            return None
+        self._sync()
+        collection = self._collection(collection_name)
+        item = collection.items.get(item_id) if collection is not None else None
+        return _copy_record(item) if item is not None else None
     
     def create(self, collection_name: str, item_data: Dict) -> Dict:
-        """Create a new item in a collection."""
-        with self.lock:
-            # Ensure the collection exists
-            if collection_name not in self.data:
-                self.data[collection_name] = []
-            
-            # Add ID and timestamps if not provided
-            if 'id' not in item_data:
-                item_data['id'] = self._generate_id()
-            
-            if 'created_at' not in item_data:
-                item_data['created_at'] = self._get_timestamp()
-            
-            if 'updated_at' not in item_data:
-                item_data['updated_at'] = self._get_timestamp()
-            
-            # Add the item to the collection
-            self.data[collection_name].append(item_data)
-            self.save()
+        """
+        Create a new item in a collection.
+        
+        Raises:
+            DuplicateKeyError: An item with the same id, or the same value of a unique field, exists
+        """
+        # Add ID and timestamps if not provided
+        if 'id' not in item_data:
+            item_data['id'] = self._generate_id()
+        
+        if 'created_at' not in item_data:
+            item_data['created_at'] = self._get_timestamp()
+        
+        if 'updated_at' not in item_data:
+            item_data['updated_at'] = self._get_timestamp()
+        
+        # The stored record must not change when the caller later changes its dict
+        item_data = _copy_record(item_data)
+        
+        # Add the item to the collection, created if it doesn't exist
+        with self._writing(collection_name, create=True) as collection:
+            if item_data['id'] in collection.items:
+                raise DuplicateKeyError(f"Duplicate id {item_data['id']!r} in {collection_name}")
+            self._put(collection, item_data)
+            seq = self._log('put', collection_name, item_data['id'], item_data)
+        self._after_write(seq)
             
-            return item_data
+        return _copy_record(item_data)
     
     def update(self, collection_name: str, item_id: str, item_data: Dict) -> Optional[Dict]:
-        """Update an existing item."""
-        with self.lock:
-            collection = self.data.get(collection_name, [])
-            
-            for i, item in enumerate(collection):
-                if item.get('id') == item_id:
-                    # Update existing item
-                    updated_item = {**item, **item_data, 'updated_at': self._get_timestamp()}
-                    collection[i] = updated_item
-                    self.save()
-                    return updated_item
+        """
+        Update an existing item.
+        
+        Raises:
+            DuplicateKeyError: The new value of a unique field is used by another item
+        """
+        with self._writing(collection_name) as collection:
+            item = collection.items.get(item_id) if collection is not None else None
+            if item is None:
+                return None
             
-            return None
+            # Update existing item
+            updated_item = {**item, **_copy_record(item_data), 'id': item_id, 'updated_at': self._get_timestamp()}
+            self._put(collection, updated_item)
+            seq = self._log('put', collection_name, item_id, updated_item)
+        self._after_write(seq)
+        return _copy_record(updated_item)
     
     def delete(self, collection_name: str, item_id: str) -> bool:
         """Delete an item by its ID."""
-        with self.lock:
-            collection = self.data.get(collection_name, [])
-            
-            for i, item in enumerate(collection):
-                if item.get('id') == item_id:
-                    del collection[i]
-                    self.save()
-                    return True
-            
-            return False
+        with self._writing(collection_name) as collection:
+            if collection is None or self._remove(collection, item_id) is None:
+                return False
+            seq = self._log('delete', collection_name, item_id)
+        self._after_write(seq)
+        return True
     
     def query(self, collection_name: str, query_fn) -> List[Dict]:
         """
@@ -166,44 +818,82 @@ class JsonDB:
             query_fn: A function that takes an item and returns a boolean
                      indicating whether to include it in the results
         """
-        with self.lock:
-            collection = self.data.get(collection_name, [])
-            return [item for item in collection if query_fn(item)]
+        self._sync()
+        collection = self._collection(collection_name)
+        if collection is None:
+            return []
+        return [_copy_record(item) for item in self._snapshot(collection) if query_fn(item)]
     
     # Relationship helpers
     def add_to_relationship(self, collection_name: str, item_id: str, 
                            related_items_key: str, related_item_id: str) -> bool:
         """Add an item to a relationship list."""
-        with self.lock:
-            item = self.get_by_id(collection_name, item_id)
+        with self._writing(collection_name) as collection:
+            item = collection.items.get(item_id) if collection is not None else None
             if not item:
                 return False
                 
-            # Initialize relationship list if it doesn't exist
-            if related_items_key not in item:
-                item[related_items_key] = []
-                
             # Check if the relationship already exists
-            if related_item_id not in item[related_items_key]:
-                item[related_items_key].append(related_item_id)
-                self.save()
+            related_items = item.get(related_items_key, [])
+            if related_item_id in related_items:
+                return True
                 
-            return True
+            updated_item = {**item, related_items_key: related_items + [related_item_id]}
+            self._put(collection, updated_item)
+            seq = self._log('put', collection_name, item_id, updated_item)
+        self._after_write(seq)
+        return True
     
     def remove_from_relationship(self, collection_name: str, item_id: str, 
                                related_items_key: str, related_item_id: str) -> bool:
         """Remove an item from a relationship list."""
-        with self.lock:
-            item = self.get_by_id(collection_name, item_id)
-            if not item or related_items_key not in item:
+        with self._writing(collection_name) as collection:
+            item = collection.items.get(item_id) if collection is not None else None
+            if not item or related_item_id not in item.get(related_items_key, []):
                 return False
                 
-            if related_item_id in item[related_items_key]:
-                item[related_items_key].remove(related_item_id)
-                self.save()
-                return True
-                
-            return False
+            related_items = [related for related in item[related_items_key] if related != related_item_id]
+            updated_item = {**item, related_items_key: related_items}
+            self._put(collection, updated_item)
+            seq = self._log('put', collection_name, item_id, updated_item)
+        self._after_write(seq)
+        return True
+
+def _copy_record(value: Any) -> Any:
+    """Copy the dicts and lists of a record, the other JSON values are immutable"""
+    if isinstance(value, dict):
+        return {key: _copy_record(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_record(item) for item in value]
+    return value
+
+def _hashable(value: Any) -> bool:
+    """Whether a value can be an index key, lists and dicts are not indexed"""
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+def _multiprocess_from_env() -> bool:
+    """
+    Whether the singleton shares its files with other processes.
+    
+    The job queue workers write match results from their own processes, so
+    the multi-process mode is on unless JSON_DB_MULTIPROCESS turns it off.
+    A single-process instance would not see their changes and its
+    checkpoints would drop them from the log.
+    """
+    value = os.environ.get('JSON_DB_MULTIPROCESS', '').lower()
+    if value in ('0', 'false', 'no'):
+        return False
+    if fcntl is None and not value:
+        logger.warning("File locks are not available, the JSON database runs in single-process mode: "
+                       "do not run job workers next to the web server")
+        return False
+    return True
 
 # Create a singleton instance
-db = JsonDB(os.path.join(os.path.dirname(__file__), 'assets', 'database.json')) 
\ No newline at end of file
+db = JsonDB(os.path.join(os.path.dirname(__file__), 'assets', 'database.json'),
+            fsync=os.environ.get('JSON_DB_FSYNC', '').lower() in ('1', 'true', 'yes'),
+            multiprocess=_multiprocess_from_env())
@@ -87,6 +87,7 @@ def create_match(home_team_id, away_team_id, kickoff_time, league_id=None,
         'stats': {},
         'is_processed': False,
         'processing_status': "pending",
+        'processing_job_id': None,
         'created_at': get_timestamp(),
         'updated_at': get_timestamp()
     }
@@ -41,6 +41,7 @@ class Match(db.Model):
     # Processing status
     is_processed = db.Column(db.Boolean, default=False)  # Whether AI analysis is complete
     processing_status = db.Column(db.String(50), default="pending")
+    processing_job_id = db.Column(db.String(36))  # Background job processing the video
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -71,6 +72,7 @@ class Match(db.Model):
             'stats': self.stats,
             'is_processed': self.is_processed,
             'processing_status': self.processing_status,
+            'processing_job_id': self.processing_job_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
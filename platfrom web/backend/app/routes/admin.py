@@ -8,31 +8,29 @@ import uuid
 from datetime import datetime
 import shutil
 
-from .. import db
-from ..models import (
-    User, Match, MatchSchema, MatchStatus, Team, TeamSchema, 
-    League, LeagueSchema, Highlight, HighlightSchema
-)
-from ..services.video_processor import process_match_video
+from ..db_json import db
+from ..models.json_models import create_match as new_match, create_team as new_team, create_league as new_league
+from ..services.video_processor import enqueue_match_processing
+from ..services.job_queue import get_job_queue
 
 admin_bp = Blueprint('admin', __name__)
 
-user_schema = UserSchema()
-match_schema = MatchSchema()
-team_schema = TeamSchema()
-teams_schema = TeamSchema(many=True)
-league_schema = LeagueSchema()
-leagues_schema = LeagueSchema(many=True)
-highlight_schema = HighlightSchema()
+MATCH_STATUSES = ('scheduled', 'live', 'finished', 'postponed', 'cancelled')
+
+def user_to_dict(user):
+    """Return a user without its password hash."""
+    return {k: v for k, v in user.items() if k != 'password_hash'}
 
 def admin_required(fn):
     """Decorator to check if the current user is an admin."""
     @jwt_required()
     def wrapper(*args, **kwargs):
         current_user_id = get_jwt_identity()
-        user = User.query.get_or_404(current_user_id)
+        user = db.get_by_id('users', current_user_id)
+        if not user:
+            raise NotFound("User not found")
         
-        if not user.is_admin:
+        if not user.get('is_admin'):
             raise Forbidden("Admin access required")
         
         return fn(*args, **kwargs)
@@ -48,18 +46,21 @@ def get_users():
     page = request.args.get('page', 1, type=int)
     per_page = min(request.args.get('per_page', 20, type=int), 50)  # Max 50 per page
     
-    # Query with pagination
-    paginated_users = User.query.paginate(page=page, per_page=per_page, error_out=False)
+    # Paginate the users
+    users = db.get_all('users')
+    total = len(users)
+    pages = (total + per_page - 1) // per_page
+    start = (max(page, 1) - 1) * per_page
     
     result = {
-        "users": [user.to_dict() for user in paginated_users.items],
+        "users": [user_to_dict(user) for user in users[start:start + per_page]],
         "pagination": {
-            "total": paginated_users.total,
-            "pages": paginated_users.pages,
+            "total": total,
+            "pages": pages,
             "page": page,
             "per_page": per_page,
-            "has_next": paginated_users.has_next,
-            "has_prev": paginated_users.has_prev
+            "has_next": page < pages,
+            "has_prev": page > 1
         }
     }
     
@@ -69,7 +70,8 @@ def get_users():
 @admin_required
 def update_user(user_id):
     """Update a user (admin only)."""
-    user = User.query.get_or_404(user_id)
+    if not db.get_by_id('users', user_id):
+        raise NotFound("User not found")
     
     try:
         data = request.get_json()
@@ -77,29 +79,33 @@ def update_user(user_id):
             raise BadRequest("No input data provided")
         
         # Update allowed fields
+        changes = {}
         if 'first_name' in data:
-            user.first_name = data['first_name']
+            changes['first_name'] = data['first_name']
         
         if 'last_name' in data:
-            user.last_name = data['last_name']
+            changes['last_name'] = data['last_name']
         
         if 'is_active' in data:
-            user.is_active = bool(data['is_active'])
+            changes['is_active'] = bool(data['is_active'])
         
         if 'is_admin' in data:
-            user.is_admin = bool(data['is_admin'])
+            changes['is_admin'] = bool(data['is_admin'])
         
-        db.session.commit()
+        user = db.update('users', user_id, changes)
+        if not user:
+            raise NotFound("User not found")
         
         return jsonify({
             "message": "User updated successfully",
-            "user": user.to_dict()
+            "user": user_to_dict(user)
         }), 200
         
     except BadRequest as e:
         return jsonify({"error": str(e)}), 400
+    except NotFound:
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 @admin_bp.route('/matches', methods=['POST'])
@@ -124,22 +130,21 @@ def create_match():
             raise ValidationError({"kickoff_time": ["Invalid datetime format"]})
         
         # Create the match
-        match = Match(
+        match = new_match(
             home_team_id=data['home_team_id'],
             away_team_id=data['away_team_id'],
-            kickoff_time=kickoff_time,
+            kickoff_time=kickoff_time.isoformat(),
             league_id=data.get('league_id'),
-            stadium=data.get('stadium'),
-            referee=data.get('referee'),
-            status=MatchStatus.SCHEDULED
+            stadium=data.get('stadium', ""),
+            referee=data.get('referee', ""),
+            status="scheduled"
         )
         
-        db.session.add(match)
-        db.session.commit()
+        match = db.create('matches', match)
         
         return jsonify({
             "message": "Match created successfully",
-            "match": match_schema.dump(match)
+            "match": match
         }), 201
         
     except ValidationError as e:
@@ -147,14 +152,14 @@ def create_match():
     except BadRequest as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 @admin_bp.route('/matches/<match_id>', methods=['PUT'])
 @admin_required
 def update_match(match_id):
     """Update a match (admin only)."""
-    match = Match.query.get_or_404(match_id)
+    if not db.get_by_id('matches', match_id):
+        raise NotFound("Match not found")
     
     try:
         data = request.get_json()
@@ -162,65 +167,69 @@ def update_match(match_id):
             raise BadRequest("No input data provided")
         
         # Update match fields
+        changes = {}
         if 'home_team_id' in data:
-            match.home_team_id = data['home_team_id']
+            changes['home_team_id'] = data['home_team_id']
         
         if 'away_team_id' in data:
-            match.away_team_id = data['away_team_id']
+            changes['away_team_id'] = data['away_team_id']
         
         if 'league_id' in data:
-            match.league_id = data['league_id']
+            changes['league_id'] = data['league_id']
         
         if 'kickoff_time' in data:
             try:
-                match.kickoff_time = datetime.fromisoformat(data['kickoff_time'])
+                changes['kickoff_time'] = datetime.fromisoformat(data['kickoff_time']).isoformat()
             except ValueError:
                 raise ValidationError({"kickoff_time": ["Invalid datetime format"]})
         
         if 'status' in data:
-            try:
-                match.status = MatchStatus(data['status'])
-            except ValueError:
+            if data['status'] not in MATCH_STATUSES:
                 raise ValidationError({"status": ["Invalid status"]})
+            changes['status'] = data['status']
         
         if 'home_score' in data:
-            match.home_score = int(data['home_score'])
+            changes['home_score'] = int(data['home_score'])
         
         if 'away_score' in data:
-            match.away_score = int(data['away_score'])
+            changes['away_score'] = int(data['away_score'])
         
         if 'stadium' in data:
-            match.stadium = data['stadium']
+            changes['stadium'] = data['stadium']
         
         if 'referee' in data:
-            match.referee = data['referee']
+            changes['referee'] = data['referee']
         
         if 'attendance' in data:
-            match.attendance = int(data['attendance'])
+            changes['attendance'] = int(data['attendance'])
         
         if 'stats' in data and isinstance(data['stats'], dict):
-            match.stats = data['stats']
+            changes['stats'] = data['stats']
         
-        db.session.commit()
+        match = db.update('matches', match_id, changes)
+        if not match:
+            raise NotFound("Match not found")
         
         return jsonify({
             "message": "Match updated successfully",
-            "match": match_schema.dump(match)
+            "match": match
         }), 200
         
     except ValidationError as e:
         return jsonify({"error": "Validation error", "details": e.messages}), 422
     except BadRequest as e:
         return jsonify({"error": str(e)}), 400
+    except NotFound:
+        raise
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 @admin_bp.route('/matches/<match_id>/video', methods=['POST'])
 @admin_required
 def upload_match_video(match_id):
     """Upload a video file for a match (admin only)."""
-    match = Match.query.get_or_404(match_id)
+    if not db.get_by_id('matches', match_id):
+        raise NotFound("Match not found")
     
     # Check if request has the file part
     if 'video' not in request.files:
@@ -250,27 +259,61 @@ def upload_match_video(match_id):
     file.save(file_path)
     
     # Update match
-    match.video_path = f"/uploads/match_videos/{unique_filename}"
-    match.is_processed = False
-    match.processing_status = "pending"
-    db.session.commit()
+    match = db.update('matches', match_id, {
+        'video_path': f"/uploads/match_videos/{unique_filename}",
+        'is_processed': False,
+        'processing_status': "pending"
+    })
     
-    # Start async processing task (in a real app, this would be a background job)
+    # Queue processing for the background workers, the request returns right away
+    job = None
     try:
-        # This is a placeholder for a real background task
-        process_match_video.delay(match.id, file_path)
+        job = enqueue_match_processing(get_job_queue(), match_id, file_path, current_app.config['JOB_MAX_ATTEMPTS'])
+        match = db.update('matches', match_id, {'processing_job_id': job['id']})
     except Exception as e:
         # If task scheduling fails, still return success for video upload
         # but log the error and update processing status
-        match.processing_status = "error"
-        db.session.commit()
+        match = db.update('matches', match_id, {'processing_status': "error"})
         print(f"Error scheduling processing task: {str(e)}")
     
     return jsonify({
-        "message": "Video uploaded successfully and processing started",
-        "video_path": match.video_path,
-        "processing_status": match.processing_status
-    }), 200
+        "message": "Video uploaded successfully and processing queued",
+        "video_path": match['video_path'],
+        "processing_status": match['processing_status'],
+        "job_id": job['id'] if job else None
+    }), 202
+
+@admin_bp.route('/jobs', methods=['GET'])
+@admin_required
+def get_jobs():
+    """List recent processing jobs, optionally filtered by status (admin only)."""
+    status = request.args.get('status')
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    return jsonify({"jobs": get_job_queue().list(status, limit)}), 200
+
+@admin_bp.route('/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    """Get the state and progress of a processing job (admin only)."""
+    job = get_job_queue().get(job_id)
+    if not job:
+        raise NotFound("Job not found")
+    return jsonify({"job": job}), 200
+
+@admin_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@admin_required
+def cancel_job(job_id):
+    """Cancel a queued or running processing job (admin only)."""
+    job = get_job_queue().cancel(job_id)
+    if not job:
+        raise NotFound("Job not found")
+    
+    # A queued job never runs, so its match is updated here; a running job updates it when it stops
+    match_id = job['kwargs'].get('match_id')
+    match = db.get_by_id('matches', match_id) if match_id else None
+    if job['status'] == 'cancelled' and match and match.get('processing_job_id') == job_id:
+        db.update('matches', match_id, {'processing_status': "cancelled"})
+    return jsonify({"message": "Cancellation requested", "job": job}), 202
 
 @admin_bp.route('/teams', methods=['POST'])
 @admin_required
@@ -286,23 +329,22 @@ def create_team():
             raise ValidationError({"name": ["Team name is required"]})
         
         # Create the team
-        team = Team(
+        team = new_team(
             name=data['name'],
-            short_name=data.get('short_name'),
-            country=data.get('country'),
+            short_name=data.get('short_name', ""),
+            country=data.get('country', ""),
             league_id=data.get('league_id'),
             founded_year=data.get('founded_year'),
-            stadium=data.get('stadium'),
-            colors=data.get('colors'),
-            website=data.get('website')
+            stadium=data.get('stadium', ""),
+            colors=data.get('colors', ""),
+            website=data.get('website', "")
         )
         
-        db.session.add(team)
-        db.session.commit()
+        team = db.create('teams', team)
         
         return jsonify({
             "message": "Team created successfully",
-            "team": team_schema.dump(team)
+            "team": team
         }), 201
         
     except ValidationError as e:
@@ -310,7 +352,6 @@ def create_team():
     except BadRequest as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 @admin_bp.route('/leagues', methods=['POST'])
@@ -343,20 +384,19 @@ def create_league():
                 raise ValidationError({"season_end": ["Invalid date format"]})
         
         # Create the league
-        league = League(
+        league = new_league(
             name=data['name'],
-            short_name=data.get('short_name'),
-            country=data.get('country'),
-            season_start=season_start,
-            season_end=season_end
+            short_name=data.get('short_name', ""),
+            country=data.get('country', ""),
+            season_start=season_start.isoformat() if season_start else None,
+            season_end=season_end.isoformat() if season_end else None
         )
         
-        db.session.add(league)
-        db.session.commit()
+        league = db.create('leagues', league)
         
         return jsonify({
             "message": "League created successfully",
-            "league": league_schema.dump(league)
+            "league": league
         }), 201
         
     except ValidationError as e:
@@ -364,7 +404,6 @@ def create_league():
     except BadRequest as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 @admin_bp.route('/dashboard', methods=['GET'])
@@ -372,20 +411,21 @@ def create_league():
 def get_dashboard():
     """Get admin dashboard stats."""
     # Get counts
-    user_count = User.query.count()
-    match_count = Match.query.count()
-    team_count = Team.query.count()
-    league_count = League.query.count()
-    highlight_count = Highlight.query.count()
+    matches = db.get_all('matches')
+    user_count = len(db.get_all('users'))
+    match_count = len(matches)
+    team_count = len(db.get_all('teams'))
+    league_count = len(db.get_all('leagues'))
+    highlight_count = len(db.get_all('highlights'))
     
     # Get processing stats
-    pending_matches = Match.query.filter_by(processing_status="pending").count()
-    processing_matches = Match.query.filter_by(processing_status="processing").count()
-    error_matches = Match.query.filter_by(processing_status="error").count()
-    completed_matches = Match.query.filter_by(is_processed=True).count()
+    pending_matches = sum(1 for match in matches if match.get('processing_status') == "pending")
+    processing_matches = sum(1 for match in matches if match.get('processing_status') == "processing")
+    error_matches = sum(1 for match in matches if match.get('processing_status') == "error")
+    completed_matches = sum(1 for match in matches if match.get('is_processed'))
     
     # Get recent uploads
-    recent_matches = Match.query.order_by(Match.created_at.desc()).limit(5).all()
+    recent_matches = sorted(matches, key=lambda match: match.get('created_at', ''), reverse=True)[:5]
     
     return jsonify({
         "counts": {
@@ -401,5 +441,5 @@ def get_dashboard():
             "error": error_matches,
             "completed": completed_matches
         },
-        "recent_matches": match_schema.dump(recent_matches, many=True)
+        "recent_matches": recent_matches
     }), 200 
\ No newline at end of file
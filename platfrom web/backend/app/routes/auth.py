@@ -10,7 +10,7 @@ from werkzeug.exceptions import BadRequest, Unauthorized
 import bcrypt
 from datetime import datetime
 
-from ..db_json import db
+from ..db_json import db, DuplicateKeyError
 from ..models.json_models import create_user, validate_user_data
 
 auth_bp = Blueprint('auth', __name__)
@@ -29,7 +29,7 @@ def register():
             return jsonify({"error": "Validation error", "details": errors}), 422
         
         # Check if user already exists
-        existing_users = db.query('users', lambda user: user.get('email') == user_data.get('email').lower())
+        existing_users = db.get_all('users', {'email': user_data.get('email').lower()})
         if existing_users:
             return jsonify({"error": "Email already registered"}), 409
         
@@ -47,8 +47,11 @@ def register():
             profile_image=user_data.get('profile_image', '')
         )
         
-        # Save user to database
-        db.create('users', user)
+        # Save user to database, the unique email index rejects concurrent registrations
+        try:
+            db.create('users', user)
+        except DuplicateKeyError:
+            return jsonify({"error": "Email already registered"}), 409
         
         # Create tokens
         access_token = create_access_token(identity=user['id'])
@@ -78,7 +81,7 @@ def login():
             raise BadRequest("Email and password are required")
         
         # Find user by email
-        users = db.query('users', lambda user: user.get('email') == login_data.get('email').lower())
+        users = db.get_all('users', {'email': login_data.get('email').lower()})
         
         if not users:
             raise Unauthorized("Invalid credentials")
@@ -98,8 +101,7 @@ def login():
             return jsonify({"error": "Account is disabled"}), 403
         
         # Update last login time
-        user['last_login'] = datetime.utcnow().isoformat()
-        db.update('users', user['id'], user)
+        user = db.update('users', user['id'], {'last_login': datetime.utcnow().isoformat()})
         
         # Create tokens
         access_token = create_access_token(identity=user['id'])
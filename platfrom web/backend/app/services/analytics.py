@@ -0,0 +1,296 @@
+import os
+import json
+import logging
+
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Object types in tracking data exported by the detection app (Playground_Detection_Process/Streamlit_web_app/tracking_export.py)
+PLAYER, REFEREE, BALL = 0, 1, 2
+
+PITCH_LENGTH = 105.0                # Meters
+PITCH_WIDTH = 68.0                  # Meters
+HEATMAP_BINS = (10, 7)              # Cells along the pitch length and width
+PLAYERS_PER_TEAM = 11
+POSSESSION_RADIUS = 2.0             # Max distance (m) between the ball and the player controlling it
+MIN_POSSESSION_FRAMES = 3           # Consecutive frames a player must control the ball to count as a touch
+MAX_PASS_SECONDS = 4.0              # Max time between two touches to count as a pass
+MAX_SPEED = 12.0                    # Faster moves (m/s) between two frames are tracking jumps, not running
+
+def load_tracking_data(path):
+    """
+    Load tracking data exported by the detection app.
+
+    Args:
+        path (str): .parquet file, or .bin file with its .json metadata next to it
+
+    Returns:
+        tuple: (dict of column name to numpy array, metadata dict)
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=['frame', 'object', 'track_id', 'team', 'pitch_x', 'pitch_y'])
+        raw = (pq.read_metadata(path).metadata or {}).get(b'tracking')
+        return {name: table.column(name).to_numpy() for name in table.column_names}, json.loads(raw) if raw else {}
+
+    with open(os.path.splitext(path)[0] + '.json', 'r') as f:
+        metadata = json.load(f)
+    dtype = np.dtype([tuple(field) for field in metadata['dtype']])
+    rows = np.memmap(path, dtype=dtype, mode='r') if os.path.getsize(path) else np.zeros(0, dtype=dtype)
+    return {name: rows[name] for name in dtype.names}, metadata
+
+def find_tracking_file(video_path):
+    """
+    Find the tracking data exported for a video (<video name>_tracking.parquet or .bin).
+
+    Args:
+        video_path (str): Path to the match video
+
+    Returns:
+        str: Path to the tracking file, or None if there is none
+    """
+    base = os.path.splitext(video_path)[0] + '_tracking'
+    for ext in ('.parquet', '.bin'):
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+def compute_tactical_analytics(columns, metadata, fps=None):
+    """
+    Compute heatmaps, possession, passes and player ratings from tracking data.
+
+    Everything is computed with whole-array numpy operations, so a full
+    match (~135k frames, a few million rows) takes seconds.
+
+    Team 0 of the tracking data is the home team, team 1 the away team.
+    Tracks are mapped to player slots `player_0` to `player_10` per team,
+    in decreasing order of time on screen; shorter tracks (tracking breaks,
+    substitutes) still count in the team totals.
+
+    Args:
+        columns (dict): Tracking columns frame, object, track_id, team, pitch_x, pitch_y
+        metadata (dict): Tracking metadata, uses pitch_map_size and video_fps
+        fps (float): Video frame rate, overrides the one in the metadata
+
+    Returns:
+        dict: heatmap_data, pass_map_data, player_ratings and key_stats for a TacticalReport
+    """
+    fps = fps or metadata.get('video_fps') or 25.0
+    frame = np.asarray(columns['frame'], dtype=np.int64)
+    obj = np.asarray(columns['object'])
+    x, y = _to_meters(np.asarray(columns['pitch_x'], dtype=np.float64), np.asarray(columns['pitch_y'], dtype=np.float64),
+                      metadata.get('pitch_map_size'))
+    valid = np.isfinite(x) & np.isfinite(y)
+
+    players = (obj == PLAYER) & valid & (np.asarray(columns['team']) >= 0)
+    p_frame, p_track, p_team = frame[players], np.asarray(columns['track_id'])[players].astype(np.int64), np.asarray(columns['team'])[players].astype(np.int64)
+    p_x, p_y = x[players], y[players]
+    balls = (obj == BALL) & valid
+    b_frame, b_x, b_y = frame[balls], x[balls], y[balls]
+
+    slots = _player_slots(p_track, p_team)
+    slot = slots[np.searchsorted(slots[:, 0], p_track), 2] if len(slots) else np.zeros(0, dtype=np.int64)
+
+    heatmap_data = _heatmaps(p_team, slot, p_x, p_y)
+    distances = _distances(p_frame, p_track, p_x, p_y, fps)
+
+    owner_track, owner_team, owner_frame = _ball_owners(p_frame, p_track, p_team, p_x, p_y, b_frame, b_x, b_y)
+    touches = _touches(owner_frame, owner_track, owner_team)
+    passes = _passes(touches, fps)
+    pass_map_data = _pass_maps(passes, slots)
+
+    possession_frames = np.bincount(owner_team, minlength=2)[:2].astype(float)
+    total = possession_frames.sum()
+    possession = possession_frames / total * 100 if total else np.array([50.0, 50.0])
+
+    player_ratings = _ratings(slots, passes, distances)
+    teams = ('home_team', 'away_team')
+    key_stats = {
+        'possession': {'home': round(float(possession[0]), 1), 'away': round(float(possession[1]), 1)},
+        'passes': {'home': pass_map_data['home_team']['successful'], 'away': pass_map_data['away_team']['successful']},
+        'distance_covered_km': {
+            side: {f"player_{s}": round(distances.get(int(t), 0.0) / 1000, 2) for t, team, s in slots if team == k}
+            for k, side in enumerate(teams)
+        }
+    }
+    return {
+        'heatmap_data': heatmap_data,
+        'pass_map_data': pass_map_data,
+        'player_ratings': player_ratings,
+        'key_stats': key_stats
+    }
+
+def _to_meters(x, y, pitch_map_size):
+    """Scale tactical map pixels to meters on a 105x68m pitch"""
+    if not pitch_map_size:
+        return x, y
+    width, height = pitch_map_size
+    return x * (PITCH_LENGTH / width), y * (PITCH_WIDTH / height)
+
+def _player_slots(track, team):
+    """
+    Map the longest tracks of each team to player slots 0-10.
+
+    Returns:
+        numpy.ndarray: Rows (track_id, team, slot) sorted by track_id, slot -1 for unmapped tracks
+    """
+    if len(track) == 0:
+        return np.zeros((0, 3), dtype=np.int64)
+    tracks, first, counts = np.unique(track, return_index=True, return_counts=True)
+    teams = team[first]
+    slots = np.full(len(tracks), -1, dtype=np.int64)
+    for k in (0, 1):
+        idx = np.flatnonzero(teams == k)
+        top = idx[np.argsort(-counts[idx], kind='stable')[:PLAYERS_PER_TEAM]]
+        slots[top] = np.arange(len(top))
+    return np.stack([tracks, teams, slots], axis=1)
+
+def _heatmaps(team, slot, x, y):
+    """Team and per-player occupancy grids, normalized to sum to 1"""
+    nx, ny = HEATMAP_BINS
+    ix = np.clip((x / PITCH_LENGTH * nx).astype(np.int64), 0, nx - 1)
+    iy = np.clip((y / PITCH_WIDTH * ny).astype(np.int64), 0, ny - 1)
+    cell = iy * nx + ix
+    heatmap_data = {}
+    for k, side in enumerate(('home_team', 'away_team')):
+        in_team = team == k
+        overall = np.bincount(cell[in_team], minlength=nx * ny).astype(float)
+        # One bincount for all players of the team: key = slot * cells + cell
+        mapped = in_team & (slot >= 0)
+        per_player = np.bincount(slot[mapped] * (nx * ny) + cell[mapped], minlength=PLAYERS_PER_TEAM * nx * ny).astype(float)
+        per_player = per_player.reshape(PLAYERS_PER_TEAM, ny, nx)
+        heatmap_data[side] = {
+            'overall': _normalize(overall.reshape(ny, nx)),
+            'players': {f"player_{s}": _normalize(per_player[s]) for s in range(PLAYERS_PER_TEAM) if per_player[s].any()}
+        }
+    return heatmap_data
+
+def _normalize(grid):
+    total = grid.sum()
+    return np.round(grid / total, 4).tolist() if total else grid.tolist()
+
+def _distances(frame, track, x, y, fps):
+    """Distance covered (m) per track, from consecutive-frame moves under MAX_SPEED"""
+    if len(track) == 0:
+        return {}
+    order = np.argsort(track * (frame.max() + 1) + frame)                           # One int64 sort key instead of a lexsort
+    track, frame, x, y = track[order], frame[order], x[order], y[order]
+    step = np.hypot(np.diff(x), np.diff(y))
+    dt = np.diff(frame) / fps
+    ok = (track[1:] == track[:-1]) & (dt > 0) & (step <= MAX_SPEED * np.maximum(dt, 1 / fps))
+    tracks, inverse = np.unique(track[1:][ok], return_inverse=True)
+    total = np.bincount(inverse, weights=step[ok], minlength=len(tracks))
+    return dict(zip(tracks.tolist(), total.tolist()))
+
+def _ball_owners(p_frame, p_track, p_team, p_x, p_y, b_frame, b_x, b_y):
+    """
+    Closest player to the ball on every frame where it is within POSSESSION_RADIUS.
+
+    Returns:
+        tuple: Arrays (track, team, frame) of the owners, sorted by frame
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if len(b_frame) == 0 or len(p_frame) == 0:
+        return empty, empty, empty
+    # First ball detection of each frame, looked up for every player row; rows of frames without a ball are dropped
+    b_frames, b_first = np.unique(b_frame, return_index=True)
+    pos = np.minimum(np.searchsorted(b_frames, p_frame), len(b_frames) - 1)
+    rows = np.flatnonzero(b_frames[pos] == p_frame)
+    if len(rows) == 0:
+        return empty, empty, empty
+    if np.any(np.diff(p_frame[rows]) < 0):                                          # Exported data is in frame order, sort otherwise
+        rows = rows[np.argsort(p_frame[rows], kind='stable')]
+    ball_idx = b_first[pos[rows]]
+    dist = np.hypot(p_x[rows] - b_x[ball_idx], p_y[rows] - b_y[ball_idx])
+
+    # Nearest player per frame: minimum of each frame group, first row reaching it
+    frames = p_frame[rows]
+    new_frame = np.ones(len(rows), dtype=bool)
+    new_frame[1:] = frames[1:] != frames[:-1]
+    starts = np.flatnonzero(new_frame)
+    group = np.cumsum(new_frame) - 1
+    nearest = np.flatnonzero((dist == np.minimum.reduceat(dist, starts)[group]) & (dist <= POSSESSION_RADIUS))
+    first = np.ones(len(nearest), dtype=bool)
+    first[1:] = group[nearest[1:]] != group[nearest[:-1]]
+    nearest = rows[nearest[first]]
+    return p_track[nearest], p_team[nearest], p_frame[nearest]
+
+def _touches(frame, track, team):
+    """
+    Group consecutive ball ownership frames of the same player into touches.
+
+    Returns:
+        tuple: Arrays (track, team, start_frame, end_frame) of touches lasting at least MIN_POSSESSION_FRAMES
+    """
+    if len(frame) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    new_run = np.ones(len(frame), dtype=bool)
+    new_run[1:] = track[1:] != track[:-1]
+    starts = np.flatnonzero(new_run)
+    ends = np.append(starts[1:], len(frame)) - 1
+    keep = (ends - starts + 1) >= MIN_POSSESSION_FRAMES
+    starts, ends = starts[keep], ends[keep]
+    return track[starts], team[starts], frame[starts], frame[ends]
+
+def _passes(touches, fps):
+    """
+    Passes between consecutive touches of different players.
+
+    Returns:
+        tuple: Arrays (from_track, to_track, team, completed) of the passes
+    """
+    track, team, start, end = touches
+    if len(track) < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0, dtype=bool)
+    is_pass = (track[1:] != track[:-1]) & ((start[1:] - end[:-1]) / fps <= MAX_PASS_SECONDS)
+    completed = team[1:] == team[:-1]
+    return track[:-1][is_pass], track[1:][is_pass], team[:-1][is_pass], completed[is_pass]
+
+def _pass_maps(passes, slots):
+    """Completed and lost passes per team, and the 11x11 pass network between player slots"""
+    from_track, to_track, team, completed = passes
+    slot_of = {int(t): int(s) for t, _, s in slots}
+    pass_map_data = {}
+    for k, side in enumerate(('home_team', 'away_team')):
+        in_team = team == k
+        network = np.zeros((PLAYERS_PER_TEAM, PLAYERS_PER_TEAM), dtype=np.int64)
+        done = in_team & completed
+        src = np.array([slot_of.get(int(t), -1) for t in from_track[done]], dtype=np.int64)
+        dst = np.array([slot_of.get(int(t), -1) for t in to_track[done]], dtype=np.int64)
+        mapped = (src >= 0) & (dst >= 0)
+        np.add.at(network, (src[mapped], dst[mapped]), 1)
+        pass_map_data[side] = {
+            'successful': int(done.sum()),
+            'unsuccessful': int((in_team & ~completed).sum()),
+            'network': network.tolist()
+        }
+    return pass_map_data
+
+def _ratings(slots, passes, distances):
+    """
+    Simple 0-10 player ratings from passing and work rate.
+
+    5.0 base, up to +3 for the pass completion rate, up to +1 for the
+    number of passes and up to +1 for the distance covered, both relative
+    to the most involved teammate.
+    """
+    from_track, _, _, completed = passes
+    made = np.bincount(np.searchsorted(slots[:, 0], from_track[completed]), minlength=len(slots)) if len(slots) else np.zeros(0)
+    lost = np.bincount(np.searchsorted(slots[:, 0], from_track[~completed]), minlength=len(slots)) if len(slots) else np.zeros(0)
+    covered = np.array([distances.get(int(t), 0.0) for t in slots[:, 0]])
+    ratings = {}
+    for k, side in enumerate(('home_team', 'away_team')):
+        in_team = (slots[:, 1] == k) & (slots[:, 2] >= 0)
+        attempts = made + lost
+        max_attempts = max(attempts[in_team].max(initial=0), 1)
+        max_covered = max(covered[in_team].max(initial=0), 1.0)
+        ratings[side] = {}
+        for i in np.flatnonzero(in_team):
+            completion = made[i] / attempts[i] if attempts[i] else 0.5
+            rating = 5.0 + 3.0 * completion + attempts[i] / max_attempts + covered[i] / max_covered
+            ratings[side][f"player_{slots[i, 2]}"] = round(float(np.clip(rating, 0.0, 10.0)), 1)
+    return ratings
@@ -0,0 +1,653 @@
+import os
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import logging
+import importlib
+import threading
+import traceback
+import multiprocessing
+from contextlib import nullcontext
+from datetime import datetime
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    task TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    stage TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    room TEXT,
+    available_at REAL NOT NULL,
+    heartbeat_at REAL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    room TEXT,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+PROGRESS_INTERVAL = 0.5             # Minimum time (s) between two progress events of a job
+HEARTBEAT_INTERVAL = 30.0           # Time (s) between two heartbeats of a running job, whatever its progress
+
+# Events published to a job's room
+JOB_STATUS = 'job_status'           # State change: queued again, running, succeeded, failed, cancelled
+JOB_PROGRESS = 'job_progress'       # Progress or stage update of a running job
+
+class JobCancelled(Exception):
+    """Raised inside a task when its job was cancelled."""
+    pass
+
+class JobQueue:
+    """
+    Persistent job queue backed by a local SQLite database.
+
+    Any number of processes can open the same database: the web app
+    enqueues jobs and reads their state, worker processes claim and run
+    them. No broker is needed. Jobs go through queued -> running ->
+    succeeded / failed / cancelled; a failing job is queued again with an
+    exponential backoff until it has used its max_attempts.
+
+    Every change of a running job is made on behalf of the worker that
+    claimed it and only applies while the job is still running on that
+    worker, so the late result of an attempt that was given up on (e.g.
+    requeued as stale) is ignored instead of overwriting the job.
+
+    Jobs can publish events (state changes, progress, results as they are
+    produced) to a room, e.g. `match:<id>`. Events are appended to the
+    job_events table, in the same transaction as the state change, and read
+    back in order with events_since(), so the web process can forward them
+    to clients whatever process the job ran in.
+    """
+    def __init__(self, db_path, retry_delay=5.0):
+        """
+        Args:
+            db_path (str): SQLite database file, created if missing
+            retry_delay (float): Delay (s) before the first retry, doubled on every further attempt
+        """
+        self.db_path = db_path
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if 'room' not in columns:                                               # Queue created before job events
+                conn.execute("ALTER TABLE jobs ADD COLUMN room TEXT")
+
+    def _connect(self):
+        # One connection per thread and process: connections must not be shared across threads or a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return _Transaction(conn)
+
+    def enqueue(self, task, max_attempts=3, room=None, **kwargs):
+        """
+        Queue a job.
+
+        Args:
+            task (callable or str): Task function, or its "module:function" path
+            max_attempts (int): Number of times the job is tried before it fails
+            room (str): Room the job's events are published to
+            **kwargs: JSON-serializable arguments passed to the task
+
+        Returns:
+            dict: The queued job
+        """
+        job_id = str(uuid.uuid4())
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT INTO jobs (id, task, kwargs, status, max_attempts, room, available_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, task_path(task), json.dumps(kwargs), QUEUED, max_attempts, room, time.time(), _now())
+            )
+            _publish_status(conn, job_id)
+        logger.info(f"Queued job {job_id} ({task_path(task)})")
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """
+        Get a job.
+
+        Args:
+            job_id (str): The job ID
+
+        Returns:
+            dict: The job, or None if it does not exist
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_dict(row) if row else None
+
+    def list(self, status=None, limit=100, room=None):
+        """
+        List the most recent jobs.
+
+        Args:
+            status (str): Only return jobs in this state
+            limit (int): Maximum number of jobs
+            room (str): Only return jobs publishing to this room
+
+        Returns:
+            list: Jobs, newest first
+        """
+        conditions, params = [], ()
+        if status:
+            conditions, params = conditions + ["status = ?"], params + (status,)
+        if room:
+            conditions, params = conditions + ["room = ?"], params + (room,)
+        query = "SELECT * FROM jobs" + (" WHERE " + " AND ".join(conditions) if conditions else "")
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        return [_to_dict(row) for row in rows]
+
+    def cancel(self, job_id):
+        """
+        Cancel a job. A queued job is cancelled at once, a running job at its next progress update.
+
+        Args:
+            job_id (str): The job ID
+
+        Returns:
+            dict: The job, or None if it does not exist
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            cancelled = conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                                     (CANCELLED, _now(), job_id, QUEUED)).rowcount
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+            if cancelled:
+                _publish_status(conn, job_id)
+        return self.get(job_id)
+
+    def claim(self, worker):
+        """
+        Atomically take the oldest job that is ready to run.
+
+        Args:
+            worker (str): Name of the claiming worker
+
+        Returns:
+            dict: The claimed job, now running, or None if there is nothing to do
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")                                         # Lock out other claimers until commit
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND available_at <= ? ORDER BY available_at LIMIT 1",
+                (QUEUED, time.time())
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, heartbeat_at = ?, started_at = ?, error = NULL "
+                "WHERE id = ?",
+                (RUNNING, worker, time.time(), _now(), row['id'])
+            )
+            _publish_status(conn, row['id'])
+        return self.get(row['id'])
+
+    def update_progress(self, job_id, worker, progress, stage=None, publish=True):
+        """
+        Record the progress of a running job, which also counts as a heartbeat.
+
+        Args:
+            job_id (str): The job ID
+            worker (str): Name of the worker running the job
+            progress (float): Completed fraction, between 0 and 1, None to only send a heartbeat
+            stage (str): Name of the current step
+            publish (bool): Whether to publish a progress event
+
+        Returns:
+            bool: Whether the task should stop: cancellation was requested, or the job is no longer running on this worker
+        """
+        if progress is not None:
+            progress = min(max(float(progress), 0.0), 1.0)
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            updated = conn.execute(
+                "UPDATE jobs SET progress = COALESCE(?, progress), stage = COALESCE(?, stage), heartbeat_at = ? "
+                "WHERE id = ? AND status = ? AND worker = ?",
+                (progress, stage, time.time(), job_id, RUNNING, worker)
+            ).rowcount
+            if not updated:
+                return True
+            row = conn.execute("SELECT cancel_requested, progress, stage, kwargs FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if publish and (progress is not None or stage is not None):
+                _insert_event(conn, job_id, JOB_PROGRESS, {'progress': row['progress'], 'stage': row['stage'],
+                                                           **_job_refs(row)})
+        return bool(row['cancel_requested'])
+
+    def heartbeat(self, job_id, worker):
+        """
+        Record that a worker is still running a job.
+
+        Returns:
+            bool: Whether the job is still running on this worker
+        """
+        with self._connect() as conn:
+            return bool(conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                                     (time.time(), job_id, RUNNING, worker)).rowcount)
+
+    def complete(self, job_id, worker, result=None):
+        """
+        Mark a running job as succeeded.
+
+        Returns:
+            bool: Whether the result was recorded, False if the job is no longer running on this worker
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1, result = ?, finished_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                (SUCCEEDED, json.dumps(result), _now(), job_id, RUNNING, worker)
+            ).rowcount
+            if updated:
+                _publish_status(conn, job_id)
+        return bool(updated)
+
+    def mark_cancelled(self, job_id, worker):
+        """
+        Mark a running job as cancelled.
+
+        Returns:
+            bool: Whether the job was marked, False if it is no longer running on this worker
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            updated = conn.execute("UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ? AND worker = ?",
+                                   (CANCELLED, _now(), job_id, RUNNING, worker)).rowcount
+            if updated:
+                _publish_status(conn, job_id)
+        return bool(updated)
+
+    def fail(self, job_id, worker, error):
+        """
+        Record a failed attempt: queue the job again with a backoff, or fail it after its last attempt.
+
+        Args:
+            job_id (str): The job ID
+            worker (str): Name of the worker that ran the attempt
+            error (str): Error message
+
+        Returns:
+            str: The new job status, None if the job is no longer running on this worker
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM jobs WHERE id = ? AND status = ? AND worker = ?",
+                               (job_id, RUNNING, worker)).fetchone()
+            return self._record_failure(conn, row, error) if row else None
+
+    def _record_failure(self, conn, row, error):
+        """Requeue or fail a running job, in the caller's transaction"""
+        if row['attempts'] < row['max_attempts'] and not row['cancel_requested']:
+            delay = self.retry_delay * 2 ** (row['attempts'] - 1)
+            conn.execute("UPDATE jobs SET status = ?, error = ?, worker = NULL, available_at = ? WHERE id = ?",
+                         (QUEUED, error, time.time() + delay, row['id']))
+            status = QUEUED
+        else:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?", (FAILED, error, _now(), row['id']))
+            status = FAILED
+        _publish_status(conn, row['id'])
+        return status
+
+    def publish(self, job_id, worker, event, data=None):
+        """
+        Publish an event to the room of a job, while it is running on the given worker.
+
+        Args:
+            job_id (str): The job ID
+            worker (str): Name of the worker running the job
+            event (str): Event name
+            data (dict): JSON-serializable event payload
+
+        Returns:
+            bool: Whether the event was published
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            running = conn.execute("SELECT 1 FROM jobs WHERE id = ? AND status = ? AND worker = ?",
+                                   (job_id, RUNNING, worker)).fetchone()
+            if running:
+                _insert_event(conn, job_id, event, data or {})
+        return bool(running)
+
+    def events_since(self, last_id=0, limit=500):
+        """
+        Published events, in order.
+
+        Args:
+            last_id (int): Only return events after this event ID
+            limit (int): Maximum number of events
+
+        Returns:
+            list: Events as dicts with id, job_id, room, event, data and created_at
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM job_events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)).fetchall()
+        return [dict(row, data=json.loads(row['data'])) for row in rows]
+
+    def last_event_id(self):
+        """ID of the latest published event, 0 if there is none"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(id) AS id FROM job_events").fetchone()
+        return row['id'] or 0
+
+    def prune_events(self, older_than=3600.0):
+        """
+        Delete events older than older_than seconds, which every listener has long forwarded.
+
+        Returns:
+            int: Number of deleted events
+        """
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM job_events WHERE created_at < ?", (time.time() - older_than,)).rowcount
+
+    def requeue_stale(self, stale_after=600.0):
+        """
+        Recover jobs of workers that died: running jobs without heartbeat for stale_after seconds count as a failed attempt.
+
+        Returns:
+            int: Number of recovered jobs
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")                                         # A heartbeat cannot land between check and update
+            rows = conn.execute("SELECT * FROM jobs WHERE status = ? AND heartbeat_at < ?",
+                                (RUNNING, time.time() - stale_after)).fetchall()
+            for row in rows:
+                logger.warning(f"Job {row['id']} lost its worker {row['worker']}")
+                self._record_failure(conn, row, "Worker stopped responding")
+        return len(rows)
+
+class _Transaction:
+    """Connection context: commits on success, rolls back on error, with autocommit connections"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+class Job:
+    """Handle passed to a running task to report progress and honor cancellation."""
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.id = job['id']
+        self.worker = job['worker']
+        self.attempt = job['attempts']
+        self.max_attempts = job['max_attempts']
+        self._progress = job['progress']
+        self._stage = job['stage']
+        self._published_at = 0.0
+
+    def progress(self, progress, stage=None):
+        """
+        Report progress, and stop the task if the job was cancelled.
+
+        A progress event is published when the stage changes, or when the
+        progress moved by at least 1% and PROGRESS_INTERVAL seconds passed
+        since the last one, so tight loops do not flood the clients.
+
+        Args:
+            progress (float): Completed fraction, between 0 and 1
+            stage (str): Name of the current step
+
+        Raises:
+            JobCancelled: The job was cancelled, or is no longer running on this worker
+        """
+        now = time.time()
+        publish = ((stage is not None and stage != self._stage) or
+                   (abs(progress - self._progress) >= 0.01 and now - self._published_at >= PROGRESS_INTERVAL) or progress >= 1)
+        if publish:
+            self._progress, self._published_at = progress, now
+            self._stage = stage if stage is not None else self._stage
+        if self.queue.update_progress(self.id, self.worker, progress, stage, publish):
+            raise JobCancelled(self.id)
+
+    def publish(self, event, data=None):
+        """
+        Publish a result as soon as it is produced, e.g. a detected event.
+
+        Args:
+            event (str): Event name
+            data (dict): JSON-serializable event payload
+        """
+        self.queue.publish(self.id, self.worker, event, data)
+
+    def sleep(self, seconds, interval=0.5):
+        """Sleep, checking for cancellation every interval seconds"""
+        end = time.time() + seconds
+        while time.time() < end:
+            if self.queue.update_progress(self.id, self.worker, None):
+                raise JobCancelled(self.id)
+            time.sleep(min(interval, max(end - time.time(), 0)))
+
+def get_job_queue(app=None):
+    """
+    Job queue of a Flask app, opened once from its JOB_QUEUE_PATH setting.
+
+    Args:
+        app (Flask): The app, defaults to the current app
+
+    Returns:
+        JobQueue: The app's job queue
+    """
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+    if 'job_queue' not in app.extensions:
+        app.extensions['job_queue'] = JobQueue(app.config['JOB_QUEUE_PATH'], app.config.get('JOB_RETRY_DELAY', 5.0))
+    return app.extensions['job_queue']
+
+def task_path(task):
+    """"module:function" path of a task function"""
+    if isinstance(task, str):
+        return task
+    return f"{task.__module__}:{task.__qualname__}"
+
+def resolve_task(path):
+    """Import a task function from its "module:function" path"""
+    module_name, _, name = path.partition(':')
+    return getattr(importlib.import_module(module_name), name)
+
+def run_job(queue, job, heartbeat_interval=HEARTBEAT_INTERVAL):
+    """
+    Run a claimed job and record its outcome.
+
+    The task is called with a Job handle as `job` keyword argument and the
+    job kwargs. A background thread sends heartbeats while the task runs,
+    so a long step without progress updates is not taken for a dead worker.
+
+    Args:
+        queue (JobQueue): The queue the job was claimed from
+        job (dict): The claimed job
+        heartbeat_interval (float): Seconds between two heartbeats
+
+    Returns:
+        str: The final job status, None if the job was taken from this worker and its outcome ignored
+    """
+    stop_heartbeat = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat_loop, name=f"heartbeat-{job['id']}", daemon=True,
+                                 args=(queue, job['id'], job['worker'], heartbeat_interval, stop_heartbeat))
+    heartbeat.start()
+    try:
+        result = resolve_task(job['task'])(job=Job(queue, job), **job['kwargs'])
+    except JobCancelled:
+        status = CANCELLED if queue.mark_cancelled(job['id'], job['worker']) else None
+    except Exception as e:
+        logger.error(f"Job {job['id']} failed: {e}\n{traceback.format_exc()}")
+        status = queue.fail(job['id'], job['worker'], str(e))
+    else:
+        status = SUCCEEDED if queue.complete(job['id'], job['worker'], result) else None
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+
+    if status is None:
+        logger.warning(f"Job {job['id']} is no longer running on {job['worker']}, outcome ignored")
+    else:
+        logger.info(f"Job {job['id']} {status}")
+    return status
+
+def _heartbeat_loop(queue, job_id, worker, interval, stop_event):
+    """Send heartbeats for a running job until stopped or the job is no longer running on this worker"""
+    while not stop_event.wait(interval):
+        try:
+            if not queue.heartbeat(job_id, worker):
+                return
+        except sqlite3.Error as e:
+            logger.warning(f"Heartbeat of job {job_id} failed: {e}")
+
+def worker_loop(db_path, worker, app_factory=None, poll_interval=0.5, stop_event=None, retry_delay=5.0,
+                heartbeat_interval=HEARTBEAT_INTERVAL):
+    """
+    Claim and run jobs until stopped.
+
+    Args:
+        db_path (str): Job queue database
+        worker (str): Worker name
+        app_factory (str): Optional "module:function" returning a Flask app, jobs then run in its app context
+        poll_interval (float): Wait (s) between two polls of an empty queue
+        stop_event (multiprocessing.Event): Stops the loop once set
+        retry_delay (float): Delay (s) before the first retry of a failed job
+        heartbeat_interval (float): Seconds between two heartbeats of the running job
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)                                    # The pool handles Ctrl+C and stops workers
+    queue = JobQueue(db_path, retry_delay)
+    app = resolve_task(app_factory)() if app_factory else None
+    while stop_event is None or not stop_event.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        with app.app_context() if app is not None else nullcontext():
+            run_job(queue, job, heartbeat_interval)
+
+class WorkerPool:
+    """
+    Pool of worker processes running jobs from a JobQueue.
+
+    Workers that die are restarted, and the jobs they were running are
+    retried once their heartbeat is older than stale_after seconds.
+    """
+    def __init__(self, db_path, num_workers=2, app_factory=None, poll_interval=0.5, stale_after=600.0, retry_delay=5.0,
+                 heartbeat_interval=HEARTBEAT_INTERVAL):
+        """
+        Args:
+            db_path (str): Job queue database
+            num_workers (int): Number of worker processes
+            app_factory (str): Optional "module:function" returning a Flask app for the jobs' app context
+            poll_interval (float): Wait (s) between two polls of an empty queue
+            stale_after (float): Seconds without heartbeat before a running job is considered lost
+            retry_delay (float): Delay (s) before the first retry of a failed job
+            heartbeat_interval (float): Seconds between two heartbeats of a running job, well below stale_after
+        """
+        self.db_path = db_path
+        self.num_workers = num_workers
+        self.app_factory = app_factory
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.retry_delay = retry_delay
+        self.heartbeat_interval = heartbeat_interval
+        self.stop_event = multiprocessing.Event()
+        self.processes = {}
+
+    def start(self):
+        """Start the worker processes"""
+        for k in range(self.num_workers):
+            self._start_worker(f"worker-{os.getpid()}-{k}")
+        logger.info(f"Started {self.num_workers} job workers on {self.db_path}")
+
+    def _start_worker(self, name):
+        process = multiprocessing.Process(target=worker_loop, name=name, daemon=True,
+                                          args=(self.db_path, name, self.app_factory, self.poll_interval, self.stop_event,
+                                                self.retry_delay, self.heartbeat_interval))
+        process.start()
+        self.processes[name] = process
+
+    def supervise(self, interval=5.0):
+        """Restart dead workers and recover their jobs until stopped"""
+        queue = JobQueue(self.db_path, self.retry_delay)
+        while not self.stop_event.is_set():
+            for name, process in list(self.processes.items()):
+                if not process.is_alive():
+                    logger.warning(f"Job worker {name} exited with code {process.exitcode}, restarting it")
+                    self._start_worker(name)
+            queue.requeue_stale(self.stale_after)
+            self.stop_event.wait(interval)
+
+    def stop(self, timeout=10.0):
+        """Stop the workers once their current job is done (killed after timeout)"""
+        self.stop_event.set()
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+def _to_dict(row):
+    job = dict(row)
+    job['kwargs'] = json.loads(job['kwargs'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+def _job_refs(row):
+    """Job kwargs identifying what the job works on (e.g. match_id), included in its events"""
+    kwargs = json.loads(row['kwargs'])
+    return {key: value for key, value in kwargs.items() if key.endswith('_id')}
+
+def _insert_event(conn, job_id, event, data):
+    room = conn.execute("SELECT room FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    conn.execute("INSERT INTO job_events (job_id, room, event, data, created_at) VALUES (?, ?, ?, ?, ?)",
+                 (job_id, room['room'] if room else None, event, json.dumps(dict(data, job_id=job_id)), time.time()))
+
+def _publish_status(conn, job_id):
+    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    _insert_event(conn, job_id, JOB_STATUS, {
+        'status': row['status'],
+        'progress': row['progress'],
+        'stage': row['stage'],
+        'attempts': row['attempts'],
+        'result': json.loads(row['result']) if row['result'] is not None else None,
+        **_job_refs(row)
+    })
@@ -4,30 +4,35 @@ import random
 from datetime import datetime
 import logging
 
-from .. import db
-from ..models import Match, MatchEvent, Highlight, TacticalReport, MatchStatus
+from ..db_json import db
+from ..models.json_models import create_match_event, create_highlight, create_tactical_report
+from .analytics import load_tracking_data, find_tracking_file, compute_tactical_analytics
+from .job_queue import JobCancelled
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# This is a placeholder for a real task queue like Celery
-class TaskQueue:
+def enqueue_match_processing(queue, match_id, video_path, max_attempts=3):
     """
-    Mock task queue for development purposes.
-    In production, you would use Celery or another task queue system.
+    Queue the processing of a match video for the background workers.
+
+    Args:
+        queue (JobQueue): The job queue
+        match_id (str): The ID of the match to process
+        video_path (str): Path to the uploaded video file
+        max_attempts (int): Number of times processing is tried before the job fails
+
+    Returns:
+        dict: The queued job
     """
-    @staticmethod
-    def delay(*args, **kwargs):
-        """
-        Mock delay method that would normally queue a task for async processing.
-        For development, we'll just call the function directly.
-        """
-        return process_match_video(*args, **kwargs)
+    return queue.enqueue(process_match_video, max_attempts=max_attempts, room=match_room(match_id),
+                         match_id=match_id, video_path=video_path)
 
-# Create a task queue instance for use in routes
-process_match_video = TaskQueue()
+def match_room(match_id):
+    """SocketIO room the processing events of a match are published to"""
+    return f"match:{match_id}"
 
-def process_match_video(match_id, video_path):
+def process_match_video(match_id, video_path, tracking_path=None, job=None):
     """
     Process a match video to generate highlights and analytics.
     
@@ -38,35 +43,66 @@ def process_match_video(match_id, video_path):
     - Stats computation
     
     This is a simplified mock implementation that simulates processing time
-    and generates random data.
+    and generates random events. Heatmaps, pass maps, possession and player
+    ratings are computed from the tracking data exported by the detection
+    app when it is available, and left empty otherwise.
     
     Args:
         match_id (str): The ID of the match to process
         video_path (str): Path to the uploaded video file
+        tracking_path (str): Tracking data of the video, defaults to <video name>_tracking.parquet/.bin if it exists
+        job (Job): Job handle when run by a queue worker, receives progress and raises on cancellation
+
+    When run by a worker, stage progress, each detected event ('match_event')
+    and each highlight ('highlight') are published to the match room as they
+    are produced, before the results are committed at the end of the job.
+    A retry first publishes 'results_reset', so clients drop what an earlier
+    attempt published instead of showing it twice.
     """
+    def progress(value, stage):
+        if job is not None:
+            job.progress(value, stage)
+
+    def publish(event, data):
+        if job is not None:
+            job.publish(event, data)
+
+    def pause(seconds):
+        if job is not None:
+            job.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
     try:
         # Get the match
-        match = Match.query.get(match_id)
+        match = db.get_by_id('matches', match_id)
         if not match:
             logger.error(f"Match not found: {match_id}")
             return
+        home_team_name = _team_name(match['home_team_id'])
+        away_team_name = _team_name(match['away_team_id'])
         
         # Update processing status
-        match.processing_status = "processing"
-        db.session.commit()
+        db.update('matches', match_id, {'processing_status': "processing"})
+        
+        # Events published by a failed attempt were never committed, and are published again below
+        if job is not None and job.attempt > 1:
+            publish('results_reset', {'attempt': job.attempt})
         
         # Simulate processing time
         logger.info(f"Starting processing for match {match_id}")
         
         # Step 1: Analyze video for events (simulate with sleep)
-        time.sleep(2)
+        progress(0.0, 'events')
+        pause(2)
         
         # Generate random events based on score
-        total_goals = match.home_score + match.away_score
+        home_score = match.get('home_score') or 0
+        away_score = match.get('away_score') or 0
         events = []
         
         # Add goal events
-        for i in range(match.home_score):
+        for i in range(home_score):
             # Home team goals
             minute = random.randint(1, 90)
             events.append({
@@ -74,13 +110,13 @@ def process_match_video(match_id, video_path):
                 'event_type': 'goal',
                 'minute': minute,
                 'second': random.randint(0, 59),
-                'team_id': match.home_team_id,
+                'team_id': match['home_team_id'],
                 'player_name': f"Player {random.randint(1, 11)}",  # Mock data
-                'description': f"Goal scored by Player {random.randint(1, 11)} for {match.home_team.name}",
+                'description': f"Goal scored by Player {random.randint(1, 11)} for {home_team_name}",
                 'video_timestamp': minute * 60
             })
         
-        for i in range(match.away_score):
+        for i in range(away_score):
             # Away team goals
             minute = random.randint(1, 90)
             events.append({
@@ -88,16 +124,16 @@ def process_match_video(match_id, video_path):
                 'event_type': 'goal',
                 'minute': minute,
                 'second': random.randint(0, 59),
-                'team_id': match.away_team_id,
+                'team_id': match['away_team_id'],
                 'player_name': f"Player {random.randint(1, 11)}",  # Mock data
-                'description': f"Goal scored by Player {random.randint(1, 11)} for {match.away_team.name}",
+                'description': f"Goal scored by Player {random.randint(1, 11)} for {away_team_name}",
                 'video_timestamp': minute * 60
             })
         
         # Add other events (cards, saves, fouls)
         for i in range(random.randint(5, 15)):
             minute = random.randint(1, 90)
-            team_id = match.home_team_id if random.random() > 0.5 else match.away_team_id
+            team_id = match['home_team_id'] if random.random() > 0.5 else match['away_team_id']
             event_type = random.choice(['save', 'foul', 'card'])
             
             event = {
@@ -120,13 +156,13 @@ def process_match_video(match_id, video_path):
             
             events.append(event)
         
-        # Save events to database
+        # Events are saved with the other results at the end
         for event_data in events:
-            event = MatchEvent(**event_data)
-            db.session.add(event)
+            publish('match_event', event_data)
         
         # Step 2: Generate highlights (simulate with sleep)
-        time.sleep(3)
+        progress(0.3, 'highlights')
+        pause(3)
         
         # Create a highlight for each goal and some other key events
         highlights = []
@@ -145,7 +181,7 @@ def process_match_video(match_id, video_path):
                 # Create highlight
                 title = f"{event['event_type'].capitalize()} - {event['minute']}:{event['second']:02d}"
                 
-                highlight = Highlight(
+                highlight_data = dict(
                     match_id=match_id,
                     title=title,
                     description=event['description'],
@@ -160,69 +196,53 @@ def process_match_video(match_id, video_path):
                     tags=[event['event_type'], 'auto-generated']
                 )
                 
-                highlights.append(highlight)
-        
-        # Save highlights to database
-        for highlight in highlights:
-            db.session.add(highlight)
+                highlights.append(highlight_data)
+                publish('highlight', highlight_data)
         
         # Step 3: Generate tactical report (simulate with sleep)
-        time.sleep(2)
-        
-        # Create mock heatmap data
-        heatmap_data = {
-            'home_team': {
-                'overall': [[random.random() for _ in range(10)] for _ in range(7)],
-                'players': {f"player_{i}": [[random.random() for _ in range(10)] for _ in range(7)] for i in range(11)}
-            },
-            'away_team': {
-                'overall': [[random.random() for _ in range(10)] for _ in range(7)],
-                'players': {f"player_{i}": [[random.random() for _ in range(10)] for _ in range(7)] for i in range(11)}
-            }
-        }
+        progress(0.7, 'report')
+        pause(2)
         
-        # Create mock pass map data
-        pass_map_data = {
-            'home_team': {
-                'successful': random.randint(300, 500),
-                'unsuccessful': random.randint(50, 150),
-                'network': [[random.randint(0, 20) for _ in range(11)] for _ in range(11)]
-            },
-            'away_team': {
-                'successful': random.randint(300, 500),
-                'unsuccessful': random.randint(50, 150),
-                'network': [[random.randint(0, 20) for _ in range(11)] for _ in range(11)]
-            }
-        }
+        # Compute heatmaps, passes and ratings from the tracking data
+        tracking_path = tracking_path or find_tracking_file(video_path)
+        if tracking_path:
+            analytics_start = time.perf_counter()
+            columns, metadata = load_tracking_data(tracking_path)
+            analytics = compute_tactical_analytics(columns, metadata)
+            logger.info(f"Computed analytics for match {match_id} from {len(columns['frame'])} tracking rows "
+                        f"in {time.perf_counter() - analytics_start:.2f}s")
+        else:
+            logger.warning(f"No tracking data for match {match_id}, tactical report will have no heatmaps or pass maps")
+            analytics = {'heatmap_data': {}, 'pass_map_data': {}, 'player_ratings': {}, 'key_stats': {}}
+        heatmap_data = analytics['heatmap_data']
+        pass_map_data = analytics['pass_map_data']
         
         # Create mock shot map data
         shot_map_data = {
             'home_team': [
-                {'x': random.uniform(0.6, 0.95), 'y': random.uniform(0.3, 0.7), 'xG': random.uniform(0.1, 0.9), 'result': 'goal' if i < match.home_score else 'miss'} 
+                {'x': random.uniform(0.6, 0.95), 'y': random.uniform(0.3, 0.7), 'xG': random.uniform(0.1, 0.9), 'result': 'goal' if i < home_score else 'miss'} 
                 for i in range(random.randint(8, 15))
             ],
             'away_team': [
-                {'x': random.uniform(0.05, 0.4), 'y': random.uniform(0.3, 0.7), 'xG': random.uniform(0.1, 0.9), 'result': 'goal' if i < match.away_score else 'miss'} 
+                {'x': random.uniform(0.05, 0.4), 'y': random.uniform(0.3, 0.7), 'xG': random.uniform(0.1, 0.9), 'result': 'goal' if i < away_score else 'miss'} 
                 for i in range(random.randint(8, 15))
             ]
         }
         
-        # Create mock player ratings
-        player_ratings = {
-            'home_team': {f"player_{i}": random.uniform(5.0, 9.0) for i in range(11)},
-            'away_team': {f"player_{i}": random.uniform(5.0, 9.0) for i in range(11)}
-        }
+        player_ratings = analytics['player_ratings']
+        possession = analytics['key_stats'].get('possession', {'home': random.uniform(30, 70), 'away': random.uniform(30, 70)})
         
         # Create tactical report
-        report = TacticalReport(
+        report = create_tactical_report(
             match_id=match_id,
-            summary=f"Match analysis for {match.home_team.name} vs {match.away_team.name}. Final score: {match.home_score}-{match.away_score}.",
+            summary=f"Match analysis for {home_team_name} vs {away_team_name}. Final score: {home_score}-{away_score}.",
             heatmap_data=heatmap_data,
             pass_map_data=pass_map_data,
             shot_map_data=shot_map_data,
             player_ratings=player_ratings,
             key_stats={
-                'possession': {'home': random.uniform(30, 70), 'away': random.uniform(30, 70)},
+                **analytics['key_stats'],
+                'possession': possession,
                 'shots': {'home': random.randint(8, 20), 'away': random.randint(8, 20)},
                 'shots_on_target': {'home': random.randint(3, 10), 'away': random.randint(3, 10)},
                 'corners': {'home': random.randint(3, 12), 'away': random.randint(3, 12)},
@@ -231,16 +251,10 @@ def process_match_video(match_id, video_path):
                 'red_cards': {'home': random.randint(0, 1), 'away': random.randint(0, 1)}
             }
         )
-        db.session.add(report)
-        
-        # Update match data
-        match.is_processed = True
-        match.processing_status = "completed"
-        match.status = MatchStatus.FINISHED  # Ensure match is marked as finished
         
         # Update match stats
-        match.stats = {
-            'possession': {'home': random.uniform(30, 70), 'away': random.uniform(30, 70)},
+        stats = {
+            'possession': possession,
             'shots': {'home': random.randint(8, 20), 'away': random.randint(8, 20)},
             'shots_on_target': {'home': random.randint(3, 10), 'away': random.randint(3, 10)},
             'corners': {'home': random.randint(3, 12), 'away': random.randint(3, 12)},
@@ -249,7 +263,14 @@ def process_match_video(match_id, video_path):
             'red_cards': {'home': random.randint(0, 1), 'away': random.randint(0, 1)}
         }
         
-        db.session.commit()
+        progress(1.0, 'saving')
+        _save_results(match_id, job.id if job is not None else None, events, highlights, report)
+        db.update('matches', match_id, {
+            'is_processed': True,
+            'processing_status': "completed",
+            'status': "finished",  # Ensure match is marked as finished
+            'stats': stats
+        })
         logger.info(f"Processing completed for match {match_id}")
         
         return {
@@ -259,20 +280,62 @@ def process_match_video(match_id, video_path):
             'events_count': len(events)
         }
         
+    except JobCancelled:
+        logger.info(f"Processing cancelled for match {match_id}")
+        _set_processing_status(match_id, "cancelled")
+        raise
     except Exception as e:
         logger.error(f"Error processing match {match_id}: {str(e)}")
         
-        # Update match status to error
-        try:
-            match = Match.query.get(match_id)
-            if match:
-                match.processing_status = "error"
-                db.session.commit()
-        except Exception as inner_e:
-            logger.error(f"Error updating match status: {str(inner_e)}")
+        # Update match status to error, or back to pending when the queue will retry
+        retrying = job is not None and job.attempt < job.max_attempts
+        _set_processing_status(match_id, "pending" if retrying else "error")
+        if job is not None:
+            raise
         
         return {
             'status': 'error',
             'match_id': match_id,
             'error': str(e)
-        } 
\ No newline at end of file
+        } 
+
+def _team_name(team_id):
+    team = db.get_by_id('teams', team_id) if team_id else None
+    return team['name'] if team else "Unknown team"
+
+def _save_results(match_id, job_id, events, highlights, report):
+    """
+    Store the events, highlights and tactical report of a match.
+
+    Records are tagged with the job that produced them. The records of an
+    earlier attempt of the same job, interrupted while saving, are deleted
+    first so a retry does not store them twice.
+    """
+    if job_id is not None:
+        for collection in ('events', 'highlights', 'reports'):
+            for item in db.get_all(collection, {'match_id': match_id, 'job_id': job_id}):
+                db.delete(collection, item['id'])
+    
+    for event_data in events:
+        event = create_match_event(event_data['match_id'], event_data['event_type'], event_data['minute'],
+                                   event_data['second'], event_data['team_id'], event_data['player_name'],
+                                   event_data['description'], event_data['video_timestamp'])
+        event['card_type'] = event_data.get('card_type')
+        db.create('events', dict(event, job_id=job_id))
+    
+    for highlight_data in highlights:
+        highlight = create_highlight(highlight_data['match_id'], highlight_data['title'], highlight_data['type'],
+                                     highlight_data['start_time'], highlight_data['end_time'],
+                                     highlight_data['description'], highlight_data['match_time'],
+                                     highlight_data['team_id'], highlight_data['player_name'])
+        highlight.update(ai_caption=highlight_data['ai_caption'], importance_score=highlight_data['importance_score'],
+                         tags=highlight_data['tags'])
+        db.create('highlights', dict(highlight, job_id=job_id))
+    
+    db.create('reports', dict(report, job_id=job_id))
+
+def _set_processing_status(match_id, status):
+    try:
+        db.update('matches', match_id, {'processing_status': status})
+    except Exception as inner_e:
+        logger.error(f"Error updating match status: {str(inner_e)}")
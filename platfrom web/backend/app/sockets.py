@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+
+from flask import request
+from flask_socketio import join_room, leave_room, emit
+
+from .services.job_queue import get_job_queue, JOB_STATUS
+from .services.video_processor import match_room
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class JobEventRelay:
+    """
+    Forwards the events published by the background jobs to the SocketIO rooms.
+
+    Workers run in other processes and only write their events to the job
+    queue database. The relay is a single background task of the web
+    process that reads the new events in order and emits each of them to
+    its room, so clients are pushed progress, events, highlights and
+    completion instead of polling the API.
+    """
+    def __init__(self, socketio, queue, poll_interval=0.25, retention=3600):
+        """
+        Args:
+            socketio (SocketIO): The SocketIO instance
+            queue (JobQueue): The job queue the events are read from
+            poll_interval (float): Seconds between two reads when there is no new event
+            retention (float): Seconds published events are kept before being pruned
+        """
+        self.socketio = socketio
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.last_id = None
+        self.task = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Start the relay, once, even when several clients join at the same time"""
+        with self._start_lock:
+            if self.task is None:
+                self.last_id = self.queue.last_event_id()  # Clients joining get the current state on join
+                self.task = self.socketio.start_background_task(self.run)
+
+    def run(self):
+        last_prune = 0
+        while True:
+            try:
+                events = self.queue.events_since(self.last_id)
+                for event in events:
+                    if event['room']:
+                        self.socketio.emit(event['event'], event['data'], to=event['room'])
+                    self.last_id = event['id']
+                if time.time() - last_prune > self.retention / 10:
+                    self.queue.prune_events(self.retention)
+                    last_prune = time.time()
+            except Exception as e:
+                logger.error(f"Error relaying job events: {str(e)}")
+                events = []
+            if not events:
+                self.socketio.sleep(self.poll_interval)
+
+def register_socket_handlers(socketio, app):
+    """
+    Register the SocketIO event handlers.
+
+    Clients emit 'join_match' with {'match_id': ...} to receive the
+    processing events of a match: 'job_status', 'job_progress',
+    'match_event', 'highlight' and 'results_reset' (a retry is starting
+    over, drop the events and highlights received so far). The current
+    state of the match's latest job is sent back as a 'job_status' event
+    on join. Failure details are not sent to the room, admins read them
+    from the jobs API.
+
+    Args:
+        socketio (SocketIO): The SocketIO instance
+        app (Flask): The app
+    """
+    relay = JobEventRelay(socketio, get_job_queue(app), app.config['JOB_EVENTS_POLL_INTERVAL'],
+                          app.config['JOB_EVENTS_RETENTION'])
+    app.extensions['job_event_relay'] = relay
+
+    @socketio.on('join_match')
+    def handle_join_match(data):
+        match_id = (data or {}).get('match_id')
+        if not match_id:
+            emit('error', {'message': 'match_id is required'})
+            return
+        relay.start()
+        room = match_room(match_id)
+        join_room(room)
+        logger.info(f"Client {request.sid} joined {room}")
+
+        jobs = relay.queue.list(limit=1, room=room)
+        if jobs:
+            job = jobs[0]
+            emit(JOB_STATUS, {
+                'job_id': job['id'],
+                'match_id': match_id,
+                'status': job['status'],
+                'progress': job['progress'],
+                'stage': job['stage'],
+                'attempts': job['attempts'],
+                'result': job['result']
+            })
+
+    @socketio.on('leave_match')
+    def handle_leave_match(data):
+        match_id = (data or {}).get('match_id')
+        if match_id:
+            leave_room(match_room(match_id))
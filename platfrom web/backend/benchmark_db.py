@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import multiprocessing
+
+# Add the backend directory to path so imports work correctly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.db_json import JsonDB
+
+def make_record(i):
+    """A highlight-like record of ~0.5 KB"""
+    return {
+        'match_id': f"match-{i % 500}",
+        'title': f"Goal - {i % 90}:{i % 60:02d}",
+        'description': f"Goal scored by Player {i % 11 + 1}",
+        'type': random.choice(['goal', 'save', 'foul', 'card']),
+        'start_time': i % 5400,
+        'end_time': i % 5400 + 15,
+        'player_name': f"Player {i % 11 + 1}",
+        'importance_score': random.random(),
+        'tags': ['auto-generated'],
+        'views_count': 0,
+        'likes_count': 0
+    }
+
+def timed(label, nbr_ops, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<38} {nbr_ops:>8} ops {elapsed:8.2f}s {nbr_ops / elapsed:>12,.0f} ops/s")
+    return result
+
+def run_benchmark(nbr_records, nbr_updates, fsync):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'database.json')
+        db = JsonDB(db_path, fsync=fsync)
+
+        def create_all():
+            ids = [db.create('highlights', make_record(i))['id'] for i in range(nbr_records)]
+            db.flush()  # Until the background flusher wrote everything to the log
+            return ids
+        ids = timed("create (write-ahead log)", nbr_records, create_all)
+        sample = random.sample(ids, min(nbr_updates, len(ids)))
+        timed("update", len(sample), lambda: [db.update('highlights', item_id, {'views_count': 1}) for item_id in sample])
+        timed("get_by_id", len(sample), lambda: [db.get_by_id('highlights', item_id) for item_id in sample])
+        timed("get_all by match_id (indexed)", 500, lambda: [db.get_all('highlights', {'match_id': f"match-{i}"}) for i in range(500)])
+        timed("get_all by type (not indexed)", 20, lambda: [db.get_all('highlights', {'type': 'goal'}) for _ in range(20)])
+        timed("delete", len(sample) // 10, lambda: [db.delete('highlights', item_id) for item_id in sample[:len(sample) // 10]])
+        run_concurrent(db, nbr_records)
+        db.flush()
+        wal_bytes = db.wal_bytes
+        db.close()
+
+        reopened = timed(f"reopen (replay {wal_bytes / 1e6:.1f} MB of log)", 1, lambda: JsonDB(db_path))
+        assert len(reopened.get_all('highlights')) == len(db.get_all('highlights'))
+        timed("checkpoint (snapshot + atomic rename)", 1, reopened.checkpoint)
+        print(f"Snapshot size: {os.path.getsize(db_path) / 1e6:.1f} MB")
+
+        # Previous engine: every write rewrote the whole file
+        def full_rewrite():
+            with open(os.path.join(tmp_dir, 'full.json'), 'w') as f:
+                json.dump({name: reopened.get_all(name) for name in reopened.collections}, f, indent=2)
+        timed(f"full-file rewrite at {nbr_records} records", 1, full_rewrite)
+        reopened.close()
+
+def run_concurrent(db, first_record, seconds=3, nbr_writers=2, nbr_readers=4):
+    """Read latency of indexed lookups while other threads keep writing"""
+    stop = threading.Event()
+    latencies = []
+    writes = [0] * nbr_writers
+
+    def writer(w):
+        i = first_record + w
+        while not stop.is_set():
+            db.create('highlights', make_record(i))
+            writes[w] += 1
+            i += nbr_writers
+
+    def reader():
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            db.get_all('highlights', {'match_id': f"match-{i % 500}"})
+            db.get_by_id('users', 'missing')
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(nbr_writers)]
+    threads += [threading.Thread(target=reader) for _ in range(nbr_readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    print(f"concurrent: {nbr_writers} writers {sum(writes) / seconds:,.0f} writes/s, {nbr_readers} readers "
+          f"{len(latencies) / seconds:,.0f} reads/s, read latency p50 {latencies[len(latencies) // 2] * 1e3:.2f} ms "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.2f} ms max {latencies[-1] * 1e3:.1f} ms")
+
+def process_writer(db_path, worker, nbr_records, results):
+    db = JsonDB(db_path, multiprocess=True)
+    for i in range(nbr_records):
+        db.create('highlights', make_record(worker * nbr_records + i))
+    results.put(db.version)
+    db.close()
+
+def run_processes(nbr_processes, nbr_records):
+    """Write throughput of several processes sharing the same files (multi-process mode)"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'database.json')
+        db = JsonDB(db_path, multiprocess=True)
+        results = multiprocessing.Queue()
+        per_process = nbr_records // nbr_processes
+        processes = [multiprocessing.Process(target=process_writer, args=(db_path, w, per_process, results))
+                     for w in range(nbr_processes)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        versions = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        total = per_process * nbr_processes
+        assert len(db.get_all('highlights')) == total and max(versions) == db.version == total
+        print(f"multi-process: {nbr_processes} processes {total} creates {elapsed:.2f}s {total / elapsed:,.0f} ops/s, "
+              f"every process sees version {db.version}")
+        db.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the JSON database write throughput")
+    parser.add_argument("--records", type=int, default=100000, help="Number of records created")
+    parser.add_argument("--updates", type=int, default=2000, help="Number of records updated")
+    parser.add_argument("--fsync", action="store_true", help="fsync the log after every write")
+    parser.add_argument("--processes", type=int, default=4, help="Number of processes of the multi-process benchmark (0 to skip)")
+    args = parser.parse_args()
+    run_benchmark(args.records, args.updates, args.fsync)
+    if args.processes:
+        run_processes(args.processes, args.records // 10)
@@ -21,6 +21,12 @@ class Config:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 500 * 1024 * 1024  # 500MB max upload size
     
+    # Background job settings (SQLite job queue, run `python worker.py` for the workers)
+    JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.sqlite3'))
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 5.0))  # Seconds, doubled on every retry
+    
     # Cache settings
     CACHE_TYPE = 'SimpleCache'
     CACHE_DEFAULT_TIMEOUT = 300
@@ -30,6 +36,8 @@ class Config:
     
     # Socket.IO settings
     SOCKETIO_ASYNC_MODE = 'threading'
+    JOB_EVENTS_POLL_INTERVAL = 0.25  # Seconds between two reads of the published job events
+    JOB_EVENTS_RETENTION = 3600  # Seconds published job events are kept
 
 class DevelopmentConfig(Config):
     """Development configuration."""
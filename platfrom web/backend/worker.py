@@ -0,0 +1,35 @@
+import os
+import sys
+import logging
+
+# Add the backend directory to path so imports work correctly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import config
+from backend.app.services.job_queue import WorkerPool
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(levelname)s %(message)s')
+
+def create_worker_app():
+    """App the jobs run in, so they can use the configuration
+
+    Jobs only need the JSON database and the config, so this does not build
+    the full web app with its blueprints and extensions.
+    """
+    from flask import Flask
+    app = Flask('worker')
+    app.config.from_object(config[os.getenv('FLASK_ENV', 'development')])
+    return app
+
+if __name__ == '__main__':
+    settings = config[os.getenv('FLASK_ENV', 'default')]
+    num_workers = int(sys.argv[1]) if len(sys.argv) > 1 else settings.JOB_WORKERS
+    pool = WorkerPool(settings.JOB_QUEUE_PATH, num_workers, app_factory='backend.worker:create_worker_app',
+                      retry_delay=settings.JOB_RETRY_DELAY)
+    pool.start()
+    try:
+        pool.supervise()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
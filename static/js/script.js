@@ -20,6 +20,7 @@ document.addEventListener('DOMContentLoaded', function() {
     let sampleEvents = [];
     let currentCommentary = '';
     let currentEvent = '';
+    let audioStreamer = null;
 
     // Initialize
     fetchSampleEvents();
@@ -124,9 +125,12 @@ document.addEventListener('DOMContentLoaded', function() {
         // Show loading state
         btnGenerate.textContent = 'Generating...';
         btnGenerate.disabled = true;
+        audioStreamer = null;
+        resultContainer.classList.add('hidden');
+        audioContainer.classList.add('hidden');
         
-        // Call API
-        fetch('/generate_commentary', {
+        // Call the combined endpoint: commentary text arrives first, then the audio
+        fetch('/commentate', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -134,18 +138,10 @@ document.addEventListener('DOMContentLoaded', function() {
             body: JSON.stringify({
                 event: event,
                 language: currentLanguage,
-                style: currentStyle
+                style: currentLanguage === 'arabic' ? currentStyle : null
             }),
         })
-        .then(response => response.json())
-        .then(data => {
-            if (data.commentary) {
-                currentCommentary = data.commentary;
-                commentaryText.textContent = data.commentary;
-                resultContainer.classList.remove('hidden');
-                audioContainer.classList.add('hidden');
-            }
-        })
+        .then(response => readEventStream(response, handleCommentateEvent))
         .catch(error => {
             console.error('Error generating commentary:', error);
             alert('Error generating commentary. Please try again.');
@@ -156,6 +152,136 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    function handleCommentateEvent(eventName, data) {
+        if (eventName === 'token') {
+            // Render tokens as they stream in
+            if (resultContainer.classList.contains('hidden')) {
+                commentaryText.textContent = '';
+                resultContainer.classList.remove('hidden');
+            }
+            commentaryText.textContent += data.token;
+        } else if (eventName === 'commentary' && data.commentary) {
+            currentCommentary = data.commentary;
+            commentaryText.textContent = data.commentary;
+            resultContainer.classList.remove('hidden');
+        } else if (eventName === 'audio_chunk') {
+            appendAudioChunk(data);
+        } else if (eventName === 'audio' && data.url) {
+            if (audioStreamer) {
+                // Chunks are already playing; the saved file is kept for replays
+                audioStreamer.finish();
+            } else {
+                audioPlayer.src = data.url;
+                audioContainer.classList.remove('hidden');
+                audioPlayer.play();
+            }
+        } else if (eventName === 'done') {
+            if (audioStreamer) {
+                audioStreamer.finish();
+            }
+            audioStreamer = null;
+            console.log('Commentate timings (ms):', data.timings_ms);
+        } else if (eventName === 'error') {
+            console.error('Commentate error:', data.error);
+        }
+    }
+
+    function appendAudioChunk(chunk) {
+        // Start playback from the first sentence while later ones are still being synthesized
+        if (!window.MediaSource || !MediaSource.isTypeSupported(chunk.mime)) {
+            return;  // The full audio file is played once it is ready
+        }
+        if (!audioStreamer) {
+            audioStreamer = createAudioStreamer(chunk.mime);
+            audioContainer.classList.remove('hidden');
+        }
+        const bytes = Uint8Array.from(atob(chunk.data), c => c.charCodeAt(0));
+        audioStreamer.append(bytes);
+    }
+
+    function createAudioStreamer(mime) {
+        const mediaSource = new MediaSource();
+        const queue = [];
+        let sourceBuffer = null;
+        let finished = false;
+
+        function flush() {
+            if (!sourceBuffer || sourceBuffer.updating) {
+                return;
+            }
+            if (queue.length > 0) {
+                sourceBuffer.appendBuffer(queue.shift());
+            } else if (finished && mediaSource.readyState === 'open') {
+                mediaSource.endOfStream();
+            }
+        }
+
+        mediaSource.addEventListener('sourceopen', () => {
+            sourceBuffer = mediaSource.addSourceBuffer(mime);
+            sourceBuffer.addEventListener('updateend', flush);
+            flush();
+        });
+
+        audioPlayer.src = URL.createObjectURL(mediaSource);
+        audioPlayer.play().catch(() => {});
+
+        return {
+            append(bytes) {
+                queue.push(bytes);
+                flush();
+            },
+            finish() {
+                finished = true;
+                flush();
+            }
+        };
+    }
+
+    function readEventStream(response, onEvent) {
+        // Parse a server-sent event stream from a fetch response
+        if (!response.ok) {
+            throw new Error(`Request failed with status ${response.status}`);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        function dispatch(block) {
+            let eventName = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+            if (data) {
+                onEvent(eventName, JSON.parse(data));
+            }
+        }
+
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    if (buffer.trim()) {
+                        dispatch(buffer);
+                    }
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    dispatch(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                }
+                return pump();
+            });
+        }
+
+        return pump();
+    }
+
     function generateAudio() {
         if (!currentCommentary) {
             alert('Please generate commentary first.');
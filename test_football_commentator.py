@@ -57,7 +57,7 @@ def save_results(commentary_segments, audio_segments, output_file="football_comm
     print(f"Results saved to {output_file}")
     print(f"Report saved to football_commentary_report.txt")
 
-def process_single_event(event_description, language="english"):
+def process_single_event(event_description, language="english", stream=False):
     """Process a single football event for testing"""
     # Create a mock event
     event = {
@@ -79,7 +79,15 @@ def process_single_event(event_description, language="english"):
     print(f"\nGenerating {language} football commentary...")
     start_time = time.time()
     
-    commentary = commentator._generate_commentary_for_event(event_description)
+    if stream:
+        # Print tokens as they arrive from the model
+        commentary_stream = commentator.stream_commentary_for_event(event_description)
+        for token in commentary_stream:
+            print(token, end="", flush=True)
+        print(f"\n\nTime to first token: {commentary_stream.time_to_first_token:.2f} seconds")
+        commentary = commentary_stream.text
+    else:
+        commentary = commentator._generate_commentary_for_event(event_description)
     commentary_segment = {
         'timestamp': 0.0,
         'commentary': commentary,
@@ -110,7 +118,7 @@ def run_football_test(args):
     
     # Process a single event if provided
     if args.event:
-        process_single_event(args.event, args.language)
+        process_single_event(args.event, args.language, args.stream)
         return
     
     # Process events from file
@@ -141,6 +149,13 @@ def run_football_test(args):
     start_time = time.time()
     commentary_segments = commentator.generate_commentary(events)
     print(f"Generated {len(commentary_segments)} commentary segments in {time.time() - start_time:.2f} seconds")
+    if commentator.router:
+        print("Routing report:")
+        print(json.dumps(commentator.router.report(), indent=2))
+    if commentator.backend.is_remote:
+        template = commentator._session_template() if commentator.match_context else commentator._prompt_template()
+        print(f"Prompt tokens: {template.stats()}")
+        print(f"API usage: {commentator.backend.usage}")
     
     # Print the first few commentaries
     print("\nSample commentaries:")
@@ -168,6 +183,7 @@ if __name__ == "__main__":
     parser.add_argument("--style", type=str, help="Arabic commentator style (حماسي, هادئ, رسمي, عاطفي)")
     parser.add_argument("--output", type=str, help="Output file for results")
     parser.add_argument("--skip-audio", action="store_true", help="Skip audio generation")
+    parser.add_argument("--stream", action="store_true", help="Stream tokens for a single event and report time to first token")
     
     args = parser.parse_args()
     run_football_test(args) 
\ No newline at end of file
@@ -1,19 +1,27 @@
 import os
-import requests
 import json
+import asyncio
 import tempfile
 import time
 from dotenv import load_dotenv
+from .streaming import AudioStream, BackendPin, split_sentences, ARABIC_SENTENCE_TERMINATORS, ARABIC_CLAUSE_TERMINATORS
+from .backends import (TTSBackendError, TTSUnavailableError, audio_extension,
+                       create_tts_backend, create_fallback_backend)
 
 load_dotenv()
 
 class ArabicTTSModule:
-    def __init__(self):
+    def __init__(self, backend=None):
         # Load API key from environment variables
         self.api_key = os.getenv("ELEVENLABS_API_KEY")
         if not self.api_key:
             print("Warning: ELEVENLABS_API_KEY not found in environment variables")
         
+        # Speech backend: ElevenLabs when a key is available, local offline synthesis otherwise
+        # (override with the backend argument or the TTS_BACKEND environment variable)
+        self.backend = backend or create_tts_backend(self.api_key)
+        self.fallback_backend = create_fallback_backend(self.backend)
+        
         # Default voice ID for Arabic - can be configured
         # Note: ElevenLabs has limited Arabic voice options, so we use a versatile voice
         self.voice_id = os.getenv("ELEVENLABS_ARABIC_VOICE_ID", "ThT5KcBeYPX3keUQqHPh")  # Default is "Antoni" voice
@@ -46,7 +54,7 @@ class ArabicTTSModule:
         
     def text_to_speech(self, commentary_segments):
         """
-        Convert Arabic commentary text to speech using ElevenLabs API
+        Convert Arabic commentary text to speech using the configured backend
         
         Args:
             commentary_segments: List of commentary segments with timestamps
@@ -78,11 +86,45 @@ class ArabicTTSModule:
                 audio_segments.append(audio_data)
                 
                 # Sleep briefly to avoid hitting rate limits
-                if i < len(commentary_segments) - 1:
+                if self.backend.is_remote and i < len(commentary_segments) - 1:
                     time.sleep(1.0)  # Slightly longer for Arabic TTS which can be more resource-intensive
         
         return audio_segments
     
+    async def text_to_speech_async(self, commentary_segments, max_concurrency=2):
+        """
+        Convert Arabic commentary text to speech without blocking the event loop
+        
+        Segments are synthesized concurrently; instead of sleeping between
+        requests, at most `max_concurrency` requests are in flight at once.
+        
+        Args:
+            commentary_segments: List of commentary segments with timestamps
+            max_concurrency: Maximum number of concurrent TTS requests
+            
+        Returns:
+            List of paths to audio files with timestamps
+        """
+        temp_dir = tempfile.mkdtemp()
+        print(f"Created temporary directory for audio files: {temp_dir}")
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def convert(i, segment):
+            async with semaphore:
+                audio_path = await self._generate_speech_async(segment['commentary'], f"{temp_dir}/segment_{i}.mp3")
+            if audio_path:
+                return {
+                    'timestamp': segment['timestamp'],
+                    'audio_path': audio_path,
+                    'commentary': segment['commentary'],
+                    'voice_id': self.voice_id,
+                    'language': 'arabic'
+                }
+            return None
+        
+        results = await asyncio.gather(*(convert(i, segment) for i, segment in enumerate(commentary_segments)))
+        return [audio_data for audio_data in results if audio_data]
+    
     def set_commentator_style(self, style):
         """
         Set the Arabic commentator style
@@ -107,60 +149,148 @@ class ArabicTTSModule:
                 self.stability = 0.5
                 self.similarity_boost = 0.85
     
+    def stream_text_to_speech(self, text_stream, max_workers=2):
+        """
+        Convert a stream of Arabic commentary text to speech sentence by sentence
+        
+        The text stream is cut at Arabic and Latin sentence and clause
+        boundaries (؟ ؛ ، . ! ?), each piece is synthesized concurrently, and
+        audio chunks are yielded in order.
+        
+        Args:
+            text_stream: Iterable of text deltas or a plain string
+            max_workers: Maximum number of concurrent TTS requests
+            
+        Returns:
+            AudioStream yielding audio chunks, with time_to_first_audio available
+            once the first chunk has been synthesized
+        """
+        sentences = split_sentences(text_stream, ARABIC_SENTENCE_TERMINATORS, ARABIC_CLAUSE_TERMINATORS)
+        # All sentences of a stream come from one backend so the chunks share a format
+        pin = BackendPin()
+        return AudioStream(sentences, lambda sentence: self._synthesize(sentence, pin), max_workers)
+    
     def _generate_speech(self, text, output_path):
         """
-        Generate speech from Arabic text using ElevenLabs API
+        Generate speech from Arabic text and save it to a file
         
         Args:
             text: Arabic text to convert to speech
-            output_path: Path to save the audio file
+            output_path: Path to save the audio file (the extension is adjusted
+                to the format the backend produced)
             
         Returns:
             Path to the generated audio file or None if failed
         """
-        if not self.api_key:
-            print("No ElevenLabs API key provided. Skipping TTS.")
-            # Create a dummy file for testing without API
-            with open(output_path, 'w') as f:
-                f.write("dummy audio file")
-            return output_path
+        audio = self._synthesize(text)
+        if not audio:
+            return None
         
-        try:
-            headers = {
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json",
-                "xi-api-key": self.api_key
-            }
+        output_path = f"{os.path.splitext(output_path)[0]}.{audio_extension(audio)}"
+        with open(output_path, 'wb') as f:
+            f.write(audio)
+        print(f"Successfully generated Arabic audio: {output_path}")
+        return output_path
+    
+    async def _generate_speech_async(self, text, output_path):
+        """
+        Generate speech from Arabic text and save it to a file without blocking the event loop
+        
+        Args:
+            Same as _generate_speech()
             
-            # Voice settings for Arabic
-            payload = {
-                "text": text,
-                "model_id": self.model_id,  # Use multilingual model for Arabic
-                "voice_settings": {
-                    "stability": self.stability,
-                    "similarity_boost": self.similarity_boost
-                }
-            }
+        Returns:
+            Path to the generated audio file or None if failed
+        """
+        audio = await self._synthesize_async(text)
+        if not audio:
+            return None
+        
+        output_path = f"{os.path.splitext(output_path)[0]}.{audio_extension(audio)}"
+        await asyncio.to_thread(_write_file, output_path, audio)
+        print(f"Successfully generated Arabic audio: {output_path}")
+        return output_path
+    
+    def _synthesize(self, text, pin=None):
+        """
+        Synthesize speech for a piece of Arabic text
+        
+        Falls back to the offline backend if the cloud service is throttling requests.
+        
+        Args:
+            text: Arabic text to convert to speech
+            pin: Optional BackendPin keeping a whole stream on one backend
             
+        Returns:
+            Audio bytes (MP3 or WAV) or None if failed
+        """
+        if pin and pin.backend == BackendPin.FALLBACK:
+            return self._synthesize_fallback(text, pin)
+        
+        try:
             # Debug info
-            print(f"Generating Arabic speech for: '{text[:30]}...' using voice ID: {self.voice_id}")
+            print(f"Generating Arabic speech for: '{text[:30]}...' using voice ID: {self.voice_id} ({self.backend.name})")
             
-            response = requests.post(
-                f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}",
-                headers=headers,
-                json=payload
-            )
+            # Use multilingual model for Arabic
+            audio = self.backend.synthesize(text, self.voice_id, self.model_id,
+                                            self.stability, self.similarity_boost)
+        except TTSUnavailableError as e:
+            print(f"TTS backend is throttling or unreachable: {e}")
+            return self._synthesize_fallback(text, pin)
+        except TTSBackendError as e:
+            print(f"Error calling TTS backend: {e}")
+            return None
+        except Exception as e:
+            print(f"Exception in Arabic TTS generation: {e}")
+            return None
+        
+        if pin is None or pin.choose(BackendPin.PRIMARY):
+            return audio
+        # Another sentence of this stream already fell back, so this one must too
+        return self._synthesize_fallback(text, pin)
+    
+    def _synthesize_fallback(self, text, pin=None):
+        """
+        Synthesize Arabic speech with the fallback backend, if there is one and the stream allows it
+        
+        Args:
+            text: Arabic text to convert to speech
+            pin: Optional BackendPin keeping a whole stream on one backend
             
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                print(f"Successfully generated Arabic audio: {output_path}")
-                return output_path
-            else:
-                print(f"Error calling ElevenLabs API: {response.status_code}")
-                print(response.text)
-                return None
-                
+        Returns:
+            Audio bytes or None if there is no usable fallback
+        """
+        if not self.fallback_backend or (pin and not pin.choose(BackendPin.FALLBACK)):
+            return None
+        print("Falling back to offline TTS")
+        return self.fallback_backend.synthesize(text, self.voice_id, None, self.stability, self.similarity_boost)
+    
+    async def _synthesize_async(self, text):
+        """
+        Synthesize speech for a piece of Arabic text without blocking the event loop
+        
+        Same fallbacks as _synthesize().
+        
+        Args:
+            text: Arabic text to convert to speech
+            
+        Returns:
+            Audio bytes (MP3 or WAV) or None if failed
+        """
+        try:
+            print(f"Generating Arabic speech for: '{text[:30]}...' using voice ID: {self.voice_id} ({self.backend.name})")
+            return await self.backend.synthesize_async(text, self.voice_id, self.model_id,
+                                                       self.stability, self.similarity_boost)
+        except TTSUnavailableError as e:
+            print(f"TTS backend is throttling or unreachable: {e}")
+            if self.fallback_backend:
+                print("Falling back to offline TTS")
+                return await self.fallback_backend.synthesize_async(text, self.voice_id, None,
+                                                                    self.stability, self.similarity_boost)
+            return None
+        except TTSBackendError as e:
+            print(f"Error calling TTS backend: {e}")
+            return None
         except Exception as e:
             print(f"Exception in Arabic TTS generation: {e}")
             return None
@@ -177,4 +307,8 @@ class ArabicTTSModule:
             "هادئ (Calm)": self.voice_options.get("adam"),
             "رسمي (Formal)": self.voice_options.get("josh"),
             "أنثوي (Female)": self.voice_options.get("rachel")
-        } 
\ No newline at end of file
+        } 
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
@@ -0,0 +1,393 @@
+import io
+import os
+import wave
+import zlib
+import atexit
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import requests
+from http_client.client import get_client, get_async_client
+
+class TTSBackendError(Exception):
+    """Raised when a TTS backend fails to synthesize speech"""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class TTSUnavailableError(TTSBackendError):
+    """Raised when the upstream TTS service cannot be reached"""
+
+class TTSThrottledError(TTSUnavailableError):
+    """Raised when the upstream TTS service is rate limiting requests"""
+
+def audio_extension(audio):
+    """Return the file extension matching the audio bytes"""
+    return "wav" if audio[:4] == b"RIFF" else "mp3"
+
+def audio_mime_type(audio):
+    """Return the MIME type matching the audio bytes"""
+    return "audio/wav" if audio[:4] == b"RIFF" else "audio/mpeg"
+
+def merge_wav(chunks):
+    """
+    Merge several WAV files with the same format into one
+
+    Args:
+        chunks: List of WAV file bytes
+
+    Returns:
+        WAV file bytes
+    """
+    output = io.BytesIO()
+    params = None
+    with wave.open(output, 'wb') as out:
+        for chunk in chunks:
+            with wave.open(io.BytesIO(chunk), 'rb') as part:
+                if params is None:
+                    params = part.getparams()
+                    out.setparams(params)
+                out.writeframes(part.readframes(part.getnframes()))
+    return output.getvalue()
+
+class ElevenLabsBackend:
+    """Cloud TTS through the ElevenLabs API (MP3 output)"""
+    name = "elevenlabs"
+    is_remote = True
+
+    def __init__(self, api_key, hedge=None):
+        """
+        Args:
+            api_key: ElevenLabs API key
+            hedge: Whether slow requests are sent a second time, off by default (TTS_HEDGE=on)
+                since every synthesis request is billed
+        """
+        self.api_key = api_key
+        if hedge is None:
+            hedge = os.getenv("TTS_HEDGE", "off").lower() in ("1", "on", "true", "yes")
+        self.hedge = hedge
+
+    def synthesize(self, text, voice_id, model_id, stability, similarity_boost):
+        """
+        Synthesize speech for a piece of text
+
+        Args:
+            text: Text to convert to speech
+            voice_id: ElevenLabs voice ID
+            model_id: ElevenLabs model ID
+            stability: Voice stability setting
+            similarity_boost: Voice similarity boost setting
+
+        Returns:
+            MP3 audio bytes
+        """
+        try:
+            response = get_client().post(**self._request_args(text, voice_id, model_id, stability, similarity_boost))
+        except requests.RequestException as e:
+            raise TTSUnavailableError(f"ElevenLabs unreachable: {e}")
+        return self._parse_response(response)
+
+    async def synthesize_async(self, text, voice_id, model_id, stability, similarity_boost):
+        """
+        Synthesize speech for a piece of text without blocking the event loop
+
+        Args:
+            Same as synthesize()
+
+        Returns:
+            MP3 audio bytes
+        """
+        try:
+            response = await get_async_client().post(**self._request_args(text, voice_id, model_id, stability, similarity_boost))
+        except requests.RequestException as e:
+            raise TTSUnavailableError(f"ElevenLabs unreachable: {e}")
+        return self._parse_response(response)
+
+    def _request_args(self, text, voice_id, model_id, stability, similarity_boost):
+        """Build the text-to-speech request for the HTTP client"""
+        headers = {
+            "Accept": "audio/mpeg",
+            "Content-Type": "application/json",
+            "xi-api-key": self.api_key
+        }
+
+        payload = {
+            "text": text,
+            "model_id": model_id,
+            "voice_settings": {
+                "stability": stability,
+                "similarity_boost": similarity_boost
+            }
+        }
+
+        return {
+            "url": f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
+            "endpoint": "elevenlabs.tts",
+            "timeout": (3.05, 30),
+            "hedge": self.hedge,
+            "headers": headers,
+            "json": payload
+        }
+
+    def _parse_response(self, response):
+        """Return the audio of a text-to-speech response or raise the matching error"""
+        if response.status_code == 200:
+            return response.content
+        if response.status_code == 429:
+            raise TTSThrottledError(f"ElevenLabs rate limit: {response.text}", response.status_code)
+        raise TTSBackendError(f"ElevenLabs API error {response.status_code}: {response.text}", response.status_code)
+
+# Formant frequencies (F1, F2, F3) in Hz for the vowels the offline synthesizer knows
+VOWEL_FORMANTS = {
+    'a': (730, 1090, 2440), 'e': (530, 1840, 2480), 'i': (270, 2290, 3010),
+    'o': (570, 840, 2410), 'u': (300, 870, 2240), 'y': (270, 2290, 3010),
+    'ا': (730, 1090, 2440), 'آ': (730, 1090, 2440), 'أ': (730, 1090, 2440), 'إ': (270, 2290, 3010),
+    'ى': (730, 1090, 2440), 'ة': (600, 1500, 2500), 'و': (300, 870, 2240), 'ي': (270, 2290, 3010)
+}
+VOICED_CONSONANTS = set("bdgjlmnrvwz" + "بدجذرزظضعغلمن")
+UNVOICED_CONSONANTS = set("cfhkpqstx" + "تثحخسشصطفقكهء")
+CONSONANT_FORMANTS = (250, 1500, 2500)
+
+# Segment durations in seconds, tuned for roughly 150 words per minute
+VOWEL_DURATION = 0.09
+CONSONANT_DURATION = 0.06
+WORD_GAP = 0.04
+CLAUSE_PAUSE = 0.15
+SENTENCE_PAUSE = 0.3
+
+def _segments_for_text(text):
+    """Turn text into a list of (kind, duration, formants, gain) synthesis segments"""
+    segments = []
+    for char in text.lower():
+        if char in VOWEL_FORMANTS:
+            segments.append(('voiced', VOWEL_DURATION, VOWEL_FORMANTS[char], 1.0))
+        elif char in VOICED_CONSONANTS:
+            segments.append(('voiced', CONSONANT_DURATION, CONSONANT_FORMANTS, 0.5))
+        elif char in UNVOICED_CONSONANTS:
+            segments.append(('noise', CONSONANT_DURATION, None, 0.35))
+        elif char.isdigit() or char.isalpha():
+            segments.append(('voiced', VOWEL_DURATION, VOWEL_FORMANTS['a'], 1.0))
+        elif char in ".!?؟\n":
+            segments.append(('silence', SENTENCE_PAUSE, None, 0.0))
+        elif char in ",;:،؛":
+            segments.append(('silence', CLAUSE_PAUSE, None, 0.0))
+        elif char.isspace():
+            segments.append(('silence', WORD_GAP, None, 0.0))
+    return segments
+
+def render_formant_speech(text, sample_rate=16000, f0=120.0, expressiveness=0.3):
+    """
+    Render speech-like audio for a text with a small additive formant synthesizer
+
+    Vowels and voiced consonants are built from the harmonics of a glottal
+    pitch contour shaped by formant resonances, unvoiced consonants from
+    high-passed noise, and punctuation becomes pauses. The output is not
+    intelligible speech but has realistic length, rhythm and spectrum, which
+    is what development, load testing and timing-sensitive video syncing need.
+
+    Args:
+        text: Text to render
+        sample_rate: Output sample rate in Hz
+        f0: Base pitch in Hz
+        expressiveness: Amount of pitch movement (0 = monotone)
+
+    Returns:
+        Mono int16 numpy array
+    """
+    segments = _segments_for_text(text)
+    if not segments:
+        return np.zeros(int(0.1 * sample_rate), dtype=np.int16)
+
+    # Deterministic per text so identical requests give identical audio
+    rng = np.random.default_rng(zlib.crc32(text.encode('utf-8')))
+
+    lengths = [max(1, int(segment[1] * sample_rate)) for segment in segments]
+    total = sum(lengths)
+
+    # Pitch contour: slow declination over the utterance plus gentle wobble
+    t = np.arange(total) / sample_rate
+    declination = np.linspace(1.1, 0.9, total)
+    wobble = 1 + expressiveness * 0.15 * np.sin(2 * np.pi * 3.0 * t + rng.uniform(0, 2 * np.pi))
+    f0_contour = f0 * declination * wobble
+    phase = 2 * np.pi * np.cumsum(f0_contour) / sample_rate
+
+    signal = np.zeros(total, dtype=np.float64)
+    ramp_len = int(0.01 * sample_rate)
+    position = 0
+
+    for (kind, _, formants, gain), length in zip(segments, lengths):
+        start, end = position, position + length
+        position = end
+        if kind == 'silence':
+            continue
+
+        if kind == 'voiced':
+            mean_f0 = f0_contour[start:end].mean()
+            harmonics = np.arange(1, int(min(4000, sample_rate / 2) // mean_f0) + 1)
+            freqs = harmonics * mean_f0
+            # Lorentzian resonance per formant, with a natural spectral tilt
+            amps = sum(1.0 / (1.0 + ((freqs - f) / (60 + 0.06 * f)) ** 2) for f in formants)
+            amps = amps / np.sqrt(harmonics)
+            segment = np.sin(np.outer(phase[start:end], harmonics)) @ amps
+            segment = segment / amps.sum() * gain
+        else:
+            noise = rng.standard_normal(length + 1)
+            segment = np.diff(noise) / 2 * gain
+
+        # Short attack and release ramps avoid clicks between segments
+        ramp = min(ramp_len, length // 2)
+        if ramp > 0:
+            envelope = np.ones(length)
+            envelope[:ramp] = np.linspace(0, 1, ramp)
+            envelope[-ramp:] = np.linspace(1, 0, ramp)
+            segment = segment * envelope
+
+        signal[start:end] = segment
+
+    peak = np.abs(signal).max()
+    if peak > 0:
+        signal = signal / peak * 0.8
+    return (signal * 32767).astype(np.int16)
+
+def pcm_to_wav(samples, sample_rate):
+    """
+    Wrap mono int16 PCM samples in a WAV container
+
+    Args:
+        samples: Mono int16 numpy array
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        WAV file bytes
+    """
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.tobytes())
+    return output.getvalue()
+
+def _render_wav(text, sample_rate, f0, expressiveness):
+    """Process pool entry point: render text to WAV bytes"""
+    return pcm_to_wav(render_formant_speech(text, sample_rate, f0, expressiveness), sample_rate)
+
+class OfflineTTSBackend:
+    """
+    Local CPU TTS producing real WAV audio with a formant synthesizer.
+
+    Rendering runs in a process pool shared by all instances, so concurrent
+    requests (e.g. from AudioStream or a batch job) scale across cores.
+    Voice IDs map deterministically to a pitch, and lower stability settings
+    give a more animated pitch contour, mirroring the ElevenLabs settings.
+    """
+    name = "offline"
+    is_remote = False
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    def __init__(self, sample_rate=16000, use_process_pool=True, max_workers=None):
+        self.sample_rate = sample_rate
+        self.use_process_pool = use_process_pool
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    @classmethod
+    def _get_pool(cls, max_workers):
+        with cls._pool_lock:
+            if cls._pool is None:
+                # Spawn rather than fork: the pool is created lazily from threaded request
+                # handlers, and a forked child can inherit locks held by other threads
+                cls._pool = ProcessPoolExecutor(max_workers=max_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+                atexit.register(cls._pool.shutdown, wait=False)
+            return cls._pool
+
+    def synthesize(self, text, voice_id, model_id=None, stability=0.7, similarity_boost=0.7):
+        """
+        Synthesize speech for a piece of text
+
+        Args:
+            text: Text to convert to speech
+            voice_id: Voice ID (selects the pitch)
+            model_id: Ignored, accepted for interface compatibility
+            stability: Voice stability setting (lower = more expressive)
+            similarity_boost: Ignored, accepted for interface compatibility
+
+        Returns:
+            WAV audio bytes
+        """
+        f0, expressiveness = self._voice_parameters(voice_id, stability)
+
+        if not self.use_process_pool:
+            return _render_wav(text, self.sample_rate, f0, expressiveness)
+
+        try:
+            pool = self._get_pool(self.max_workers)
+            return pool.submit(_render_wav, text, self.sample_rate, f0, expressiveness).result()
+        except Exception as e:
+            # A broken pool (e.g. killed worker) should not take TTS down with it
+            print(f"Offline TTS process pool failed ({e}), rendering inline")
+            return _render_wav(text, self.sample_rate, f0, expressiveness)
+
+    async def synthesize_async(self, text, voice_id, model_id=None, stability=0.7, similarity_boost=0.7):
+        """
+        Synthesize speech for a piece of text, rendering in the process pool so the event loop stays free
+
+        Args:
+            Same as synthesize()
+
+        Returns:
+            WAV audio bytes
+        """
+        f0, expressiveness = self._voice_parameters(voice_id, stability)
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool(self.max_workers) if self.use_process_pool else None
+        try:
+            return await loop.run_in_executor(pool, _render_wav, text, self.sample_rate, f0, expressiveness)
+        except Exception as e:
+            print(f"Offline TTS process pool failed ({e}), rendering in a thread")
+            return await loop.run_in_executor(None, _render_wav, text, self.sample_rate, f0, expressiveness)
+
+    @staticmethod
+    def _voice_parameters(voice_id, stability):
+        """Map a voice ID to a pitch and the stability setting to pitch movement"""
+        f0 = 90.0 + zlib.crc32(str(voice_id).encode('utf-8')) % 80
+        expressiveness = max(0.0, min(1.0, 1.0 - stability)) * 2
+        return f0, expressiveness
+
+def create_tts_backend(api_key=None, name=None):
+    """
+    Create the TTS backend selected by name or the TTS_BACKEND environment variable
+
+    Args:
+        api_key: ElevenLabs API key, if any
+        name: "elevenlabs", "offline" or "auto" (ElevenLabs when a key is set)
+
+    Returns:
+        TTS backend instance
+    """
+    name = (name or os.getenv("TTS_BACKEND", "auto")).lower()
+
+    if name == "offline":
+        return OfflineTTSBackend()
+    if name == "elevenlabs":
+        return ElevenLabsBackend(api_key)
+    if name != "auto":
+        print(f"Warning: unknown TTS_BACKEND '{name}', using auto selection")
+
+    return ElevenLabsBackend(api_key) if api_key else OfflineTTSBackend()
+
+def create_fallback_backend(backend):
+    """
+    Offline fallback for a remote backend, if enabled with TTS_FALLBACK=offline
+
+    Off by default: the formant synthesizer is not intelligible speech, so
+    serving it to listeners in place of ElevenLabs has to be a deliberate choice.
+    """
+    if not backend.is_remote or os.getenv("TTS_FALLBACK", "none").lower() != "offline":
+        return None
+    return OfflineTTSBackend()
@@ -0,0 +1,202 @@
+import os
+import re
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .backends import audio_extension, merge_wav
+
+# Sentence and clause boundaries used to cut a text stream into speakable pieces
+ENGLISH_SENTENCE_TERMINATORS = ".!?;\n"
+ENGLISH_CLAUSE_TERMINATORS = ",:"
+ARABIC_SENTENCE_TERMINATORS = ".!?؟؛\n"
+ARABIC_CLAUSE_TERMINATORS = "،,:"
+
+def split_sentences(text_stream, sentence_terminators=ENGLISH_SENTENCE_TERMINATORS,
+                    clause_terminators=ENGLISH_CLAUSE_TERMINATORS, max_chars=120, min_chars=12):
+    """
+    Split a stream of text deltas into sentences as soon as they are complete
+
+    A piece is emitted when a sentence terminator is followed by whitespace
+    (so "2.5" or "Mr." inside a word do not split). Pieces that grow past
+    `max_chars` are cut at the last clause terminator to keep the first audio
+    chunk short. Pieces shorter than `min_chars` are merged with the next one
+    so the TTS engine gets enough context for natural prosody.
+
+    Args:
+        text_stream: Iterable of text deltas (e.g. LLM tokens) or a plain string
+        sentence_terminators: Characters that end a sentence
+        clause_terminators: Characters where long sentences may be cut
+        max_chars: Length after which a sentence is cut at a clause boundary
+        min_chars: Minimum length of an emitted piece
+
+    Returns:
+        Generator of sentence strings
+    """
+    if isinstance(text_stream, str):
+        text_stream = [text_stream]
+
+    boundary = re.compile(r"[" + re.escape(sentence_terminators) + r"]+(?=\s)")
+    clause = re.compile(r"[" + re.escape(clause_terminators) + r"](?=\s)") if clause_terminators else None
+    buffer = ""
+
+    for delta in text_stream:
+        buffer += delta
+
+        while True:
+            cut = None
+            for match in boundary.finditer(buffer):
+                if len(buffer[:match.end()].strip()) >= min_chars:
+                    cut = match.end()
+                    break
+
+            if cut is None and clause is not None and len(buffer) > max_chars:
+                clause_matches = [m.end() for m in clause.finditer(buffer) if m.end() >= min_chars]
+                if clause_matches:
+                    cut = clause_matches[-1]
+
+            if cut is None:
+                break
+
+            sentence = buffer[:cut].strip()
+            buffer = buffer[cut:]
+            if sentence:
+                yield sentence
+
+    # Whatever is left once the stream ends is the last sentence
+    if buffer.strip():
+        yield buffer.strip()
+
+class BackendPin:
+    """
+    Keeps every chunk of one audio stream on the same TTS backend.
+
+    The first sentence to finish decides: if the primary backend served it,
+    later sentences it cannot serve are dropped rather than rendered by the
+    fallback; if it had to fall back, the rest of the stream goes to the
+    fallback backend too. MP3 and WAV chunks are never mixed in one stream.
+    """
+    PRIMARY = "primary"
+    FALLBACK = "fallback"
+
+    def __init__(self):
+        self.backend = None
+        self._lock = threading.Lock()
+
+    def choose(self, backend):
+        """
+        Pin the stream to a backend unless it is already pinned
+
+        Args:
+            backend: BackendPin.PRIMARY or BackendPin.FALLBACK
+
+        Returns:
+            True if the stream is pinned to that backend
+        """
+        with self._lock:
+            if self.backend is None:
+                self.backend = backend
+            return self.backend == backend
+
+class AudioStream:
+    """
+    Ordered stream of synthesized audio chunks, one per sentence.
+
+    Sentences are synthesized concurrently on a small thread pool as soon as
+    they are cut from the text stream, while chunks are yielded strictly in
+    sentence order. Time-to-first-audio is therefore a single sentence's
+    synthesis time rather than the time for the whole text.
+    """
+    def __init__(self, sentences, synthesize_fn, max_workers=3):
+        self._sentences = sentences
+        self._synthesize_fn = synthesize_fn
+        self.max_workers = max_workers
+
+        self.start_time = None
+        self.time_to_first_audio = None
+        self.total_time = None
+        self.sentences = []
+        self.chunks = []
+
+    def __iter__(self):
+        self.start_time = time.perf_counter()
+        pending = queue.Queue()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def producer():
+            # Submit each sentence as soon as the text stream produces it
+            try:
+                for sentence in self._sentences:
+                    pending.put((sentence, executor.submit(self._synthesize_fn, sentence)))
+            except Exception as e:
+                pending.put(e)
+            finally:
+                pending.put(None)
+
+        threading.Thread(target=producer, daemon=True).start()
+
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                sentence, future = item
+                audio = future.result()
+                if not audio:
+                    continue
+
+                if self.time_to_first_audio is None:
+                    self.time_to_first_audio = time.perf_counter() - self.start_time
+                self.sentences.append(sentence)
+                self.chunks.append(audio)
+                yield audio
+        finally:
+            executor.shutdown(wait=False)
+            self.total_time = time.perf_counter() - self.start_time
+
+    def read(self):
+        """
+        Consume the whole stream
+
+        Returns:
+            Concatenated audio bytes
+        """
+        for _ in self:
+            pass
+        return b"".join(self.chunks)
+
+    def save(self, output_path):
+        """
+        Consume the stream (if needed) and write the audio to a file
+
+        Args:
+            output_path: Path to save the audio file (the extension is adjusted
+                to the audio format)
+
+        Returns:
+            Path to the saved audio file or None if there is no audio
+        """
+        if self.total_time is None:
+            self.read()
+        if not self.chunks:
+            return None
+
+        formats = {audio_extension(chunk) for chunk in self.chunks}
+        if len(formats) > 1:
+            # Frames of different formats cannot be joined into one playable file
+            raise ValueError(f"Audio stream mixes {' and '.join(sorted(formats))} chunks")
+
+        if formats == {"wav"}:
+            # WAV chunks each carry a header, so merge their frames
+            audio = merge_wav(self.chunks)
+        else:
+            # MP3 frames can be concatenated into a single continuous stream
+            audio = b"".join(self.chunks)
+
+        output_path = f"{os.path.splitext(output_path)[0]}.{audio_extension(audio)}"
+        with open(output_path, 'wb') as f:
+            f.write(audio)
+        return output_path
@@ -1,19 +1,28 @@
 import os
-import requests
 import json
+import asyncio
 import tempfile
 import time
 from dotenv import load_dotenv
+from .streaming import AudioStream, BackendPin, split_sentences, ENGLISH_SENTENCE_TERMINATORS, ENGLISH_CLAUSE_TERMINATORS
+from http_client.client import get_client
+from .backends import (TTSBackendError, TTSUnavailableError, audio_extension,
+                       create_tts_backend, create_fallback_backend)
 
 load_dotenv()
 
 class TTSModule:
-    def __init__(self):
+    def __init__(self, backend=None):
         # Load API key from environment variables
         self.api_key = os.getenv("ELEVENLABS_API_KEY")
         if not self.api_key:
             print("Warning: ELEVENLABS_API_KEY not found in environment variables")
         
+        # Speech backend: ElevenLabs when a key is available, local offline synthesis otherwise
+        # (override with the backend argument or the TTS_BACKEND environment variable)
+        self.backend = backend or create_tts_backend(self.api_key)
+        self.fallback_backend = create_fallback_backend(self.backend)
+        
         # Default voice ID - can be configured
         self.voice_id = os.getenv("ELEVENLABS_VOICE_ID", "pNInz6obpgDQGcFmaJgB")  # Default is "Adam" voice
         
@@ -34,7 +43,7 @@ class TTSModule:
         
     def text_to_speech(self, commentary_segments):
         """
-        Convert commentary text to speech using ElevenLabs API
+        Convert commentary text to speech using the configured backend
         
         Args:
             commentary_segments: List of commentary segments with timestamps
@@ -70,11 +79,45 @@ class TTSModule:
                 audio_segments.append(audio_data)
                 
                 # Sleep briefly to avoid hitting rate limits
-                if i < len(commentary_segments) - 1:
+                if self.backend.is_remote and i < len(commentary_segments) - 1:
                     time.sleep(0.5)
         
         return audio_segments
     
+    async def text_to_speech_async(self, commentary_segments, max_concurrency=4):
+        """
+        Convert commentary text to speech without blocking the event loop
+        
+        Segments are synthesized concurrently; instead of sleeping between
+        requests, at most `max_concurrency` requests are in flight at once.
+        
+        Args:
+            commentary_segments: List of commentary segments with timestamps
+            max_concurrency: Maximum number of concurrent TTS requests
+            
+        Returns:
+            List of paths to audio files with timestamps
+        """
+        temp_dir = tempfile.mkdtemp()
+        print(f"Created temporary directory for audio files: {temp_dir}")
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def convert(i, segment):
+            voice_id = self._select_voice_for_sport(segment.get('sport', 'general'))
+            async with semaphore:
+                audio_path = await self._generate_speech_async(segment['commentary'], f"{temp_dir}/segment_{i}.mp3", voice_id)
+            if audio_path:
+                return {
+                    'timestamp': segment['timestamp'],
+                    'audio_path': audio_path,
+                    'commentary': segment['commentary'],
+                    'voice_id': voice_id
+                }
+            return None
+        
+        results = await asyncio.gather(*(convert(i, segment) for i, segment in enumerate(commentary_segments)))
+        return [audio_data for audio_data in results if audio_data]
+    
     def _select_voice_for_sport(self, sport):
         """
         Select a voice based on the sport type
@@ -97,71 +140,175 @@ class TTSModule:
         
         return sport_voice_map.get(sport, self.voice_id)
     
+    def stream_text_to_speech(self, text_stream, voice_id=None, max_workers=3):
+        """
+        Convert a stream of commentary text to speech sentence by sentence
+        
+        The text stream (e.g. tokens from Commentator.stream_commentary_for_event)
+        is cut at sentence and clause boundaries, each piece is synthesized
+        concurrently, and audio chunks are yielded in order.
+        
+        Args:
+            text_stream: Iterable of text deltas or a plain string
+            voice_id: Optional voice ID to use
+            max_workers: Maximum number of concurrent TTS requests
+            
+        Returns:
+            AudioStream yielding audio chunks, with time_to_first_audio available
+            once the first chunk has been synthesized
+        """
+        voice_id = voice_id or self.voice_id
+        sentences = split_sentences(text_stream, ENGLISH_SENTENCE_TERMINATORS, ENGLISH_CLAUSE_TERMINATORS)
+        # All sentences of a stream come from one backend so the chunks share a format
+        pin = BackendPin()
+        return AudioStream(sentences, lambda sentence: self._synthesize(sentence, voice_id, pin), max_workers)
+    
     def _generate_speech(self, text, output_path, voice_id=None):
         """
-        Generate speech from text using ElevenLabs API
+        Generate speech from text and save it to a file
         
         Args:
             text: Text to convert to speech
-            output_path: Path to save the audio file
+            output_path: Path to save the audio file (the extension is adjusted
+                to the format the backend produced)
             voice_id: Optional voice ID to use
             
         Returns:
             Path to the generated audio file or None if failed
         """
-        if not self.api_key:
-            print("No ElevenLabs API key provided. Skipping TTS.")
-            # Create a dummy file for testing without API
-            with open(output_path, 'w') as f:
-                f.write("dummy audio file")
-            return output_path
+        audio = self._synthesize(text, voice_id)
+        if not audio:
+            return None
         
-        try:
-            # Use provided voice_id or default
-            voice_id = voice_id or self.voice_id
+        output_path = f"{os.path.splitext(output_path)[0]}.{audio_extension(audio)}"
+        with open(output_path, 'wb') as f:
+            f.write(audio)
+        print(f"Successfully generated audio: {output_path}")
+        return output_path
+    
+    async def _generate_speech_async(self, text, output_path, voice_id=None):
+        """
+        Generate speech from text and save it to a file without blocking the event loop
+        
+        Args:
+            Same as _generate_speech()
             
-            headers = {
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json",
-                "xi-api-key": self.api_key
-            }
+        Returns:
+            Path to the generated audio file or None if failed
+        """
+        audio = await self._synthesize_async(text, voice_id)
+        if not audio:
+            return None
+        
+        output_path = f"{os.path.splitext(output_path)[0]}.{audio_extension(audio)}"
+        await asyncio.to_thread(_write_file, output_path, audio)
+        print(f"Successfully generated audio: {output_path}")
+        return output_path
+    
+    def _synthesize(self, text, voice_id=None, pin=None):
+        """
+        Synthesize speech for a piece of text
+        
+        Falls back to the default voice if the selected voice fails, and to
+        the offline backend if the cloud service is throttling requests.
+        
+        Args:
+            text: Text to convert to speech
+            voice_id: Optional voice ID to use
+            pin: Optional BackendPin keeping a whole stream on one backend
             
-            payload = {
-                "text": text,
-                "model_id": "eleven_monolingual_v1",
-                "voice_settings": {
-                    "stability": self.stability,
-                    "similarity_boost": self.similarity_boost
-                }
-            }
+        Returns:
+            Audio bytes (MP3 or WAV) or None if failed
+        """
+        # Use provided voice_id or default, then the default as a fallback
+        voice_ids = [voice_id or self.voice_id]
+        if voice_ids[0] != self.voice_id:
+            voice_ids.append(self.voice_id)
+        
+        if pin and pin.backend == BackendPin.FALLBACK:
+            return self._synthesize_fallback(text, voice_ids[0], pin)
+        
+        for candidate in voice_ids:
+            try:
+                # Debug info
+                print(f"Generating speech for: '{text[:30]}...' using voice ID: {candidate} ({self.backend.name})")
+                audio = self.backend.synthesize(text, candidate, "eleven_monolingual_v1",
+                                                self.stability, self.similarity_boost)
+            except TTSUnavailableError as e:
+                print(f"TTS backend is throttling or unreachable: {e}")
+                return self._synthesize_fallback(text, candidate, pin)
+            except TTSBackendError as e:
+                print(f"Error calling TTS backend: {e}")
+                if candidate != self.voice_id:
+                    # Fallback to default voice if there was an error with the selected voice
+                    print(f"Retrying with default voice: {self.voice_id}")
+                continue
+            except Exception as e:
+                print(f"Exception in TTS generation: {e}")
+                return None
             
-            # Debug info
-            print(f"Generating speech for: '{text[:30]}...' using voice ID: {voice_id}")
+            if pin is None or pin.choose(BackendPin.PRIMARY):
+                return audio
+            # Another sentence of this stream already fell back, so this one must too
+            return self._synthesize_fallback(text, candidate, pin)
+        
+        return None
+    
+    def _synthesize_fallback(self, text, voice_id, pin=None):
+        """
+        Synthesize speech with the fallback backend, if there is one and the stream allows it
+        
+        Args:
+            text: Text to convert to speech
+            voice_id: Voice ID to use
+            pin: Optional BackendPin keeping a whole stream on one backend
             
-            response = requests.post(
-                f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}",
-                headers=headers,
-                json=payload
-            )
+        Returns:
+            Audio bytes or None if there is no usable fallback
+        """
+        if not self.fallback_backend or (pin and not pin.choose(BackendPin.FALLBACK)):
+            return None
+        print("Falling back to offline TTS")
+        return self.fallback_backend.synthesize(text, voice_id, None, self.stability, self.similarity_boost)
+    
+    async def _synthesize_async(self, text, voice_id=None):
+        """
+        Synthesize speech for a piece of text without blocking the event loop
+        
+        Same fallbacks as _synthesize().
+        
+        Args:
+            text: Text to convert to speech
+            voice_id: Optional voice ID to use
             
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    f.write(response.content)
-                print(f"Successfully generated audio: {output_path}")
-                return output_path
-            else:
-                print(f"Error calling ElevenLabs API: {response.status_code}")
-                print(response.text)
-                
-                # Fallback to default voice if there was an error with the selected voice
-                if voice_id != self.voice_id:
+        Returns:
+            Audio bytes (MP3 or WAV) or None if failed
+        """
+        voice_ids = [voice_id or self.voice_id]
+        if voice_ids[0] != self.voice_id:
+            voice_ids.append(self.voice_id)
+        
+        for candidate in voice_ids:
+            try:
+                print(f"Generating speech for: '{text[:30]}...' using voice ID: {candidate} ({self.backend.name})")
+                return await self.backend.synthesize_async(text, candidate, "eleven_monolingual_v1",
+                                                           self.stability, self.similarity_boost)
+            except TTSUnavailableError as e:
+                print(f"TTS backend is throttling or unreachable: {e}")
+                if self.fallback_backend:
+                    print("Falling back to offline TTS")
+                    return await self.fallback_backend.synthesize_async(text, candidate, None,
+                                                                        self.stability, self.similarity_boost)
+                return None
+            except TTSBackendError as e:
+                print(f"Error calling TTS backend: {e}")
+                if candidate != self.voice_id:
                     print(f"Retrying with default voice: {self.voice_id}")
-                    return self._generate_speech(text, output_path, self.voice_id)
+            except Exception as e:
+                print(f"Exception in TTS generation: {e}")
                 return None
-                
-        except Exception as e:
-            print(f"Exception in TTS generation: {e}")
-            return None
+        
+        return None
             
     def list_available_voices(self):
         """
@@ -176,7 +323,8 @@ class TTSModule:
             
         try:
             headers = {"xi-api-key": self.api_key}
-            response = requests.get("https://api.elevenlabs.io/v1/voices", headers=headers)
+            response = get_client().get("https://api.elevenlabs.io/v1/voices", endpoint="elevenlabs.voices",
+                                        hedge=True, headers=headers)
             
             if response.status_code == 200:
                 voices = response.json().get("voices", [])
@@ -187,4 +335,8 @@ class TTSModule:
                 
         except Exception as e:
             print(f"Exception fetching voices: {e}")
-            return self.voice_options 
\ No newline at end of file
+            return self.voice_options 
+
+def _write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
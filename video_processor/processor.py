@@ -1,3 +1,4 @@
+import asyncio
 import cv2
 import numpy as np
 import torch
@@ -56,6 +57,19 @@ class VideoProcessor:
         print(f"Found {len(merged_highlights)} highlights")
         return merged_highlights
     
+    async def process_video_async(self, video_path):
+        """
+        Same as process_video(), decoding and scoring frames in the default executor
+        
+        Args:
+            video_path: Path to the video file
+            
+        Returns:
+            List of highlights with timestamps
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.process_video, video_path)
+    
     def _is_highlight_frame(self, frame):
         """
         Determine if the frame is a highlight
@@ -107,8 +121,13 @@ class VideoProcessor:
         audio_clips = [original_audio]
         
         for i, segment in enumerate(audio_segments):
-            start_time = events[i]['timestamp']
-            audio_clip = AudioFileClip(segment)
+            # TTS modules return segment dicts with the audio file path
+            if isinstance(segment, dict):
+                start_time = segment.get('timestamp', events[i]['timestamp'])
+                audio_clip = AudioFileClip(segment['audio_path'])
+            else:
+                start_time = events[i]['timestamp']
+                audio_clip = AudioFileClip(segment)
             # Add the audio clip at the specified time
             audio_clip = audio_clip.set_start(start_time)
             audio_clips.append(audio_clip)
@@ -120,4 +139,14 @@ class VideoProcessor:
         final_video = video.set_audio(final_audio)
         
         # Write the output
-        final_video.write_videofile(output_path, codec='libx264') 
\ No newline at end of file
+        final_video.write_videofile(output_path, codec='libx264') 
+    
+    async def sync_audio_with_video_async(self, video_path, audio_segments, events, output_path):
+        """
+        Same as sync_audio_with_video(), rendering in the default executor
+        
+        Args:
+            Same as sync_audio_with_video()
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.sync_audio_with_video, video_path, audio_segments, events, output_path)
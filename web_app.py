@@ -1,16 +1,26 @@
 import os
 import sys
 import json
+import time
+import uuid
+import queue
+import base64
+import itertools
 import tempfile
-from flask import Flask, render_template, request, jsonify, send_file
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from dotenv import load_dotenv
 
 # Add the current directory to the path so we can import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from commentator.football_commentator import FootballCommentator
+from commentator.cache import CommentaryCache
 from tts_module.arabic_tts import ArabicTTSModule
 from tts_module.tts import TTSModule
+from tts_module.backends import audio_mime_type
+from http_client.client import get_client
 
 # Load environment variables
 load_dotenv()
@@ -26,6 +36,55 @@ print(f"Created temporary directory for audio files: {TEMP_DIR}")
 
 # Store audio files paths for serving
 AUDIO_FILES = {}
+AUDIO_IDS = itertools.count(1)
+
+# Cache of generated commentary keyed by (language, event description)
+COMMENTARY_CACHE = CommentaryCache(max_size=int(os.getenv("COMMENTARY_CACHE_SIZE", 1024)))
+
+# Batch commentary limits
+BATCH_MAX_CONCURRENCY = int(os.getenv("COMMENTARY_MAX_CONCURRENCY", 8))
+BATCH_MAX_EVENTS = 200
+
+def _get_tts_module(language, style=None):
+    """Select the appropriate TTS module based on language"""
+    if language == "arabic":
+        tts = ArabicTTSModule()
+        # Set Arabic commentator style if specified
+        if style:
+            tts.set_commentator_style(style)
+    else:
+        tts = TTSModule()
+    return tts
+
+def _register_audio(audio_path):
+    """Store an audio file path under a unique ID and return the ID"""
+    audio_id = f"audio_{next(AUDIO_IDS)}"
+    AUDIO_FILES[audio_id] = audio_path
+    return audio_id
+
+def _cached_commentary(commentator, event_description):
+    """
+    Generate commentary for an event through the result cache
+    
+    Fallback lines produced when the model failed are not cached, so the
+    next request for the event tries the model again.
+    
+    Returns:
+        Tuple of (commentary, was_cached)
+    """
+    key = (commentator.language, event_description)
+    commentary = COMMENTARY_CACHE.get(key)
+    if commentary is not None:
+        return commentary, True
+    
+    commentary, fallback = commentator._generate_commentary_with_source(event_description)
+    if commentary and not fallback:
+        COMMENTARY_CACHE.set(key, commentary)
+    return commentary, False
+
+def _sse(event, data):
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @app.route('/')
 def index():
@@ -48,7 +107,7 @@ def generate_commentary():
     commentator = FootballCommentator(language=language)
     
     # Generate commentary
-    commentary = commentator._generate_commentary_for_event(event_description)
+    commentary, _ = _cached_commentary(commentator, event_description)
     
     # Return the commentary
     return jsonify({
@@ -56,6 +115,88 @@ def generate_commentary():
         "language": language
     })
 
+@app.route('/generate_commentary_batch', methods=['POST'])
+def generate_commentary_batch():
+    """
+    Generate commentary for a list of events in one request.
+    
+    Events are fanned out concurrently (up to BATCH_MAX_CONCURRENCY at a time)
+    through the result cache and streamed back as newline-delimited JSON in
+    completion order. Each line carries the event index so the client can
+    reorder, plus the per-item latency.
+    """
+    data = request.json or {}
+    
+    events = data.get('events')
+    language = data.get('language', 'english')
+    
+    try:
+        max_concurrency = int(data.get('max_concurrency', BATCH_MAX_CONCURRENCY))
+    except (TypeError, ValueError):
+        max_concurrency = 0
+    if max_concurrency < 1:
+        return jsonify({"error": "max_concurrency must be a positive integer"}), 400
+    max_concurrency = min(max_concurrency, BATCH_MAX_CONCURRENCY)
+    
+    if not events or not isinstance(events, list):
+        return jsonify({"error": "No events provided"}), 400
+    if len(events) > BATCH_MAX_EVENTS:
+        return jsonify({"error": f"Too many events (max {BATCH_MAX_EVENTS})"}), 400
+    
+    # Accept both plain descriptions and event objects like football_events.json
+    normalized = []
+    for event in events:
+        if isinstance(event, str):
+            event = {'description': event}
+        if not isinstance(event, dict) or not event.get('description'):
+            return jsonify({"error": "Each event needs a description"}), 400
+        normalized.append(event)
+    
+    commentator = FootballCommentator(language=language)
+    
+    def commentate_one(index, event):
+        start_time = time.perf_counter()
+        try:
+            commentary, cached = _cached_commentary(commentator, event['description'])
+            error = None
+        except Exception as e:
+            commentary, cached, error = None, False, str(e)
+        
+        result = {
+            "index": index,
+            "timestamp": event.get('timestamp'),
+            "event_description": event['description'],
+            "commentary": commentary,
+            "language": language,
+            "cached": cached,
+            "latency_ms": round((time.perf_counter() - start_time) * 1000, 1)
+        }
+        if error:
+            result["error"] = error
+        return result
+    
+    def generate():
+        start_time = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(normalized))) as executor:
+            futures = [executor.submit(commentate_one, i, event) for i, event in enumerate(normalized)]
+            for future in as_completed(futures):
+                yield json.dumps(future.result(), ensure_ascii=False) + "\n"
+        
+        summary = {
+            "done": True,
+            "count": len(normalized),
+            "total_ms": round((time.perf_counter() - start_time) * 1000, 1),
+            "cache": COMMENTARY_CACHE.stats()
+        }
+        if commentator.router:
+            summary["routing"] = commentator.router.report()
+        yield json.dumps(summary) + "\n"
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/generate_audio', methods=['POST'])
 def generate_audio():
     """Generate audio from commentary"""
@@ -78,13 +219,7 @@ def generate_audio():
     }
     
     # Select the appropriate TTS module based on language
-    if language == "arabic":
-        tts = ArabicTTSModule()
-        # Set Arabic commentator style if specified
-        if style:
-            tts.set_commentator_style(style)
-    else:
-        tts = TTSModule()
+    tts = _get_tts_module(language, style)
     
     # Generate audio
     audio_segments = tts.text_to_speech([commentary_segment])
@@ -95,14 +230,131 @@ def generate_audio():
     audio_path = audio_segments[0]['audio_path']
     
     # Store audio path with a unique ID
-    audio_id = f"audio_{len(AUDIO_FILES) + 1}"
-    AUDIO_FILES[audio_id] = audio_path
+    audio_id = _register_audio(audio_path)
     
     # Return audio information
     return jsonify({
         "audio_id": audio_id
     })
 
+@app.route('/commentate', methods=['POST'])
+def commentate():
+    """
+    Generate commentary and speech for an event in a single request.
+    
+    Commentary generation and TTS are pipelined on the server and the results
+    are streamed as server-sent events: commentary tokens are sent as they
+    arrive from the model, each completed sentence is synthesized right away
+    and sent as an audio chunk, and the full commentary, the saved audio file
+    and the stage timings follow.
+    """
+    data = request.json
+    
+    event_description = data.get('event')
+    language = data.get('language', 'english')
+    style = data.get('style')
+    
+    if not event_description:
+        return jsonify({"error": "No event description provided"}), 400
+    
+    def generate():
+        start_time = time.perf_counter()
+        timings = {}
+        events = queue.Queue()
+        tts_tokens = queue.Queue()
+        
+        commentator = FootballCommentator(language=language)
+        tts = _get_tts_module(language, style if language == "arabic" else None)
+        
+        def elapsed_ms():
+            return round((time.perf_counter() - start_time) * 1000, 1)
+        
+        def iter_tts_tokens():
+            while True:
+                token = tts_tokens.get()
+                if token is None:
+                    return
+                yield token
+        
+        def run_commentary():
+            # Stage 1: commentary text, streamed token by token unless already cached
+            try:
+                commentary = COMMENTARY_CACHE.get((language, event_description))
+                if commentary is None:
+                    stream = commentator.stream_commentary_for_event(event_description)
+                    for token in stream:
+                        timings.setdefault('first_token', elapsed_ms())
+                        events.put(('token', {"token": token}))
+                        tts_tokens.put(token)
+                    commentary = stream.text
+                    if commentary and not stream.fallback:
+                        COMMENTARY_CACHE.set((language, event_description), commentary)
+                else:
+                    tts_tokens.put(commentary)
+                
+                timings.setdefault('first_token', elapsed_ms())
+                timings['commentary'] = elapsed_ms()
+                events.put(('commentary', {
+                    "commentary": commentary,
+                    "language": language
+                }))
+            except Exception as e:
+                events.put(('error', {"error": f"Commentary generation failed: {e}"}))
+            finally:
+                tts_tokens.put(None)
+                events.put(('_commentary_done', None))
+        
+        def run_audio():
+            # Stage 2: each sentence is synthesized as soon as the text stream completes it
+            try:
+                audio_stream = tts.stream_text_to_speech(iter_tts_tokens())
+                for index, chunk in enumerate(audio_stream):
+                    timings.setdefault('first_audio', elapsed_ms())
+                    events.put(('audio_chunk', {
+                        "index": index,
+                        "mime": audio_mime_type(chunk),
+                        "data": base64.b64encode(chunk).decode('ascii')
+                    }))
+                
+                audio_path = audio_stream.save(os.path.join(TEMP_DIR, f"commentate_{uuid.uuid4().hex}.mp3"))
+                if audio_path:
+                    audio_id = _register_audio(audio_path)
+                    events.put(('audio', {
+                        "audio_id": audio_id,
+                        "url": f"/audio/{audio_id}"
+                    }))
+                else:
+                    events.put(('error', {"error": "Failed to generate audio"}))
+            except Exception as e:
+                events.put(('error', {"error": f"Audio generation failed: {e}"}))
+            finally:
+                timings['audio'] = elapsed_ms()
+                events.put(('_audio_done', None))
+        
+        threading.Thread(target=run_commentary, daemon=True).start()
+        threading.Thread(target=run_audio, daemon=True).start()
+        
+        # Forward stage events to the client as they are produced
+        pending_stages = 2
+        while pending_stages:
+            event, payload = events.get()
+            if event.startswith('_'):
+                pending_stages -= 1
+                continue
+            yield _sse(event, payload)
+        
+        timings['total'] = elapsed_ms()
+        yield _sse('done', {"timings_ms": timings})
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/upstream_stats')
+def upstream_stats():
+    """Latency histograms per upstream endpoint, circuit breaker states and hedging counters"""
+    return jsonify(get_client().stats())
+
 @app.route('/audio/<audio_id>', methods=['GET'])
 def get_audio(audio_id):
     """Serve the generated audio file"""
@@ -113,7 +365,8 @@ def get_audio(audio_id):
     audio_path = AUDIO_FILES[audio_id]
     
     # Return audio file
-    return send_file(audio_path, mimetype='audio/mpeg')
+    mimetype = 'audio/wav' if audio_path.endswith('.wav') else 'audio/mpeg'
+    return send_file(audio_path, mimetype=mimetype)
 
 @app.route('/voices', methods=['GET'])
 def get_voices():